@@ -0,0 +1 @@
+"""Benchmarks of the PUDL Zenodo Storage archiver."""
@@ -0,0 +1,57 @@
+"""Fixtures for the PUDL Zenodo Storage benchmarks."""
+import os
+
+import pytest
+
+from pudl_zenodo_storage.zs.core import ZenodoStorage
+from tests.conftest import fake_zenodo  # noqa: F401
+
+# Total size of the synthetic scrape tree, in MiB. Set to several GiB to benchmark
+# hashing at production scale.
+DATA_MB = int(os.environ.get("BENCHMARK_DATA_MB", "256"))
+
+
+def write_file(path, size, block=os.urandom(1024 * 1024)):
+    """Write a file of the given size, repeating a block of random bytes."""
+    with open(path, "wb") as f:
+        for _ in range(size // len(block)):
+            f.write(block)
+        f.write(block[: size % len(block)])
+
+
+@pytest.fixture(scope="session")
+def scrape_tree(tmp_path_factory):
+    """A directory of zip files, a few large ones and many small ones."""
+    directory = tmp_path_factory.mktemp("scraped")
+    total = DATA_MB * 1024 * 1024
+    sizes = [total // 8] * 4 + [total // 2 // 64] * 64
+    paths = []
+
+    for i, size in enumerate(sizes):
+        path = str(directory / f"{2000 + i}-xx.zip")
+        write_file(path, size)
+        paths.append(path)
+
+    return paths
+
+
+@pytest.fixture()
+def zenodo(fake_zenodo):  # noqa: F811
+    """A ZenodoStorage pointed at the fake server."""
+    return ZenodoStorage(key="key", api_root=fake_zenodo.api_root, pool_size=32)
+
+
+def pytest_sessionstart(session):
+    """Fail straight away if there is no baseline for this machine to compare with."""
+    benchmarks = getattr(session.config, "_benchmarksession", None)
+
+    if (
+        benchmarks is not None
+        and benchmarks.compare
+        and not benchmarks.compared_mapping
+    ):
+        # Otherwise pytest-benchmark only fails once every benchmark has run
+        raise pytest.UsageError(
+            f"No benchmark baseline for {benchmarks.machine_id} in "
+            f"{benchmarks.storage}. Record one with tox -e benchmark-baseline."
+        )
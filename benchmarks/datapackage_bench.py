@@ -0,0 +1,68 @@
+"""Benchmarks for generating frictionless datapackage descriptors."""
+import string
+
+import pytest
+
+from pudl_zenodo_storage.frictionless import get_datapackager
+from pudl_zenodo_storage.zs.metadata import UUIDS
+
+
+def annual(name, i):
+    """A file name with a unique year."""
+    return f"{name}-{1000 + i}.zip"
+
+
+def year_month(name, i):
+    """A file name with a unique year and month."""
+    return f"{name}-{1000 + i // 12}-{i % 12 + 1:02d}.xlsx"
+
+
+def year_state(name, i):
+    """A file name with a year and a two letter state code."""
+    letters = string.ascii_lowercase
+    state = letters[i % 26] + letters[i // 26 % 26]
+    return f"{1000 + i // 676}-{state}.zip"
+
+
+def minimal(name, i):
+    """Any zip file name."""
+    return f"{name}-part{i}.zip"
+
+
+FILE_NAMES = {
+    "censusdp1tract": annual,
+    "eia860": annual,
+    "eia860m": year_month,
+    "eia861": annual,
+    "eia923": annual,
+    "eia_bulk_elec": minimal,
+    "epacamd_eia": minimal,
+    "epacems": year_state,
+    "ferc1": annual,
+    "ferc2": annual,
+    "ferc714": minimal,
+}
+
+
+def zenodo_files(name, size):
+    """Zenodo file descriptors for an archive of the given number of files."""
+    return [
+        {
+            "filename": (filename := FILE_NAMES[name](name, i)),
+            "links": {"download": f"https://zenodo.org/api/files/bucket/{filename}"},
+            "filesize": 1000000 + i,
+            "checksum": f"{i:032x}",
+        }
+        for i in range(size)
+    ]
+
+
+@pytest.mark.parametrize("size", [1000, 5000])
+@pytest.mark.parametrize("name", sorted(UUIDS))
+def test_datapackager(benchmark, name, size):
+    """Produce the datapackage descriptor of a large archive."""
+    datapackager = get_datapackager(name)
+    dfiles = zenodo_files(name, size)
+    descriptor = benchmark(datapackager, dfiles)
+
+    assert len(descriptor["resources"]) == size
@@ -0,0 +1,26 @@
+"""Benchmarks for computing the checksums of a local scrape tree."""
+import os
+
+import pytest
+
+from pudl_zenodo_storage.checksum import ChecksumCache
+from pudl_zenodo_storage.cli import local_fileinfo
+
+
+@pytest.mark.parametrize("workers", sorted({1, os.cpu_count() or 1}))
+def test_local_fileinfo(benchmark, scrape_tree, workers):
+    """Hash every file in the tree."""
+    info = benchmark.pedantic(
+        local_fileinfo, args=(scrape_tree,), kwargs={"workers": workers}, rounds=3
+    )
+
+    assert len(info) == len(scrape_tree)
+
+
+def test_local_fileinfo_cached(benchmark, scrape_tree, tmp_path):
+    """Look up every file in a warm checksum cache."""
+    with ChecksumCache(str(tmp_path / "checksums.sqlite")) as cache:
+        local_fileinfo(scrape_tree, cache=cache)
+        info = benchmark(local_fileinfo, scrape_tree, cache=cache)
+
+    assert len(info) == len(scrape_tree)
@@ -0,0 +1,34 @@
+"""Benchmarks for planning the changes to a deposition."""
+import pytest
+
+from pudl_zenodo_storage.cli import action_steps
+
+
+def manifests(size):
+    """
+    Local and remote file info for a large archive.
+
+    A tenth of the files are new, a tenth have been deleted and a tenth changed.
+    """
+    local = {
+        f"{i}.zip": {"path": "/scraped", "checksum": f"{i:032x}"}
+        for i in range(size // 10, size)
+    }
+    remote = {
+        f"{i}.zip": {
+            "filename": f"{i}.zip",
+            "checksum": f"{i + (i % 10 == 0):032x}",
+            "links": {"self": f"https://zenodo.test/files/{i}"},
+        }
+        for i in range(size - size // 10)
+    }
+    return local, remote
+
+
+@pytest.mark.parametrize("size", [10_000, 100_000, 1_000_000])
+def test_action_steps(benchmark, size):
+    """Compare local and remote manifests."""
+    local, remote = manifests(size)
+    steps = benchmark(action_steps, local, remote)
+
+    assert len(steps["create"]) == size // 10
@@ -0,0 +1,50 @@
+"""Benchmarks for updating a deposition on a local fake Zenodo server."""
+import os
+
+import pytest
+
+from pudl_zenodo_storage.cli import (
+    action_steps,
+    execute_actions,
+    local_fileinfo,
+    remote_fileinfo,
+)
+
+FILES = 100
+FILE_SIZE = 256 * 1024
+
+
+def datapackager(dfiles):
+    """Produce a minimal datapackage descriptor."""
+    return {
+        "name": "pudl-benchmark",
+        "resources": [
+            {"name": f["filename"], "path": f["links"]["download"]} for f in dfiles
+        ],
+    }
+
+
+@pytest.mark.parametrize("jobs", [1, 8])
+def test_execute_actions(benchmark, zenodo, tmp_path, jobs):
+    """Upload a new version in which every file has changed."""
+    paths = []
+
+    for i in range(FILES):
+        path = tmp_path / f"{i}.zip"
+        path.write_bytes(os.urandom(FILE_SIZE))
+        paths.append(str(path))
+
+    local = local_fileinfo(paths, workers=1)
+
+    def setup():
+        deposition = zenodo.create_deposition({"title": "Benchmark"})
+
+        for name in local:
+            zenodo.bucket_api_upload(deposition, name, b"old contents")
+
+        steps = action_steps(local, remote_fileinfo(zenodo, deposition))
+        return (zenodo, deposition, datapackager, steps), {"jobs": jobs}
+
+    result = benchmark.pedantic(execute_actions, setup=setup, rounds=3)
+
+    assert len(remote_fileinfo(zenodo, result)) == FILES + 1
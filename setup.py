@@ -8,6 +8,7 @@ setup(
     version="0.2.0",
     packages=find_packages("src"),
     package_dir={"": "src"},
+    package_data={"pudl_zenodo_storage.frictionless": ["profiles/*.json"]},
     author="Catalyst Cooperative",
     description="Zenodo storage interface and scripts",
     python_requires=">=3.10,<3.11",
@@ -18,9 +19,10 @@ setup(
     },
     license="MIT",
     install_requires=[
+        "aiohttp>=3.8,<4",
         "catalystcoop.pudl @ git+https://github.com/catalyst-cooperative/pudl.git@dev",
-        "datapackage>=1.0,<2.0",
         "factory_boy>=2.12,<4",
+        "jsonschema>=4,<5",
         "pydantic[email]>=1.7,<2",
         "requests>=2.22,<3",
         "semantic_version>=2.8,<3",
@@ -30,6 +32,7 @@ setup(
             "bandit>=1.6,<2",
             "black>=22,<23",
             "coverage>=5.3,<6.6",
+            "datapackage>=1.0,<2.0",
             "doc8>=0.9,<1.1",
             "flake8>=4.0,<6.1",
             "flake8-builtins>=1.5,<3",
@@ -42,6 +45,7 @@ setup(
             "pre-commit>=2.9,<3",
             "pydocstyle>=5.1,<7",
             "pytest>=6.2,<8",
+            "pytest-benchmark>=4,<5",
             "pytest-cov>=2.10,<5",
             "tox>=3.20,<4",
         ]
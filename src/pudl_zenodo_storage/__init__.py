@@ -1,17 +1,6 @@
 """A package for creating raw PUDL input archives on Zenodo."""
-import pudl_zenodo_storage.frictionless.censusdp1tract
-import pudl_zenodo_storage.frictionless.contributors
-import pudl_zenodo_storage.frictionless.core
-import pudl_zenodo_storage.frictionless.eia860
-import pudl_zenodo_storage.frictionless.eia860m
-import pudl_zenodo_storage.frictionless.eia861
-import pudl_zenodo_storage.frictionless.eia923
-import pudl_zenodo_storage.frictionless.eia_bulk_elec
-import pudl_zenodo_storage.frictionless.epacamd_eia
-import pudl_zenodo_storage.frictionless.epacems
-import pudl_zenodo_storage.frictionless.ferc1
-import pudl_zenodo_storage.frictionless.ferc2
-import pudl_zenodo_storage.frictionless.ferc714
-import pudl_zenodo_storage.frictionless.licenses
+import pudl_zenodo_storage.checksum
+import pudl_zenodo_storage.frictionless
+import pudl_zenodo_storage.journal
 import pudl_zenodo_storage.zs.core
 import pudl_zenodo_storage.zs.metadata  # noqa: F401
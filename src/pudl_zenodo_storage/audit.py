@@ -0,0 +1,129 @@
+"""Check archived depositions against local files and their own datapackage.json."""
+import json
+import os
+
+
+def _remote_checksum(file_resource):
+    """The md5 checksum of a deposition file, without any algorithm prefix."""
+    return file_resource["checksum"].removeprefix("md5:")
+
+
+def compare_local(remote, local):
+    """
+    Compare the files of a deposition with a local copy of the archive.
+
+    Args:
+        remote (dict): file resources by name, per
+            https://developers.zenodo.org/#deposition-files
+        local (dict): local files by name, per cli.local_fileinfo(...)
+
+    Returns:
+        list: descriptions of the differences found.
+
+    """
+    problems = []
+
+    for name, info in sorted(local.items()):
+        if name not in remote:
+            problems.append(f"{name} is missing from Zenodo")
+            continue
+
+        size = os.path.getsize(os.path.join(info["path"], name))
+
+        if _remote_checksum(remote[name]) != info["checksum"]:
+            problems.append(
+                f"{name} has checksum {_remote_checksum(remote[name])} on Zenodo, "
+                f"but {info['checksum']} locally"
+            )
+        elif remote[name]["filesize"] != size:
+            problems.append(
+                f"{name} has {remote[name]['filesize']} bytes on Zenodo, "
+                f"but {size} locally"
+            )
+
+    for name in sorted(remote.keys() - local.keys() - {"datapackage.json"}):
+        problems.append(f"{name} is on Zenodo, but not in the local archive")
+
+    return problems
+
+
+def compare_datapackage(remote, descriptor):
+    """
+    Compare the files of a deposition with the resources its datapackage lists.
+
+    Args:
+        remote (dict): file resources by name, per
+            https://developers.zenodo.org/#deposition-files
+        descriptor (dict): the deposition's datapackage.json.
+
+    Returns:
+        list: descriptions of the differences found.
+
+    """
+    problems = []
+    resources = {resource["name"]: resource for resource in descriptor["resources"]}
+
+    for name, resource in sorted(resources.items()):
+        if name not in remote:
+            problems.append(f"{name} is in datapackage.json, but not on Zenodo")
+        elif resource.get("hash") != _remote_checksum(remote[name]):
+            problems.append(
+                f"{name} has checksum {_remote_checksum(remote[name])} on Zenodo, "
+                f"but {resource.get('hash')} in datapackage.json"
+            )
+        elif resource.get("bytes") != remote[name]["filesize"]:
+            problems.append(
+                f"{name} has {remote[name]['filesize']} bytes on Zenodo, "
+                f"but {resource.get('bytes')} in datapackage.json"
+            )
+
+    for name in sorted(remote.keys() - resources.keys() - {"datapackage.json"}):
+        problems.append(f"{name} is on Zenodo, but not in datapackage.json")
+
+    return problems
+
+
+def audit_deposition(zenodo, key_id, local=None):
+    """
+    Check the latest version of a deposition for missing or mismatched files.
+
+    The checksums and sizes of the deposition's files are compared with the
+    resources in its datapackage.json and, if given, with a local copy of the
+    archive. Nothing is modified.
+
+    Args:
+        zenodo: a zs.ZenodoStorage manager
+        key_id (str): the uuid the deposition is tagged with, per
+            pzs.zs.metadata.UUIDS
+        local (dict): local files by name, per cli.local_fileinfo(...). If None,
+            the deposition isn't compared with local files.
+
+    Returns:
+        dict: the deposition's link, version and state, the number of files it
+        holds, and a list of the problems found, empty if there are none.
+
+    """
+    deposition = zenodo.get_deposition(f'keywords: "{key_id}"')
+
+    if deposition is None:
+        return {"problems": ["Deposition not found"]}
+
+    remote = {item["filename"]: item for item in zenodo.iter_files(deposition)}
+    problems = []
+
+    if "datapackage.json" in remote:
+        descriptor = json.loads(zenodo.download(remote["datapackage.json"]))
+        problems += compare_datapackage(remote, descriptor)
+    else:
+        problems.append("datapackage.json is missing from Zenodo")
+
+    if local is not None:
+        problems += compare_local(remote, local)
+
+    return {
+        "deposition": deposition["links"]["html"],
+        "version": deposition["metadata"].get("version"),
+        "submitted": deposition["submitted"],
+        "files": len(remote),
+        "problems": problems,
+    }
@@ -0,0 +1,273 @@
+"""Compute checksums of local archive files."""
+import io
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import md5
+
+CHUNK_SIZE: int = 8 * 1024 * 1024
+
+
+def file_md5(file_path, chunk_size=CHUNK_SIZE):
+    """
+    Compute the md5 checksum of a single file.
+
+    Args:
+        file_path (str): path to the file.
+        chunk_size (int): number of bytes to read at a time.
+
+    Returns:
+        str: the hex encoded md5 digest of the file contents.
+
+    """
+    hash_md5 = md5()  # nosec: B324
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+
+    with open(file_path, "rb", buffering=0) as f:
+        while size := f.readinto(buffer):
+            hash_md5.update(view[:size])
+
+    return hash_md5.hexdigest()
+
+
+def file_md5s(file_paths, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Compute the md5 checksums of many files using a pool of processes.
+
+    Files are handed to the workers largest first, so that a single large file does
+    not end up being hashed alone after all the others have finished.
+
+    Args:
+        file_paths (list): file path strings.
+        workers (int): number of worker processes. Defaults to the number of CPUs.
+            With a single worker, files are hashed in the calling process.
+        chunk_size (int): number of bytes to read at a time.
+
+    Returns:
+        dict: of form {file_path: checksum (md5)}
+
+    """
+    file_paths = sorted(file_paths, key=os.path.getsize, reverse=True)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    workers = min(workers, len(file_paths))
+
+    if workers <= 1:
+        return {fp: file_md5(fp, chunk_size) for fp in file_paths}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        checksums = executor.map(file_md5, file_paths, [chunk_size] * len(file_paths))
+        return dict(zip(file_paths, checksums))
+
+
+class HashingReader:
+    """
+    Read-only file-like wrapper that computes the md5 checksum of what is read.
+
+    The checksum covers the content from the position of the file handle when it was
+    wrapped up to the end of the file, and is computed as that content is read, e.g.
+    while it is uploaded, so the file is only read once. Seeking is passed through
+    to the file handle, and bytes read again after rewinding, e.g. to retry an
+    upload, are not hashed twice.
+    """
+
+    def __init__(self, file_handle):
+        """
+        Wrap a file handle.
+
+        Args:
+            file_handle: an open binary file handle or bytes like object.
+
+        Returns:
+            HashingReader
+
+        """
+        self.file_handle = file_handle
+        self.start = file_handle.tell()
+        self.end = file_handle.seek(0, io.SEEK_END)
+        file_handle.seek(self.start)
+        self.hashed = self.start
+        self.md5 = md5()  # nosec: B324
+
+    @property
+    def mode(self):
+        """The file is always read as bytes."""
+        return "rb"
+
+    def fileno(self):
+        """The file descriptor of the wrapped file handle, if it has one."""
+        return self.file_handle.fileno()
+
+    def tell(self):
+        """The position in the wrapped file handle."""
+        return self.file_handle.tell()
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        """Move to a new position in the wrapped file handle."""
+        return self.file_handle.seek(offset, whence)
+
+    def read(self, size=-1):
+        """
+        Read from the wrapped file handle, hashing any bytes not hashed before.
+
+        Args:
+            size (int): the maximum number of bytes to read. Reads everything that
+                is left if negative.
+
+        Returns:
+            bytes: the bytes read.
+
+        """
+        position = self.file_handle.tell()
+        chunk = self.file_handle.read(size)
+
+        # Bytes after a gap can't be hashed until the gap has been read.
+        if position <= self.hashed < position + len(chunk):
+            self.md5.update(memoryview(chunk)[self.hashed - position :])
+            self.hashed = position + len(chunk)
+
+        return chunk
+
+    def hexdigest(self):
+        """
+        The md5 checksum of the content, if all of it has been read.
+
+        Returns:
+            str: the hex encoded md5 digest, or None if some of the content hasn't
+            been read yet.
+
+        """
+        if self.hashed < self.end:
+            return
+
+        return self.md5.hexdigest()
+
+
+class ChecksumCache:
+    """
+    Persistent store of file checksums, backed by SQLite.
+
+    A stored checksum is only reused while the size, modification time and inode of
+    the file at the same path are unchanged. The cache may be shared between threads,
+    e.g. to store the checksums computed while files are uploaded.
+    """
+
+    def __init__(self, path):
+        """
+        Open (or create) a checksum cache.
+
+        Args:
+            path (str): location of the SQLite database file.
+
+        Returns:
+            ChecksumCache
+
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS checksums ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+            "inode INTEGER, checksum TEXT)"
+        )
+
+    def __enter__(self):
+        """Use the cache as a context manager."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Commit any pending changes and close the database."""
+        self.close()
+
+    @staticmethod
+    def _key(stat):
+        return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+    def get(self, file_path):
+        """
+        Look up the checksum of a file.
+
+        Args:
+            file_path (str): path to the file.
+
+        Returns:
+            str: the cached md5 checksum, or None if the file is not in the cache or
+            has changed since its checksum was stored.
+
+        """
+        file_path = os.path.abspath(file_path)
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT size, mtime_ns, inode, checksum FROM checksums WHERE path = ?",
+                (file_path,),
+            ).fetchone()
+
+        if row is None or row[:3] != self._key(os.stat(file_path)):
+            return
+
+        return row[3]
+
+    def put(self, file_path, checksum, stat=None):
+        """
+        Store the checksum of a file.
+
+        Args:
+            file_path (str): path to the file.
+            checksum (str): md5 checksum of the file.
+            stat (os.stat_result): the file status from before the checksum was
+                computed. By default the file is stat-ed again.
+
+        Returns:
+            None
+
+        """
+        file_path = os.path.abspath(file_path)
+
+        if stat is None:
+            stat = os.stat(file_path)
+
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO checksums VALUES (?, ?, ?, ?, ?)",
+                (file_path, *self._key(stat), checksum),
+            )
+
+    def evict(self):
+        """
+        Remove entries for files that no longer exist or have changed.
+
+        Returns:
+            int: the number of entries removed.
+
+        """
+        stale = []
+
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT path, size, mtime_ns, inode FROM checksums"
+            ).fetchall()
+
+        for path, *key in rows:
+            try:
+                if tuple(key) != self._key(os.stat(path)):
+                    stale.append((path,))
+            except FileNotFoundError:
+                stale.append((path,))
+
+        with self.lock:
+            self.connection.executemany("DELETE FROM checksums WHERE path = ?", stale)
+            self.connection.commit()
+
+        return len(stale)
+
+    def close(self):
+        """Commit any pending changes and close the database."""
+        self.connection.commit()
+        self.connection.close()
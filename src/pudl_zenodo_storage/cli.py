@@ -8,50 +8,57 @@ import json
 import logging
 import os
 import sys
-from hashlib import md5
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
 from typing import Any
 
-import datapackage
 import requests
 
 import pudl_zenodo_storage as pzs
+from pudl_zenodo_storage.audit import audit_deposition
+from pudl_zenodo_storage.checksum import ChecksumCache, HashingReader, file_md5s
+from pudl_zenodo_storage.frictionless.validation import DescriptorValidator
+from pudl_zenodo_storage.journal import OperationJournal
+from pudl_zenodo_storage.mirror import mirror_deposition
+from pudl_zenodo_storage.profiling import PhaseProfiler
+from pudl_zenodo_storage.store import ContentStore
 from pudl_zenodo_storage.zs.core import ZenodoStorage
 
 logger = logging.getLogger(__name__)
 logging.basicConfig()
 
-ROOT_DIR = os.environ.get(
+PUDL_IN = os.environ.get(
     "PUDL_IN", os.path.join(os.path.expanduser("~"), "Downloads", "pudl_scrapers")
 )
-ROOT_DIR = os.path.join(ROOT_DIR, "scraped")
+ROOT_DIR = os.path.join(PUDL_IN, "scraped")
+CHECKSUM_CACHE = os.path.join(PUDL_IN, "zenodo_checksums.sqlite")
+JOURNAL = os.path.join(PUDL_IN, "zenodo_journal.sqlite")
+VALIDATION_CACHE = os.path.join(PUDL_IN, "zenodo_validation.sqlite")
+MIRROR_DIR = os.path.join(PUDL_IN, "zenodo_mirror")
 
 
-def local_fileinfo(file_paths):
+def local_fileinfo(file_paths, workers=None, cache=None):
     """
     Produce a dict describing file names, paths, and md5 hashes.
 
     Args:
         file_paths (list): file path strings, as provided from the CLI.
+        workers (int): number of processes used to compute checksums. Defaults to
+            the number of CPUs.
+        cache (ChecksumCache): previously computed checksums. Only files missing
+            from the cache, or changed since they were cached, are hashed.
 
     Returns:
         dict: of form {filename: {path: str, checksum: str (md5)}}
 
     """
-
-    def file_md5s(file_path):
-        hash_md5 = md5()  # nosec: B324
-
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-
-        return hash_md5.hexdigest()
-
     metadata = {}
+    stats = {}
 
     for fp in file_paths:
         path, name = os.path.split(os.path.abspath(fp))
-        checksum = file_md5s(fp)
 
         if name in metadata:
             raise ValueError(
@@ -59,41 +66,49 @@ def local_fileinfo(file_paths):
                 f"with {metadata[name]['path']}/{name}"
             )
 
-        metadata[name] = {"path": path, "checksum": checksum}
+        metadata[name] = {"path": path}
+        checksum = None if cache is None else cache.get(fp)
+
+        if checksum is None:
+            stats[fp] = os.stat(fp)
+        else:
+            metadata[name]["checksum"] = checksum
+
+    checksums = file_md5s(stats, workers=workers)
+
+    for fp, checksum in checksums.items():
+        name = os.path.basename(fp)
+        metadata[name]["checksum"] = checksum
+
+        if cache is not None:
+            cache.put(fp, checksum, stat=stats[fp])
 
     return metadata
 
 
-def remote_fileinfo(zenodo, deposition):
+def remote_fileinfo(zenodo, deposition, current=False):
     """
     Collect and shape file data from an existing Zenodo deposition.
 
     Args:
         zenodo: a zs.ZenodoStorage manager
         deposition: the deposition details, as retrieved from Zenodo
+        current: whether the deposition details were retrieved after its files last
+            changed, so the files they describe can be used without listing them.
 
     Returns:
         dict: of form {filename: {path: str, checksum: str (md5)}}
 
     """
-    url = deposition["links"]["files"]
-    response = requests.get(url, params={"access_token": zenodo.key})
-
-    if response.status_code > 299:
-        msg = f"Unable to get files for {url}: {response}"
-        raise RuntimeError(msg)
-
-    try:
-        jsr = response.json()
-    except:  # noqa: E722
-        msg = f"Invalid remote file data at {url}: {response}"
-        raise ValueError(msg)
+    if current:
+        files = zenodo.deposition_files(deposition)
+    else:
+        files = zenodo.iter_files(deposition)
 
-    files = jsr
     return {item["filename"]: item for item in files}
 
 
-def new_datapackage(zenodo, datapackager, deposition):
+def new_datapackage(zenodo, datapackager, deposition, validator=None):
     """
     Add a new datapackage.json file to the given deposition.
 
@@ -102,33 +117,119 @@ def new_datapackage(zenodo, datapackager, deposition):
         datapackager: a data package generation function that takes a list of
             Zenodo file descriptors and produces the complete frictionless
             datapackage json.
-            e.g. pzs.frictionless.eia860.datapackager
+            e.g. pzs.frictionless.get_datapackager("eia860")
         deposition: the deposition details, as retrieved from Zenodo. Must be
                     in an editable state.
+        validator: a DescriptorValidator, which may hold cached results. A new one
+            is used if None.
 
     Returns:
         None: Raises errors on failure.
 
     """
     files = remote_fileinfo(zenodo, deposition)
+    datapkg_descriptor = datapackager(
+        [v for k, v in files.items() if k != "datapackage.json"]
+    )
+    upload_datapackage(zenodo, deposition, files, datapkg_descriptor, validator)
 
-    if "datapackage.json" in files:
-        requests.delete(
-            files["datapackage.json"]["links"]["self"],
-            params={"access_token": zenodo.key},
-        )
-        files.pop("datapackage.json")
 
-    datapkg_descriptor = datapackager(files.values())
-    datapkg_json = json.dumps(datapkg_descriptor, indent=4, sort_keys=True)
-    datapkg = datapackage.Package(datapkg_descriptor)
-    if not datapkg.valid:
+def patch_datapackage(zenodo, datapackager, deposition, validator=None):
+    """
+    Update the datapackage.json file of the given deposition in place.
+
+    The existing descriptor is downloaded, the resources of files that are no longer
+    in the deposition are dropped, and only the files it doesn't describe with the
+    same checksum are run through the datapackager. The remaining resources are kept
+    as they are, apart from their download links, which change with every version.
+    The package metadata, including when it was created, is regenerated. If there is
+    no existing descriptor, a new one is made with new_datapackage.
+
+    Args:
+        zenodo: a zs.ZenodoStorage manager
+        datapackager: a data package generation function that takes a list of
+            Zenodo file descriptors and produces the complete frictionless
+            datapackage json.
+            e.g. pzs.frictionless.get_datapackager("eia860")
+        deposition: the deposition details, as retrieved from Zenodo. Must be
+                    in an editable state.
+        validator: a DescriptorValidator, which may hold cached results. A new one
+            is used if None.
+
+    Returns:
+        None: Raises errors on failure.
+
+    """
+    files = remote_fileinfo(zenodo, deposition)
+
+    if "datapackage.json" not in files:
+        return new_datapackage(zenodo, datapackager, deposition, validator)
+
+    previous = json.loads(zenodo.download(files["datapackage.json"]))
+    data_files = {k: v for k, v in files.items() if k != "datapackage.json"}
+    kept = {
+        resource["name"]: resource
+        for resource in previous["resources"]
+        if resource["name"] in data_files
+        and resource["hash"] == data_files[resource["name"]]["checksum"]
+    }
+
+    datapkg_descriptor = datapackager(
+        [v for k, v in data_files.items() if k not in kept]
+    )
+    zenodo.logger.info(
+        f"Regenerated {len(datapkg_descriptor['resources'])} datapackage resources, "
+        f"kept {len(kept)}"
+    )
+
+    for name, resource in kept.items():
+        url = data_files[name]["links"]["download"]
+        resource["path"] = url
+
+        if "remote_url" in resource:
+            resource["remote_url"] = url
+
+        datapkg_descriptor["resources"].append(resource)
+
+    order = {name: i for i, name in enumerate(data_files)}
+    datapkg_descriptor["resources"].sort(key=lambda r: order[r["name"]])
+    upload_datapackage(zenodo, deposition, files, datapkg_descriptor, validator)
+
+
+def upload_datapackage(zenodo, deposition, files, datapkg_descriptor, validator=None):
+    """
+    Validate a datapackage descriptor, and upload it as datapackage.json.
+
+    Args:
+        zenodo: a zs.ZenodoStorage manager
+        deposition: the deposition details, as retrieved from Zenodo. Must be
+                    in an editable state.
+        files: the files in the deposition, per remote_fileinfo(). An existing
+            datapackage.json is replaced.
+        datapkg_descriptor: the datapackage descriptor.
+        validator: a DescriptorValidator, which may hold cached results. A new one
+            is used if None.
+
+    Returns:
+        None: Raises errors on failure.
+
+    """
+    if validator is None:
+        validator = DescriptorValidator()
+
+    errors = validator.errors(datapkg_descriptor)
+    if errors:
         zenodo.logger.error(
-            f"Found the following {len(datapkg.errors)} datapackage validation errors:"
+            f"Found the following {len(errors)} datapackage validation errors:"
         )
-        for e in datapkg.errors:
+        for e in errors:
             print(f"  * {e}")
-        raise datapkg.errors[0]
+        raise ValueError(errors[0])
+
+    if "datapackage.json" in files:
+        zenodo.delete_file(files["datapackage.json"])
+
+    datapkg_json = json.dumps(datapkg_descriptor, indent=4, sort_keys=True)
     fcontents = io.BytesIO(bytes(datapkg_json, encoding="utf-8"))
     zenodo.upload(deposition, "datapackage.json", fcontents)
 
@@ -139,38 +240,215 @@ def action_steps(new_files, old_files):
 
     Args:
         new_files (dict): local files, per local_fileinfo(...)
-        old_files (dict): previous files, per remote_fileinfo(...)
+        old_files: previous files, either a dict per remote_fileinfo(...) or an
+            iterable of Zenodo file resources, such as ZenodoStorage.iter_files(...),
+            which is consumed only once.
 
     Returns:
         dict: containing:
-        {create: {<fileinfo>}, update: {<fileinfo>}, delete: {<fileinfo>}}
+        {create: {<fileinfo>}, update: {<fileinfo>}, delete: {<fileinfo>},
+        rename: {<fileinfo>}}
+
+        Renames are keyed by the new file name, and their file info is that of the
+        remote file, plus its local path and its previous name.
 
     """
-    actions = {"create": {}, "update": {}, "delete": {}}
+    actions = {"create": {}, "update": {}, "delete": {}, "rename": {}}
+    seen = set()
 
-    for filename, data in new_files.items():
+    if isinstance(old_files, Mapping):
+        old_files = old_files.items()
+    else:
+        old_files = ((item["filename"], item) for item in old_files)
+
+    for filename, data in old_files:
+        seen.add(filename)
+        local = new_files.get(filename)
 
         if filename == "datapackage.json":
             continue
 
-        if filename not in old_files:
-            actions["create"][filename] = data
-        elif data["checksum"] != old_files[filename]["checksum"]:
-            actions["update"][filename] = old_files[filename]
-            actions["update"][filename]["path"] = data["path"]
+        if local is None:
+            actions["delete"][filename] = data
+        elif local["checksum"] != data["checksum"]:
+            actions["update"][filename] = data
+            actions["update"][filename]["path"] = local["path"]
+            actions["update"][filename]["local_checksum"] = local["checksum"]
 
-    for filename, data in old_files.items():
+    for filename, data in new_files.items():
 
         if filename == "datapackage.json":
             continue
 
-        if filename not in new_files:
-            actions["delete"][filename] = data
+        if filename not in seen:
+            actions["create"][filename] = data
+
+    match_renames(actions)
 
     return actions
 
 
-def execute_actions(zenodo, deposition, datapackager, steps):
+def match_renames(actions):
+    """
+    Turn deleted and created files with the same checksum into renames.
+
+    Args:
+        actions (dict): the planned actions, per action_steps(...), which are
+            modified in place.
+
+    Returns:
+        None
+
+    """
+    deleted = {}
+
+    for filename, data in actions["delete"].items():
+        deleted.setdefault(data["checksum"], []).append(filename)
+
+    for filename, data in list(actions["create"].items()):
+        if not deleted.get(data["checksum"]):
+            continue
+
+        previous = deleted[data["checksum"]].pop(0)
+        actions["rename"][filename] = {
+            **actions["delete"].pop(previous),
+            "path": data["path"],
+            "previous_filename": previous,
+        }
+        del actions["create"][filename]
+
+
+def run_concurrently(tasks, jobs=1):
+    """
+    Run independent tasks, at most ``jobs`` at a time.
+
+    Args:
+        tasks (list): callables taking no arguments.
+        jobs (int): the maximum number of tasks to run at once. With a single job,
+            tasks are run one after another in the calling thread.
+
+    Returns:
+        list: the result of each task, in the order the tasks were given. With a
+        single job, the first task to fail raises its error straight away, and the
+        remaining tasks aren't run. Otherwise every task is run, and the error of the
+        first failed task, in the order given, is raised once they have all finished.
+
+    """
+    if jobs <= 1:
+        return [task() for task in tasks]
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(task) for task in tasks]
+
+    return [future.result() for future in futures]
+
+
+def upload_file(zenodo, deposition, path, filename, cache=None, store=None):
+    """
+    Upload a local file, checking that Zenodo received what was read.
+
+    The md5 checksum of the file is computed as it is uploaded, so the file is only
+    read once, and compared with the checksum Zenodo reports for what it received.
+
+    Args:
+        zenodo: a zs.ZenodoStorage manager
+        deposition: the deposition details, as retrieved from Zenodo. Must be
+            in an editable state.
+        path: path of the local file.
+        filename: name of the file in the deposition.
+        cache: a ChecksumCache, to store the checksum in, so that later runs don't
+            need to read the file again to compute it.
+        store: a ContentStore, to add the file to once it is uploaded.
+
+    Returns:
+        str: the md5 checksum of the uploaded file.
+
+    """
+    stat = os.stat(path)
+
+    with open(path, "rb") as f:
+        reader = HashingReader(f)
+        resource = zenodo.upload(deposition, filename, reader)
+
+    checksum = reader.hexdigest()
+    remote = resource.get("checksum")
+
+    if checksum is None:
+        raise RuntimeError(f"Upload of {path} stopped before the end of the file")
+
+    if remote is not None and remote.removeprefix("md5:") != checksum:
+        raise RuntimeError(
+            f"Upload of {path} is corrupt: read {checksum}, Zenodo received {remote}"
+        )
+
+    if cache is not None:
+        cache.put(path, checksum, stat=stat)
+
+    if store is not None:
+        store.add(path, checksum)
+
+    return checksum
+
+
+def file_operation(zenodo, deposition, files, action, filename, data, store=None):
+    """
+    Create, update, delete or rename a single file in an editable deposition.
+
+    Args:
+        zenodo: a zs.ZenodoStorage manager
+        deposition: the deposition details, as retrieved from Zenodo. Must be
+            in an editable state.
+        files: the deposition's files, per remote_fileinfo(...)
+        action: one of create, update, delete or rename.
+        filename: name of the file in the deposition.
+        data: the file info for the action, per action_steps(...)
+        store: a ContentStore, to add uploaded files to.
+
+    Returns:
+        None: Raises errors on failure.
+
+    """
+    path = os.path.join(data.get("path", ""), filename)
+
+    if action == "rename":
+        # The file may already be renamed if an earlier run failed halfway through
+        if data["previous_filename"] in files:
+            zenodo.rename_file(files[data["previous_filename"]], filename)
+
+        zenodo.logger.info(f"Renamed {data['previous_filename']} to {filename}")
+        return
+
+    # A file may already be gone if an earlier run failed halfway through
+    if action in ["update", "delete"] and filename in files:
+        zenodo.delete_file(files[filename])
+
+    if action == "delete":
+        zenodo.logger.info(f"Deleted {filename}")
+        return
+
+    checksum = upload_file(zenodo, deposition, path, filename, store=store)
+
+    if checksum != data.get("local_checksum", data["checksum"]):
+        zenodo.logger.warning(f"{path} changed after its checksum was computed")
+
+    if action == "create":
+        zenodo.logger.info(f"Uploaded {path}")
+    else:
+        zenodo.logger.info(f"Replaced {path}")
+
+
+def execute_actions(
+    zenodo,
+    deposition,
+    datapackager,
+    steps,
+    jobs=1,
+    journal=None,
+    validator=None,
+    incremental=True,
+    profiler=None,
+    store=None,
+):
     """
     Execute all actions from the given steps.
 
@@ -180,58 +458,95 @@ def execute_actions(zenodo, deposition, datapackager, steps):
         datapackager: a data package generation function that takes a list of
             Zenodo file descriptors and produces the complete frictionless
             datapackage json.
-            e.g. pzs.frictionless.eia860.datapackager
-        steps: dict of file info to create, update, and delete, per
+            e.g. pzs.frictionless.get_datapackager("eia860")
+        steps: dict of file info to create, update, delete and rename, per
             action_steps(...)
+        jobs: the number of file operations to run at once.
+        journal: an OperationJournal. Operations it records as completed against
+            the draft deposition are skipped, and newly completed ones are added.
+        validator: a DescriptorValidator for the new datapackage.json.
+        incremental: whether to patch the existing datapackage.json, rather than
+            generating it again from scratch.
+        profiler: a PhaseProfiler, to measure each phase of the execution.
+        store: a ContentStore, to add uploaded files to.
 
     Returns:
         New deposition data, per https://developers.zenodo.org/#depositions,
         or error on failure
 
     """
-    if steps["create"] == {} and steps["update"] == {} and steps["delete"] == {}:
+    if not any(steps.values()):
 
         zenodo.logger.info(f"No changes for deposition {deposition['title']}")
         return
 
+    if profiler is None:
+        profiler = PhaseProfiler(enabled=False)
+
     if deposition["submitted"]:
-        new_deposition = zenodo.new_deposition_version(deposition["conceptdoi"])
+        with profiler.phase("new_deposition_version"):
+            new_deposition = zenodo.new_deposition_version(
+                deposition["conceptdoi"], deposition=deposition
+            )
     else:
         new_deposition = deposition
 
-    nd_files = remote_fileinfo(zenodo, new_deposition)
+    # A new version comes back from Zenodo with the files it was created with, but
+    # an existing draft found by searching may be described as it was a while ago.
+    with profiler.phase("remote_fileinfo"):
+        nd_files = remote_fileinfo(
+            zenodo, new_deposition, current=deposition["submitted"]
+        )
 
-    for filename, data in steps["create"].items():
-        path = os.path.join(data["path"], filename)
+    def run(action, filename, data):
+        checksum = data.get("local_checksum", data["checksum"])
 
-        with open(path, "rb") as f:
-            zenodo.upload(new_deposition, filename, f)
-            zenodo.logger.info(f"Uploaded {path}")
+        if journal is not None and journal.completed(
+            new_deposition["id"], action, filename, checksum
+        ):
+            zenodo.logger.info(f"Skipping {action} of {filename}, already completed")
+            return
 
-    for filename, data in steps["update"].items():
-        requests.delete(
-            nd_files[filename]["links"]["self"], params={"access_token": zenodo.key}
-        )
+        file_operation(zenodo, new_deposition, nd_files, action, filename, data, store)
 
-        path = os.path.join(data["path"], filename)
+        if journal is not None:
+            journal.record(new_deposition["id"], action, filename, checksum)
 
-        with open(path, "rb") as f:
-            zenodo.upload(new_deposition, filename, f)
-            zenodo.logger.info(f"Replaced {path}")
+    tasks = [
+        partial(run, action, filename, data)
+        for action in ["create", "update", "delete", "rename"]
+        for filename, data in steps[action].items()
+    ]
 
-    for filename, data in steps["delete"].items():
-        requests.delete(
-            nd_files[filename]["links"]["self"], params={"access_token": zenodo.key}
-        )
-        zenodo.logger.info(f"Deleted {filename}")
+    # All file operations must finish before the datapackage is regenerated
+    with profiler.phase("file_operations"):
+        run_concurrently(tasks, jobs)
 
     # Replace the datapackage json
-    new_datapackage(zenodo, datapackager, new_deposition)
+    with profiler.phase("new_datapackage"):
+        if incremental:
+            patch_datapackage(zenodo, datapackager, new_deposition, validator)
+        else:
+            new_datapackage(zenodo, datapackager, new_deposition, validator)
+
+    if journal is not None:
+        journal.clear(new_deposition["id"])
 
     return new_deposition
 
 
-def initial_run(zenodo, key_id, metadata, datapackager, file_paths):
+def initial_run(
+    zenodo,
+    key_id,
+    metadata,
+    datapackager,
+    file_paths,
+    jobs=1,
+    validator=None,
+    profiler=None,
+    cache=None,
+    store=None,
+):
     """
     Create the first version of a Zenodo archive.
 
@@ -243,8 +558,14 @@ def initial_run(zenodo, key_id, metadata, datapackager, file_paths):
         datapackager: a data package generation function that takes a list of
             Zenodo file descriptors and produces the complete frictionless
             datapackage json.
-            e.g. pzs.frictionless.eia860.datapackager
+            e.g. pzs.frictionless.get_datapackager("eia860")
         file_paths: a list of files to upload
+        jobs: the number of files to upload at once.
+        validator: a DescriptorValidator for the new datapackage.json.
+        profiler: a PhaseProfiler, to measure each phase of the run.
+        cache: a ChecksumCache, to store the checksums of the files computed as
+            they are uploaded.
+        store: a ContentStore, to add uploaded files to.
 
     Returns:
         Deposition data per https://developers.zenodo.org/#depositions,
@@ -253,13 +574,17 @@ def initial_run(zenodo, key_id, metadata, datapackager, file_paths):
     """
     # Only run if the archive really has never been created
 
+    if profiler is None:
+        profiler = PhaseProfiler(enabled=False)
+
     if key_id not in metadata["keywords"]:
         # Not auto-correcting because it could mean a mixup between the
         # frictionless datapackage and the zenodo metadata
         raise ValueError("key_id missing from metadata keywords")
 
     try:
-        deposition = zenodo.get_deposition(f'keyword="{key_id}"')
+        with profiler.phase("get_deposition"):
+            deposition = zenodo.get_deposition(f'keyword="{key_id}"')
         exists = deposition is not None
     except RuntimeError:
         exists = False
@@ -274,15 +599,16 @@ def initial_run(zenodo, key_id, metadata, datapackager, file_paths):
     deposition = zenodo.create_deposition(metadata)
 
     # Upload all requested files
-    for fp in file_paths:
-        path, name = os.path.split(fp)
+    def upload(fp):
+        upload_file(zenodo, deposition, fp, os.path.basename(fp), cache, store)
+        zenodo.logger.info(f"Uploaded {fp}")
 
-        with open(fp, "rb") as f:
-            zenodo.upload(deposition, name, f)
-            zenodo.logger.info(f"Uploaded {fp}")
+    with profiler.phase("file_operations"):
+        run_concurrently([partial(upload, fp) for fp in file_paths], jobs)
 
     # Save the datapackage.json
-    new_datapackage(zenodo, datapackager, deposition)
+    with profiler.phase("new_datapackage"):
+        new_datapackage(zenodo, datapackager, deposition, validator=validator)
 
     return deposition
 
@@ -296,20 +622,24 @@ def parse_main():
         default=False,
         help="Review changes without uploading",
     )
+    add_client_arguments(parser)
     parser.add_argument(
-        "--sandbox",
+        "--initialize",
         action="store_true",
-        help="Use Zenodo sandbox server",
+        help="Produce the first version of a new Zenodo deposition.",
     )
     parser.add_argument(
-        "--loglevel",
-        help="Set log level",
-        default="INFO",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of files to upload, replace or delete at once.",
     )
     parser.add_argument(
-        "--initialize",
-        action="store_true",
-        help="Produce the first version of a new Zenodo deposition.",
+        "--hash-workers",
+        type=int,
+        default=None,
+        help="Number of processes used to compute file checksums. "
+        "Defaults to the number of CPUs.",
     )
     parser.add_argument(
         "--files",
@@ -317,15 +647,192 @@ def parse_main():
         help="Override default file list. By default, the most recent files "
         f"from {ROOT_DIR} will be uploaded.",
     )
+    parser.add_argument(
+        "--no-checksum-cache",
+        action="store_true",
+        default=False,
+        help="Recompute every file checksum rather than reusing those stored in "
+        f"{CHECKSUM_CACHE}.",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        default=None,
+        help="Write a JSON report of the time and bytes spent on API calls here.",
+    )
+    parser.add_argument(
+        "--metrics-prometheus",
+        default=None,
+        help="Write the API call metrics here as a Prometheus textfile, e.g. in the "
+        "node_exporter textfile collector directory.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="Measure the wall time, CPU time and peak memory of each phase of the "
+        "run, and log them at the end.",
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default=None,
+        help="With --profile, also write the measurements, and cProfile and "
+        "tracemalloc dumps of each phase, to this directory.",
+    )
+    parser.add_argument(
+        "--full-datapackage",
+        action="store_true",
+        default=False,
+        help="Generate datapackage.json again from scratch, rather than patching "
+        "the resources of the files that changed.",
+    )
+    add_content_store_arguments(parser)
     parser.add_argument(
         "deposition",
         help="Name of the Zenodo deposition. Supported: censusdp1tract, "
         "eia860, eia861, eia923, eia_bulk_elec, epacems, epacamd_eia, "
-        "ferc1, ferc2, ferc714, eia860m",
+        "ferc1, ferc2, ferc714, eia860m. Use 'zenodo_store audit' to check "
+        "existing archives, or 'zenodo_store mirror' to download them, instead.",
     )
     return parser.parse_args()
 
 
+def add_client_arguments(parser):
+    """Add the arguments choosing which Zenodo to use, and how, to a command."""
+    parser.add_argument(
+        "--sandbox",
+        action="store_true",
+        help="Use Zenodo sandbox server",
+    )
+    parser.add_argument(
+        "--api-root",
+        default=None,
+        help="Use the Zenodo API at this url, e.g. a local fake server.",
+    )
+    parser.add_argument(
+        "--loglevel",
+        help="Set log level",
+        default="INFO",
+    )
+
+
+def add_content_store_arguments(parser):
+    """Add the arguments choosing a content store to a command."""
+    parser.add_argument(
+        "--content-store",
+        default=None,
+        metavar="DIR",
+        help="Keep the files uploaded or downloaded in a local store here, keyed by "
+        "checksum, and take files from it rather than downloading them again.",
+    )
+    parser.add_argument(
+        "--content-store-size",
+        type=float,
+        default=None,
+        metavar="GIB",
+        help="Remove the least recently used files from the content store once it "
+        "holds more than this many GiB. Unbounded by default.",
+    )
+
+
+def parse_audit(argv):
+    """Process the arguments of the audit command."""
+    parser = argparse.ArgumentParser(
+        prog="zenodo_store audit",
+        description="Check the files archived on Zenodo against their "
+        "datapackage.json and the local scrape tree, without changing anything.",
+    )
+    add_client_arguments(parser)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="Number of depositions to check at once.",
+    )
+    parser.add_argument(
+        "--hash-workers",
+        type=int,
+        default=None,
+        help="Number of processes used to compute file checksums. "
+        "Defaults to the number of CPUs.",
+    )
+    parser.add_argument(
+        "--no-checksum-cache",
+        action="store_true",
+        default=False,
+        help="Recompute every file checksum rather than reusing those stored in "
+        f"{CHECKSUM_CACHE}.",
+    )
+    parser.add_argument(
+        "--remote-only",
+        action="store_true",
+        default=False,
+        help="Only compare the archives with their datapackage.json, not with the "
+        "local scrape tree.",
+    )
+    parser.add_argument(
+        "depositions",
+        nargs="*",
+        help="Names of the Zenodo depositions to check. By default, all of them.",
+    )
+    return parser.parse_args(argv)
+
+
+def parse_mirror(argv):
+    """Process the arguments of the mirror command."""
+    parser = argparse.ArgumentParser(
+        prog="zenodo_store mirror",
+        description="Download the latest version of archived depositions, "
+        "verifying every file against the deposition's datapackage.json.",
+    )
+    add_client_arguments(parser)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="Number of files to download at once.",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=MIRROR_DIR,
+        help="Where to write the files, in a directory per deposition. "
+        f"Defaults to {MIRROR_DIR}.",
+    )
+    parser.add_argument(
+        "--no-checksum-cache",
+        action="store_true",
+        default=False,
+        help="Recompute the checksum of every file already downloaded, rather than "
+        f"reusing those stored in {CHECKSUM_CACHE}.",
+    )
+    add_content_store_arguments(parser)
+    parser.add_argument(
+        "depositions",
+        nargs="*",
+        help="Names of the Zenodo depositions to download. By default, all of them.",
+    )
+    return parser.parse_args(argv)
+
+
+def latest_files(deposition_name):
+    """
+    Find the most recently scraped copy of an archive.
+
+    Args:
+        deposition_name: str name for a deposition, as input from the cli.
+
+    Returns:
+        list: the paths of the files scraped most recently, if any.
+
+    """
+    sources = os.path.join(ROOT_DIR, deposition_name, "*")
+    previous = sorted(glob.glob(sources))
+
+    if previous == []:
+        return []
+
+    return glob.glob(os.path.join(previous[-1], "*"))
+
+
 def archive_selection(deposition_name: str) -> dict[str, Any]:
     """
     Produce the datasets needed to run the archiver.
@@ -342,49 +849,210 @@ def archive_selection(deposition_name: str) -> dict[str, Any]:
         }
 
     """
-
-    def _latest_files(name):
-        sources = os.path.join(ROOT_DIR, name, "*")
-        previous = sorted(glob.glob(sources))
-
-        if previous == []:
-            return []
-
-        return glob.glob(os.path.join(previous[-1], "*"))
-
     if deposition_name not in pzs.zs.metadata.UUIDS:
         raise ValueError(f"No UUID found for: {deposition_name}")
 
-    if deposition_name not in pzs.frictionless.__dict__:
-        raise ValueError(f"No datapackager method defined for {deposition_name}")
+    datapackager = pzs.frictionless.get_datapackager(deposition_name)
 
-    if not _latest_files(deposition_name):
+    if not latest_files(deposition_name):
         logger.warning(f"No recent files found in {ROOT_DIR}/{deposition_name}")
 
     return {
         "key_id": pzs.zs.metadata.UUIDS[deposition_name],
         "metadata": pzs.zs.metadata.generate_metadata(deposition_name),
-        "datapackager": pzs.frictionless.__dict__[deposition_name].datapackager,
-        "latest_files": _latest_files(deposition_name),
+        "datapackager": datapackager,
+        "latest_files": latest_files(deposition_name),
     }
 
 
-def main():
-    """A CLI for the PUDL Zenodo Storage system."""
-    args = parse_main()
+def content_store(args):
+    """Open the content store, if one was requested, for use in a with statement."""
+    if args.content_store is None:
+        return nullcontext()
+
+    max_size = None
+
+    if args.content_store_size is not None:
+        max_size = int(args.content_store_size * 2**30)
+
+    return ContentStore(args.content_store, max_size)
 
+
+def archive_fileinfo(zenodo, files, args):
+    """Collect the local file info, using the checksum cache unless told not to."""
+    if args.no_checksum_cache:
+        return local_fileinfo(files, workers=args.hash_workers)
+
+    with ChecksumCache(CHECKSUM_CACHE) as cache:
+        local = local_fileinfo(files, workers=args.hash_workers, cache=cache)
+        evicted = cache.evict()
+        zenodo.logger.debug(f"Evicted {evicted} stale checksums from the cache")
+
+    return local
+
+
+def write_metrics(zenodo, args):
+    """Export the metrics of the API calls made during a run, as requested."""
+    labels = {"dataset": args.deposition}
+
+    if args.metrics_json is not None:
+        zenodo.metrics.write_json(args.metrics_json, labels)
+
+    if args.metrics_prometheus is not None:
+        zenodo.metrics.write_prometheus(args.metrics_prometheus, labels)
+
+
+def zenodo_client(args):
+    """Connect to Zenodo, per the command line arguments."""
     if args.sandbox:
         zenodo_upload_token = os.environ["ZENODO_SANDBOX_TOKEN_UPLOAD"]
     else:
         zenodo_upload_token = os.environ["ZENODO_TOKEN_UPLOAD"]
 
-    zenodo = ZenodoStorage(
+    return ZenodoStorage(
         key=zenodo_upload_token,
         testing=args.sandbox,
         loglevel=args.loglevel,
+        api_root=args.api_root,
+        pool_size=max(args.jobs, 10),
     )
 
-    sel = archive_selection(args.deposition)
+
+def run_audit(zenodo, args):
+    """
+    Check the selected depositions, per the audit command line arguments.
+
+    The depositions are checked concurrently, and a JSON report of each is printed.
+
+    Returns:
+        int: the exit status, 1 if any problems were found, and 0 otherwise.
+
+    """
+    names = args.depositions or list(pzs.zs.metadata.UUIDS)
+    unknown = set(names) - set(pzs.zs.metadata.UUIDS)
+
+    if unknown:
+        raise ValueError(f"No UUID found for: {', '.join(sorted(unknown))}")
+
+    def audit(name, cache):
+        local = None
+        files = latest_files(name)
+
+        if not args.remote_only and files:
+            local = local_fileinfo(files, workers=args.hash_workers, cache=cache)
+        elif not args.remote_only:
+            zenodo.logger.warning(f"No local files for {name}, checking Zenodo only")
+
+        # Report a deposition that can't be looked up or listed, e.g. because its
+        # UUID matches more than one, without abandoning the rest of the audit
+        try:
+            return audit_deposition(zenodo, pzs.zs.metadata.UUIDS[name], local)
+        except (RuntimeError, ValueError, requests.RequestException) as err:
+            return {"problems": [f"{type(err).__name__}: {err}"]}
+
+    if args.no_checksum_cache:
+        cache = nullcontext()
+    else:
+        cache = ChecksumCache(CHECKSUM_CACHE)
+
+    with cache as checksums:
+        reports = run_concurrently(
+            [partial(audit, name, checksums) for name in names], args.jobs
+        )
+
+    print(json.dumps(dict(zip(names, reports)), indent=4))
+
+    return int(any(report["problems"] for report in reports))
+
+
+def run_mirror(zenodo, args):
+    """
+    Download the selected depositions, per the mirror command line arguments.
+
+    Returns:
+        int: the exit status, 0 once every deposition is downloaded.
+
+    """
+    names = args.depositions or list(pzs.zs.metadata.UUIDS)
+    unknown = set(names) - set(pzs.zs.metadata.UUIDS)
+
+    if unknown:
+        raise ValueError(f"No UUID found for: {', '.join(sorted(unknown))}")
+
+    if args.no_checksum_cache:
+        cache = nullcontext()
+    else:
+        cache = ChecksumCache(CHECKSUM_CACHE)
+
+    with cache as checksums, content_store(args) as store:
+        for name in names:
+            key_id = pzs.zs.metadata.UUIDS[name]
+            deposition = zenodo.get_deposition(f'keywords: "{key_id}"')
+
+            if deposition is None:
+                raise ValueError(f"Deposition not found for {name}")
+
+            if not deposition["submitted"]:
+                zenodo.logger.warning(f"{name} is an unpublished draft")
+
+            directory = os.path.join(args.output_dir, name)
+            report = mirror_deposition(
+                zenodo,
+                deposition,
+                directory,
+                jobs=args.jobs,
+                cache=checksums,
+                store=store,
+            )
+            counts = ", ".join(
+                f"{sum(v == status for v in report.values())} {status}"
+                for status in ["downloaded", "resumed", "linked", "skipped"]
+            )
+            zenodo.logger.info(f"Mirrored {name} to {directory}: {counts}")
+
+    return 0
+
+
+# Commands other than archiving a deposition, by name.
+COMMANDS = {
+    "audit": (parse_audit, run_audit),
+    "mirror": (parse_mirror, run_mirror),
+}
+
+
+def main():
+    """A CLI for the PUDL Zenodo Storage system."""
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        parse, run = COMMANDS[sys.argv[1]]
+        args = parse(sys.argv[2:])
+        return run(zenodo_client(args), args)
+
+    args = parse_main()
+    zenodo = zenodo_client(args)
+    profiler = PhaseProfiler(enabled=args.profile, output_dir=args.profile_dir)
+
+    try:
+        run_archiver(zenodo, args, profiler)
+    finally:
+        write_metrics(zenodo, args)
+        write_profile(zenodo, args, profiler)
+
+
+def write_profile(zenodo, args, profiler):
+    """Report the time and memory spent in each phase of a run, as requested."""
+    if not args.profile:
+        return
+
+    zenodo.logger.info(f"Time and memory spent in each phase:\n{profiler.report()}")
+
+    if args.profile_dir is not None:
+        profiler.write_json(os.path.join(args.profile_dir, "phases.json"))
+
+
+def run_archiver(zenodo, args, profiler):
+    """Archive the selected dataset, per the command line arguments."""
+    with profiler.phase("archive_selection"):
+        sel = archive_selection(args.deposition)
 
     if getattr(args, "files", None) is None:
         files = sel["latest_files"]
@@ -397,33 +1065,70 @@ def main():
         if args.noop:
             for f in files:
                 zenodo.logger.info(f"Archive would contain: {f}")
-            sys.exit()
-
-        result = initial_run(
-            zenodo, sel["key_id"], sel["metadata"], sel["datapackager"], files
-        )
+            return
+
+        validator = DescriptorValidator(VALIDATION_CACHE)
+
+        if args.no_checksum_cache:
+            cache = nullcontext()
+        else:
+            cache = ChecksumCache(CHECKSUM_CACHE)
+
+        with validator, cache as checksums, content_store(args) as store:
+            result = initial_run(
+                zenodo,
+                sel["key_id"],
+                sel["metadata"],
+                sel["datapackager"],
+                files,
+                jobs=args.jobs,
+                validator=validator,
+                profiler=profiler,
+                cache=checksums,
+                store=store,
+            )
 
         zenodo.logger.info(
             "Your new deposition archive is ready for review at "
             f"{result['links']['html']}"
         )
-        sys.exit()
+        return
 
-    local = local_fileinfo(files)
+    with profiler.phase("local_fileinfo"):
+        local = archive_fileinfo(zenodo, files, args)
 
-    deposition = zenodo.get_deposition(f"keywords: \"{sel['key_id']}\"")
+    with profiler.phase("get_deposition"):
+        deposition = zenodo.get_deposition(f"keywords: \"{sel['key_id']}\"")
 
     if deposition is None:
         raise ValueError("Deposition not found. You may need to --initialize")
 
-    remote = remote_fileinfo(zenodo, deposition)
-    steps = action_steps(local, remote)
+    # Remote files are listed page by page as the steps are planned
+    with profiler.phase("action_steps"):
+        steps = action_steps(local, zenodo.iter_files(deposition))
 
     if args.noop:
         print(json.dumps(steps, indent=4, sort_keys=True))
-        sys.exit()
+        return
 
-    result = execute_actions(zenodo, deposition, sel["datapackager"], steps)
+    validator = DescriptorValidator(VALIDATION_CACHE)
+
+    storage = content_store(args)
+    execute = profiler.phase("execute_actions")
+
+    with OperationJournal(JOURNAL) as journal, validator, storage as store, execute:
+        result = execute_actions(
+            zenodo,
+            deposition,
+            sel["datapackager"],
+            steps,
+            jobs=args.jobs,
+            journal=journal,
+            validator=validator,
+            incremental=not args.full_datapackage,
+            profiler=profiler,
+            store=store,
+        )
 
     if result is not None:
         zenodo.logger.info(
@@ -433,4 +1138,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
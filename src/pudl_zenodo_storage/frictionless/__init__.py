@@ -1 +1,37 @@
 """Create Frictionless Data Packages to wrap raw PUDL input data archives."""
+import importlib
+from collections.abc import Callable
+
+DATAPACKAGERS: dict[str, str] = {
+    "censusdp1tract": "pudl_zenodo_storage.frictionless.censusdp1tract",
+    "eia860": "pudl_zenodo_storage.frictionless.eia860",
+    "eia860m": "pudl_zenodo_storage.frictionless.eia860m",
+    "eia861": "pudl_zenodo_storage.frictionless.eia861",
+    "eia923": "pudl_zenodo_storage.frictionless.eia923",
+    "eia_bulk_elec": "pudl_zenodo_storage.frictionless.eia_bulk_elec",
+    "epacamd_eia": "pudl_zenodo_storage.frictionless.epacamd_eia",
+    "epacems": "pudl_zenodo_storage.frictionless.epacems",
+    "ferc1": "pudl_zenodo_storage.frictionless.ferc1",
+    "ferc2": "pudl_zenodo_storage.frictionless.ferc2",
+    "ferc714": "pudl_zenodo_storage.frictionless.ferc714",
+}
+
+
+def get_datapackager(name: str) -> Callable:
+    """
+    Import the datapackager for a dataset.
+
+    The datapackager modules depend on the PUDL metadata, which is slow to import,
+    so only the module for the selected dataset is imported, when it's first needed.
+
+    Args:
+        name: the name of the dataset, e.g. eia860.
+
+    Returns:
+        the datapackager function of the dataset's module.
+
+    """
+    if name not in DATAPACKAGERS:
+        raise ValueError(f"No datapackager method defined for {name}")
+
+    return importlib.import_module(DATAPACKAGERS[name]).datapackager
@@ -15,6 +15,28 @@ MEDIA_TYPES: dict[str, str] = {
     "csv": "text/csv",
 }
 
+# The fields of a Resource, and their types, as checked by validate_resources().
+RESOURCE_FIELDS: dict[str, type] = {
+    "profile": str,
+    "name": str,
+    "path": str,
+    "remote_url": str,
+    "title": str,
+    "parts": dict,
+    "encoding": str,
+    "mediatype": str,
+    "format": str,
+    "bytes": int,
+    "hash": str,
+}
+
+RESOURCE_DEFAULTS: dict[str, str] = {
+    "profile": "data-resource",
+    "encoding": "utf-8",
+}
+
+HTTP_URL = re.compile(r"https?://[^\s/?#]+[^\s]*", re.IGNORECASE)
+
 
 class Resource(BaseModel):
     """
@@ -78,13 +100,39 @@ class DataPackage(BaseModel):
         Returns:
             DataPackage
         """
-        resources = [
-            archiver(
-                x["filename"], x["links"]["download"], x["filesize"], x["checksum"]
-            )
-            for x in dfiles
-        ]
+        resources = _archive_resources(dfiles, archiver)
+
+        return cls(**cls._base_dict(data_source, resources))
+
+    @classmethod
+    def raw_datapackage_dict(cls, data_source, dfiles, archiver):
+        """
+        Produce a data package descriptor from DataSource and archiver function.
+
+        Gives the same result as ``from_resource_archiver()`` followed by
+        ``to_raw_datapackage_dict()``, but only the package level metadata goes
+        through the pydantic models. The resources are checked together by
+        validate_resources(), and passed through as they are, which is much faster
+        for archives with thousands of files.
+
+        Args:
+            data_source: DataSource object.
+            dfiles: iterable of file descriptors, as expected from Zenodo.
+                https://developers.zenodo.org/#deposition-files
+            archiver: Callable that constructs Resource from file descriptor.
+
+        Returns:
+            dict: a data package descriptor.
+        """
+        resources = validate_resources(_archive_resources(dfiles, archiver))
+        descriptor = cls(**cls._base_dict(data_source, [])).to_raw_datapackage_dict()
+        descriptor.update(resources=resources)
 
+        return descriptor
+
+    @staticmethod
+    def _base_dict(data_source, resources):
+        """Collect the DataPackage fields, given the DataSource and resources."""
         base_dict = data_source.dict(
             exclude={
                 "field_namespace",
@@ -104,7 +152,7 @@ class DataPackage(BaseModel):
             created=datetime.utcnow(),
         )
 
-        return cls(**base_dict)
+        return base_dict
 
     def to_raw_datapackage_dict(self):
         """
@@ -119,6 +167,66 @@ class DataPackage(BaseModel):
         return descriptor
 
 
+def _archive_resources(dfiles, archiver):
+    """Produce the resource descriptors for all the Zenodo file descriptors."""
+    return [
+        archiver(x["filename"], x["links"]["download"], x["filesize"], x["checksum"])
+        for x in dfiles
+    ]
+
+
+def _resource_errors(resource):
+    """List the ways in which a resource descriptor doesn't fit the Resource model."""
+    errors = []
+
+    for field, field_type in RESOURCE_FIELDS.items():
+        value = resource.get(field)
+
+        if value is None:
+            errors.append(f"{field} is missing")
+        elif not isinstance(value, field_type) or isinstance(value, bool):
+            errors.append(f"{field} should be {field_type.__name__}: {value!r}")
+
+    for field in ["path", "remote_url"]:
+        url = resource.get(field)
+
+        if isinstance(url, str) and not HTTP_URL.fullmatch(url):
+            errors.append(f"{field} is not an http(s) URL: {url!r}")
+
+    return errors
+
+
+def validate_resources(resources):
+    """
+    Check a batch of resource descriptors against the Resource model.
+
+    A cheaper equivalent of building a Resource for each descriptor: missing fields
+    with defaults are filled in, and fields the model doesn't know are dropped. All
+    the problems found are reported together.
+
+    Args:
+        resources (list): resource descriptors, as produced by an archiver.
+
+    Returns:
+        list: the checked resource descriptors.
+
+    """
+    checked = []
+    errors = []
+
+    for resource in resources:
+        resource = {**RESOURCE_DEFAULTS, **resource}
+        errors += [f"{resource.get('name')}: {e}" for e in _resource_errors(resource)]
+        checked.append({field: resource.get(field) for field in RESOURCE_FIELDS})
+
+    if errors:
+        raise ValueError(
+            f"{len(errors)} invalid resource fields:\n" + "\n".join(errors)
+        )
+
+    return checked
+
+
 def annual_archive_resource(name, url, size, md5_hash):
     """
     Produce the resource descriptor for a single file.
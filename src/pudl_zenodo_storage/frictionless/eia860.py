@@ -16,6 +16,6 @@ def datapackager(dfiles):
         dict: fields suited to the frictionless datapackage spec
         https://frictionlessdata.io/specs/data-package/
     """
-    return DataPackage.from_resource_archiver(
+    return DataPackage.raw_datapackage_dict(
         DataSource.from_id("eia860"), dfiles, annual_archive_resource
-    ).to_raw_datapackage_dict()
+    )
@@ -19,6 +19,6 @@ def datapackager(dfiles):
         dict: fields suited to the frictionless datapackage spec
         https://frictionlessdata.io/specs/data-package/
     """
-    return DataPackage.from_resource_archiver(
+    return DataPackage.raw_datapackage_dict(
         DataSource.from_id("eia860m"), dfiles, archive_resource_year_month
-    ).to_raw_datapackage_dict()
+    )
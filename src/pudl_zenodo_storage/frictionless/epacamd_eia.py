@@ -16,8 +16,8 @@ def datapackager(dfiles):
         dict: fields suited to the frictionless datapackage spec
         https://frictionlessdata.io/specs/data-package/
     """
-    return DataPackage.from_resource_archiver(
+    return DataPackage.raw_datapackage_dict(
         DataSource.from_id("epacamd_eia"),
         dfiles,
         minimal_archiver,
-    ).to_raw_datapackage_dict()
+    )
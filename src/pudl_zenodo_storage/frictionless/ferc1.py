@@ -17,6 +17,6 @@ def datapackager(dfiles):
         https://frictionlessdata.io/specs/data-package/
 
     """
-    return DataPackage.from_resource_archiver(
+    return DataPackage.raw_datapackage_dict(
         DataSource.from_id("ferc1"), dfiles, annual_archive_resource
-    ).to_raw_datapackage_dict()
+    )
@@ -17,6 +17,6 @@ def datapackager(dfiles):
         https://frictionlessdata.io/specs/data-package/
 
     """
-    return DataPackage.from_resource_archiver(
+    return DataPackage.raw_datapackage_dict(
         DataSource.from_id("ferc714"), dfiles, minimal_archiver
-    ).to_raw_datapackage_dict()
+    )
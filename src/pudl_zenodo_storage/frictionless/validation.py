@@ -0,0 +1,155 @@
+"""Validate data package descriptors offline, against vendored profiles."""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from functools import cache
+from pathlib import Path
+
+# Copies of the data-package and data-resource profiles shipped with datapackage 1.15,
+# so validation never has to resolve a profile over the network.
+PROFILES_DIR = Path(__file__).parent / "profiles"
+
+# Entries in the validation cache that haven't been used for this long are dropped.
+MAX_AGE = 30 * 24 * 60 * 60
+
+
+@cache
+def _profile(name):
+    """Load a profile and compile its validator, once per process."""
+    # Imported here, as jsonschema is slow to import.
+    from jsonschema import Draft4Validator
+
+    schema = json.loads((PROFILES_DIR / f"{name}.json").read_text())
+    Draft4Validator.check_schema(schema)
+    digest = hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()
+
+    return Draft4Validator(schema), digest
+
+
+@cache
+def _package_profile():
+    """Compile the data-package profile, leaving the resources themselves unchecked."""
+    from jsonschema import Draft4Validator
+
+    schema = json.loads((PROFILES_DIR / "data-package.json").read_text())
+    schema["properties"]["resources"]["items"] = {"type": "object"}
+
+    return Draft4Validator(schema)
+
+
+def _error_messages(validator, descriptor, prefix=()):
+    """Describe every way in which a descriptor doesn't fit a profile."""
+    return [
+        f"Descriptor validation error: {error.message} at "
+        f'"{"/".join(map(str, [*prefix, *error.path]))}" in descriptor and at '
+        f'"{"/".join(map(str, error.schema_path))}" in profile'
+        for error in validator.iter_errors(descriptor)
+    ]
+
+
+class DescriptorValidator:
+    """
+    Validate data package descriptors, with results cached per resource.
+
+    The package level metadata is validated against the data-package profile, and
+    each resource against the data-resource profile, both read from local copies and
+    compiled once per process. A resource that has already passed is identified by
+    a hash of its content (and of the profile), and isn't validated again. If a path
+    is given, the hashes of valid resources are kept in a SQLite database, so a later
+    run only pays to validate the resources that changed.
+    """
+
+    def __init__(self, path=None):
+        """
+        Prepare a validator.
+
+        Args:
+            path (str): location of the SQLite database of valid resources. If None,
+                results are only cached in memory.
+
+        Returns:
+            DescriptorValidator
+
+        """
+        self.path = path
+        self.valid = {}
+        self.connection = None
+
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.connection = sqlite3.connect(path)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS valid_resources "
+                "(digest TEXT PRIMARY KEY, used REAL)"
+            )
+            self.valid = dict(
+                self.connection.execute("SELECT digest, used FROM valid_resources")
+            )
+
+    def __enter__(self):
+        """Use the validator as a context manager."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Save the cache and close the database."""
+        self.close()
+
+    def _digest(self, resource):
+        """Identify a resource by its content and the profile it is checked against."""
+        _, profile_digest = _profile("data-resource")
+        content = json.dumps(resource, sort_keys=True, default=str)
+
+        return hashlib.sha256(f"{profile_digest}:{content}".encode()).hexdigest()
+
+    def errors(self, descriptor):
+        """
+        Validate a data package descriptor.
+
+        Args:
+            descriptor (dict): a data package descriptor, including its resources.
+
+        Returns:
+            list: descriptions of the validation errors found, empty if the
+            descriptor is valid.
+
+        """
+        errors = _error_messages(_package_profile(), descriptor)
+        resource_validator, _ = _profile("data-resource")
+        now = time.time()
+
+        for i, resource in enumerate(descriptor.get("resources", [])):
+            digest = self._digest(resource)
+
+            if digest in self.valid:
+                self.valid[digest] = now
+                continue
+
+            resource_errors = _error_messages(
+                resource_validator, resource, prefix=("resources", i)
+            )
+
+            if resource_errors:
+                errors += resource_errors
+            else:
+                self.valid[digest] = now
+
+        return errors
+
+    def close(self):
+        """Save the valid resources, dropping those long unused, and close."""
+        if self.connection is None:
+            return
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO valid_resources VALUES (?, ?)",
+                self.valid.items(),
+            )
+            self.connection.execute(
+                "DELETE FROM valid_resources WHERE used < ?", (time.time() - MAX_AGE,)
+            )
+
+        self.connection.close()
+        self.connection = None
@@ -0,0 +1,111 @@
+"""Record file operations completed against draft depositions."""
+import os
+import sqlite3
+import threading
+
+
+class OperationJournal:
+    """
+    Persistent log of completed file operations, backed by SQLite.
+
+    Each create, update, delete or rename is recorded, as soon as it succeeds, against
+    the id of the draft deposition it was applied to and the checksum of the file
+    involved. If a run is interrupted, the next run against the same draft can skip
+    everything that was already done. The journal for a deposition is cleared once
+    the run that updates it completes.
+    """
+
+    def __init__(self, path):
+        """
+        Open (or create) an operation journal.
+
+        Args:
+            path (str): location of the SQLite database file.
+
+        Returns:
+            OperationJournal
+
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS operations ("
+            "deposition_id INTEGER, action TEXT, filename TEXT, checksum TEXT, "
+            "PRIMARY KEY (deposition_id, action, filename))"
+        )
+        self.connection.commit()
+
+    def __enter__(self):
+        """Use the journal as a context manager."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the database."""
+        self.close()
+
+    def record(self, deposition_id, action, filename, checksum):
+        """
+        Record a completed operation.
+
+        Args:
+            deposition_id (int): id of the draft deposition.
+            action (str): one of create, update, delete or rename.
+            filename (str): name of the file in the deposition.
+            checksum (str): md5 checksum of the file uploaded or deleted.
+
+        Returns:
+            None
+
+        """
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO operations VALUES (?, ?, ?, ?)",
+                (deposition_id, action, filename, checksum),
+            )
+            self.connection.commit()
+
+    def completed(self, deposition_id, action, filename, checksum):
+        """
+        Check whether an operation has already been completed.
+
+        Args:
+            deposition_id (int): id of the draft deposition.
+            action (str): one of create, update, delete or rename.
+            filename (str): name of the file in the deposition.
+            checksum (str): md5 checksum of the file to be uploaded or deleted.
+
+        Returns:
+            bool
+
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT checksum FROM operations "
+                "WHERE deposition_id = ? AND action = ? AND filename = ?",
+                (deposition_id, action, filename),
+            ).fetchone()
+
+        return row is not None and row[0] == checksum
+
+    def clear(self, deposition_id):
+        """
+        Forget all the operations recorded against a deposition.
+
+        Args:
+            deposition_id (int): id of the draft deposition.
+
+        Returns:
+            None
+
+        """
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM operations WHERE deposition_id = ?", (deposition_id,)
+            )
+            self.connection.commit()
+
+    def close(self):
+        """Close the database."""
+        self.connection.close()
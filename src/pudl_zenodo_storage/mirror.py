@@ -0,0 +1,252 @@
+"""Download copies of archived depositions, resuming where earlier runs stopped."""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from hashlib import md5
+
+import requests
+
+from pudl_zenodo_storage.checksum import CHUNK_SIZE, file_md5
+
+
+def _local_md5(path, cache=None):
+    """The md5 checksum of a local file, from the cache if it is there."""
+    checksum = None if cache is None else cache.get(path)
+
+    if checksum is None:
+        stat = os.stat(path)
+        checksum = file_md5(path)
+
+        if cache is not None:
+            cache.put(path, checksum, stat=stat)
+
+    return checksum
+
+
+def _partial_md5(path):
+    """Hash a partly downloaded file, to carry on hashing where it ends."""
+    hash_md5 = md5()  # nosec: B324
+
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            hash_md5.update(chunk)
+
+    return hash_md5
+
+
+def _fetch(zenodo, file_resource, part):
+    """
+    Download a file into a partial file, continuing from where it ends.
+
+    Returns:
+        tuple: the md5 hash of the whole partial file, and whether it was resumed.
+
+    """
+    start = os.path.getsize(part) if os.path.exists(part) else 0
+
+    # A partial file that is already complete can't be continued, only replaced
+    if start >= file_resource["filesize"]:
+        start = 0
+
+    response = zenodo.download_stream(file_resource, start)
+    resumed = start > 0 and response.status_code == 206
+
+    with response, open(part, "ab" if resumed else "wb") as f:
+        hash_md5 = _partial_md5(part) if resumed else md5()  # nosec: B324
+
+        for chunk in response.iter_content(CHUNK_SIZE):
+            f.write(chunk)
+            hash_md5.update(chunk)
+
+    return hash_md5, resumed
+
+
+def _download(zenodo, file_resource, part):
+    """
+    Download a file into a partial file, resuming after errors per the retry policy.
+
+    Returns:
+        tuple: the md5 hash of the downloaded file, and whether any of it was
+        downloaded by an earlier attempt or run.
+
+    """
+    attempt = 0
+
+    while True:
+        attempt += 1
+
+        try:
+            return _fetch(zenodo, file_resource, part)
+        except (
+            requests.ConnectionError,
+            requests.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+        ) as err:
+            if not zenodo.retry.should_retry(attempt):
+                raise
+
+            delay = zenodo.retry.delay(attempt)
+            zenodo.logger.warning(
+                f"Download of {file_resource['filename']} failed ({err}), "
+                f"resuming in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+
+def _download_verified(zenodo, file_resource, part, expected):
+    """
+    Download a file into a partial file, and check it has the expected checksum.
+
+    A resumed download that fails the check may have continued a partial file left
+    by an earlier version of the file, so it is discarded and the whole file is
+    downloaded once more before giving up.
+
+    Returns:
+        bool: whether any of the file was downloaded by an earlier attempt or run.
+
+    """
+    hash_md5, resumed = _download(zenodo, file_resource, part)
+
+    if resumed and hash_md5.hexdigest() != expected:
+        zenodo.logger.warning(
+            f"Resumed download of {file_resource['filename']} is corrupt, "
+            "downloading all of it again"
+        )
+        os.remove(part)
+        hash_md5, resumed = _download(zenodo, file_resource, part)
+
+    if hash_md5.hexdigest() != expected:
+        os.remove(part)
+        raise RuntimeError(
+            f"Download of {file_resource['filename']} is corrupt: expected "
+            f"{expected}, got {hash_md5.hexdigest()}"
+        )
+
+    return resumed
+
+
+def mirror_file(
+    zenodo, file_resource, directory, expected=None, cache=None, store=None
+):
+    """
+    Download a deposition file into a directory, unless it is already there.
+
+    The file is taken from the content store if it is there. Otherwise it is
+    downloaded into a ``.part`` file, which is only renamed once its checksum is
+    verified, and then added to the store. If the download is interrupted, it is
+    resumed with a range request: straight away if the retry policy allows, or by a
+    later run. A resumed file that fails verification is downloaded again in full.
+
+    Args:
+        zenodo: a zs.ZenodoStorage manager
+        file_resource: dict of the deposition file resource, per
+            https://developers.zenodo.org/#deposition-files
+        directory (str): where to write the file.
+        expected (str): the md5 checksum the file must have, e.g. from the
+            deposition's datapackage.json. Defaults to the checksum on Zenodo.
+        cache (ChecksumCache): checksums of files already in the directory.
+        store (ContentStore): files uploaded or downloaded before, by checksum.
+
+    Returns:
+        str: skipped, linked, downloaded or resumed.
+
+    """
+    path = os.path.join(directory, file_resource["filename"])
+    part = path + ".part"
+
+    if expected is None:
+        expected = file_resource["checksum"].removeprefix("md5:")
+
+    if os.path.exists(path) and _local_md5(path, cache) == expected:
+        return "skipped"
+
+    if store is not None and store.place(expected, path):
+        if cache is not None:
+            cache.put(path, expected)
+
+        return "linked"
+
+    resumed = _download_verified(zenodo, file_resource, part, expected)
+    os.replace(part, path)
+
+    if cache is not None:
+        cache.put(path, expected)
+
+    if store is not None:
+        store.add(path, expected)
+
+    return "resumed" if resumed else "downloaded"
+
+
+def _write_atomic(path, content):
+    """Write a file in one step, so an interrupted run never leaves it half written."""
+    with open(path + ".part", "wb") as f:
+        f.write(content)
+
+    os.replace(path + ".part", path)
+
+
+def mirror_deposition(zenodo, deposition, directory, jobs=4, cache=None, store=None):
+    """
+    Download every file of a deposition, verified against its datapackage.json.
+
+    Data files are checked against the hashes of their resources in the deposition's
+    datapackage.json, which is written last, once they have all been verified.
+    Files that are already present with the right checksum are skipped, so running
+    this again completes an interrupted mirror or updates it to a new version.
+    Nothing is deleted from the directory.
+
+    Args:
+        zenodo: a zs.ZenodoStorage manager
+        deposition: the deposition details, as retrieved from Zenodo.
+        directory (str): where to write the files.
+        jobs (int): the number of files to download at once.
+        cache (ChecksumCache): checksums of files already in the directory. Must be
+            safe to share between threads.
+        store (ContentStore): files uploaded or downloaded before, by checksum.
+
+    Returns:
+        dict: for each file, whether it was skipped, linked, downloaded or resumed.
+
+    """
+    os.makedirs(directory, exist_ok=True)
+    remote = {item["filename"]: item for item in zenodo.iter_files(deposition)}
+    datapackage = remote.pop("datapackage.json", None)
+    hashes = {}
+
+    if datapackage is not None:
+        content = zenodo.download(datapackage)
+        hashes = {r["name"]: r.get("hash") for r in json.loads(content)["resources"]}
+    else:
+        zenodo.logger.warning(
+            f"{deposition['title']} has no datapackage.json, "
+            "checking files against Zenodo's checksums"
+        )
+
+    names = sorted(remote)
+    mirror = partial(mirror_file, zenodo, directory=directory, cache=cache, store=store)
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        futures = [
+            executor.submit(mirror, remote[name], expected=hashes.get(name))
+            for name in names
+        ]
+
+    report = {name: future.result() for name, future in zip(names, futures)}
+
+    if datapackage is not None:
+        path = os.path.join(directory, "datapackage.json")
+        checksum = md5(content).hexdigest()  # nosec: B324
+
+        if checksum != datapackage["checksum"].removeprefix("md5:"):
+            raise RuntimeError("Download of datapackage.json is corrupt")
+
+        if os.path.exists(path) and _local_md5(path) == checksum:
+            report["datapackage.json"] = "skipped"
+        else:
+            _write_atomic(path, content)
+            report["datapackage.json"] = "downloaded"
+
+    return report
@@ -0,0 +1,153 @@
+"""Measure the time and memory spent in each phase of an archiver run."""
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+def _cpu_time():
+    """CPU seconds used by this process and its finished child processes."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class PhaseProfiler:
+    """
+    Record wall time, CPU time and peak memory for named phases of a run.
+
+    Phases may be nested, in which case the outer phase includes everything spent in
+    the inner one. Memory is traced with tracemalloc while a phase runs, so the peak
+    only counts memory allocated by Python since the outermost phase started, and
+    the run is slowed down. If an output directory is given, a cProfile dump
+    (``<phase>.prof``) and a tracemalloc snapshot taken at the end of the phase
+    (``<phase>.tracemalloc``) are written there too. Only the outermost phase
+    running at the time is profiled, and cProfile only sees the calling thread, so
+    work done in thread pools shows up as time spent waiting on them. A disabled
+    profiler records nothing.
+    """
+
+    def __init__(self, enabled=True, output_dir=None):
+        """
+        Prepare a profiler.
+
+        Args:
+            enabled (bool): whether to record anything.
+            output_dir (str): where to write the per phase dumps, if anywhere.
+
+        Returns:
+            PhaseProfiler
+
+        """
+        self.enabled = enabled
+        self.output_dir = output_dir
+        self.phases = []
+        self.stack = []
+        self.profile = None
+
+        if enabled and output_dir is not None:
+            os.makedirs(output_dir, exist_ok=True)
+
+    def _dump_path(self, name, suffix):
+        """Choose a file name for a phase's dump, numbered if the phase repeats."""
+        count = sum(phase["phase"] == name for phase in self.phases)
+        stem = name if count == 0 else f"{name}.{count}"
+        return os.path.join(self.output_dir, f"{stem}.{suffix}")
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Measure a phase of the run.
+
+        Args:
+            name (str): the name of the phase, e.g. local_fileinfo.
+
+        Yields:
+            None
+
+        """
+        if not self.enabled:
+            yield
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        # The parent phase's peak so far is kept before the peak is reset.
+        if self.stack:
+            self.stack[-1] = max(self.stack[-1], tracemalloc.get_traced_memory()[1])
+
+        tracemalloc.reset_peak()
+        self.stack.append(0)
+        profile = None
+
+        if self.output_dir is not None and self.profile is None:
+            profile = self.profile = cProfile.Profile()
+            profile.enable()
+
+        start_wall, start_cpu = time.perf_counter(), _cpu_time()
+
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - start_wall, _cpu_time() - start_cpu
+            peak = max(self.stack.pop(), tracemalloc.get_traced_memory()[1])
+
+            if self.stack:
+                self.stack[-1] = max(self.stack[-1], peak)
+
+            if self.output_dir is not None:
+                tracemalloc.take_snapshot().dump(self._dump_path(name, "tracemalloc"))
+
+            if profile is not None:
+                profile.disable()
+                profile.dump_stats(self._dump_path(name, "prof"))
+                self.profile = None
+
+            self.phases.append(
+                {
+                    "phase": name,
+                    "depth": len(self.stack),
+                    "wall_seconds": wall,
+                    "cpu_seconds": cpu,
+                    "peak_memory_bytes": peak,
+                }
+            )
+
+            if not self.stack:
+                tracemalloc.stop()
+
+    def report(self):
+        """
+        Format the measurements as a table, in the order the phases finished.
+
+        Returns:
+            str: one line per phase.
+
+        """
+        lines = [f"{'phase':<32} {'wall (s)':>10} {'cpu (s)':>10} {'peak (MiB)':>11}"]
+
+        for phase in self.phases:
+            name = "  " * phase["depth"] + phase["phase"]
+            lines.append(
+                f"{name:<32} {phase['wall_seconds']:>10.3f} "
+                f"{phase['cpu_seconds']:>10.3f} "
+                f"{phase['peak_memory_bytes'] / 2**20:>11.1f}"
+            )
+
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        """
+        Write the measurements as JSON.
+
+        Args:
+            path (str): where to write them.
+
+        Returns:
+            None
+
+        """
+        with open(path, "w") as f:
+            json.dump(self.phases, f, indent=4)
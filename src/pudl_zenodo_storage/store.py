@@ -0,0 +1,224 @@
+"""Keep local copies of archived files, addressed by their md5 checksums."""
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+# ioctl request to clone a file's extents, per linux/fs.h.
+FICLONE: int = 0x40049409
+
+
+def _reflink(source, target):
+    """Make a copy-on-write clone of a file, where the filesystem supports it."""
+    # Imported here, as fcntl is only available on Unix.
+    import fcntl
+
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def clone(source, target):
+    """
+    Give a file a second name, sharing its data on disk where possible.
+
+    A copy-on-write clone (reflink) is made if the filesystem supports it, so either
+    file can later be changed without affecting the other. Otherwise the file is
+    hard linked, and it is only copied as a last resort, e.g. across filesystems.
+
+    Args:
+        source (str): path of an existing file.
+        target (str): path of the new file, which must not exist yet.
+
+    Returns:
+        str: how the file was cloned, one of reflink, link or copy.
+
+    """
+    try:
+        _reflink(source, target)
+        return "reflink"
+    except (ImportError, OSError):
+        if os.path.exists(target):
+            os.remove(target)
+
+    try:
+        os.link(source, target)
+        return "link"
+    except OSError:
+        shutil.copyfile(source, target)
+        return "copy"
+
+
+class ContentStore:
+    """
+    Size-bounded store of archive files, keyed by md5 checksum and backed by SQLite.
+
+    Files that were uploaded or downloaded are added to the store under their
+    checksum, as a reflink or hard link where possible, so the store takes little
+    extra space. Files with a known checksum, e.g. from a deposition's
+    datapackage.json, can then be placed anywhere on the same filesystem without
+    moving their bytes again. A hard linked object is shared with the file it was
+    added from, so, like the checksum cache, an object is only used while its size,
+    modification time and inode are unchanged. Once the store holds more than its
+    maximum size, the least recently used objects are removed. The store may be
+    shared between threads.
+    """
+
+    def __init__(self, directory, max_size=None):
+        """
+        Open (or create) a content store.
+
+        Args:
+            directory (str): where to keep the objects and their index.
+            max_size (int): the most bytes to keep, counting each object at its full
+                size even if it shares its data with other files. Unbounded if None.
+
+        Returns:
+            ContentStore
+
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self.connection = sqlite3.connect(
+            os.path.join(directory, "index.sqlite"), check_same_thread=False
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS objects ("
+            "checksum TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+            "inode INTEGER, used REAL)"
+        )
+        self.connection.commit()
+
+    def __enter__(self):
+        """Use the store as a context manager."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close the index."""
+        self.close()
+
+    def _object_path(self, checksum):
+        """Where the object with a given checksum is kept."""
+        return os.path.join(self.directory, "objects", checksum[:2], checksum)
+
+    @staticmethod
+    def _key(stat):
+        return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+    def _forget(self, checksum):
+        """Remove an object and its index entry."""
+        self.connection.execute("DELETE FROM objects WHERE checksum = ?", (checksum,))
+
+        try:
+            os.remove(self._object_path(checksum))
+        except FileNotFoundError:
+            pass
+
+    def _touch(self, checksum):
+        """Mark an object as just used, so it is the last to be evicted."""
+        with self.lock:
+            self.connection.execute(
+                "UPDATE objects SET used = ? WHERE checksum = ?",
+                (time.time(), checksum),
+            )
+            self.connection.commit()
+
+    def __contains__(self, checksum):
+        """Whether the store holds an unchanged object with the given checksum."""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT size, mtime_ns, inode FROM objects WHERE checksum = ?",
+                (checksum,),
+            ).fetchone()
+
+        try:
+            return row is not None and row == self._key(
+                os.stat(self._object_path(checksum))
+            )
+        except FileNotFoundError:
+            return False
+
+    def add(self, path, checksum):
+        """
+        Add a file to the store, unless it already holds one with the same checksum.
+
+        Either way, the object counts as just used.
+
+        Args:
+            path (str): path of the file.
+            checksum (str): md5 checksum of the file.
+
+        Returns:
+            None
+
+        """
+        if checksum in self:
+            self._touch(checksum)
+            return
+
+        object_path = self._object_path(checksum)
+        temp_path = f"{object_path}.{uuid.uuid4().hex}"
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        clone(path, temp_path)
+        os.replace(temp_path, object_path)
+
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?)",
+                (checksum, *self._key(os.stat(object_path)), time.time()),
+            )
+            self._evict()
+            self.connection.commit()
+
+    def place(self, checksum, path):
+        """
+        Create a file from the store, if it holds an object with the checksum.
+
+        Args:
+            checksum (str): md5 checksum of the file wanted.
+            path (str): where to put the file. An existing file is replaced.
+
+        Returns:
+            bool: whether the file was placed.
+
+        """
+        if checksum not in self:
+            return False
+
+        temp_path = f"{path}.{uuid.uuid4().hex}"
+
+        try:
+            clone(self._object_path(checksum), temp_path)
+        except FileNotFoundError:
+            # The object was evicted by another thread in the meantime
+            return False
+
+        os.replace(temp_path, path)
+        self._touch(checksum)
+        return True
+
+    def _evict(self):
+        """Remove the least recently used objects, until the store fits its bound."""
+        if self.max_size is None:
+            return
+
+        (total,) = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM objects"
+        ).fetchone()
+        oldest = self.connection.execute(
+            "SELECT checksum, size FROM objects ORDER BY used"
+        ).fetchall()
+
+        for checksum, size in oldest:
+            if total <= self.max_size:
+                break
+
+            self._forget(checksum)
+            total -= size
+
+    def close(self):
+        """Close the index."""
+        self.connection.close()
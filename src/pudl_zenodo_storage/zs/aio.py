@@ -0,0 +1,513 @@
+"""Asynchronous routines for archiving raw data packages on Zenodo."""
+import asyncio
+import json
+import logging
+import os
+import time
+
+import aiohttp
+
+from pudl_zenodo_storage.zs.core import ZenodoError, new_version_metadata
+from pudl_zenodo_storage.zs.metrics import MetricsRecorder
+from pudl_zenodo_storage.zs.ratelimit import RateLimiter
+from pudl_zenodo_storage.zs.retry import RetryPolicy
+
+
+def _attempt_body(data):
+    """
+    Prepare a request body for one attempt, leaving the caller's handle open.
+
+    aiohttp closes file-like bodies after sending them, including in-memory ones
+    in some versions, which would leave nothing to rewind for a retry. Files are
+    sent through a second handle, which shares the position of the original one,
+    and other bodies are sent as the bytes left to read from them.
+    """
+    try:
+        fd = data.fileno()
+    except (AttributeError, OSError):
+        return data.read()
+
+    return os.fdopen(os.dup(fd), "rb")
+
+
+class AsyncZenodoStorage:
+    """
+    Asynchronous interface to store data with zenodo.org via their API.
+
+    Mirrors :class:`pudl_zenodo_storage.zs.core.ZenodoStorage`, but every API call is
+    a coroutine, so many depositions and file transfers can be driven from a single
+    event loop. The HTTP session must be opened before use, either with
+    ``async with AsyncZenodoStorage(...) as zenodo:`` or by calling :meth:`connect`.
+    """
+
+    def __init__(
+        self,
+        key,
+        testing=False,
+        verbose=True,
+        loglevel="WARNING",
+        pool_size=10,
+        retry=None,
+        rate_limiter=None,
+        api_root=None,
+        metrics=None,
+    ):
+        """
+        Prepare the AsyncZenodoStorage interface.
+
+        Args:
+            key (str): The API key required to authenticate with Zenodo
+            testing (bool): If true, use the Zenodo sandbox api rather than the
+                production service
+            pool_size (int): The maximum number of simultaneous connections.
+            retry (RetryPolicy): When to retry calls that fail transiently. By
+                default, a call is attempted up to 5 times.
+            rate_limiter (RateLimiter): Paces calls to stay under the server's rate
+                limit. By default, the pace is set by the rate limit headers in the
+                server's responses.
+            api_root (str): The root url of the API, overriding the choice between
+                the sandbox and production services, e.g. to use a local
+                :class:`pudl_zenodo_storage.zs.fake.FakeZenodo`.
+            metrics (MetricsRecorder): Records the time and bytes spent on each
+                call. A new recorder is used by default.
+
+        Returns:
+            AsyncZenodoStorage
+
+        """
+        logger = logging.Logger(__name__)
+        logger.setLevel(loglevel)
+
+        if verbose:
+            logger.addHandler(logging.StreamHandler())
+
+        self.logger = logger
+        self.key = key
+        self.pool_size = pool_size
+        self.session = None
+        self.retry = RetryPolicy() if retry is None else retry
+        self.rate_limiter = RateLimiter() if rate_limiter is None else rate_limiter
+        self.metrics = MetricsRecorder() if metrics is None else metrics
+        # The id of the latest version seen of each deposition, by concept DOI.
+        self.concept_ids = {}
+
+        if api_root is not None:
+            self.api_root = api_root
+        elif testing:
+            self.api_root = "https://sandbox.zenodo.org/api"
+        else:
+            self.api_root = "https://zenodo.org/api"
+
+    async def __aenter__(self):
+        """Open the HTTP session."""
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Close the HTTP session."""
+        await self.close()
+
+    async def connect(self):
+        """Open the HTTP session shared by all API calls."""
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self.session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        """Close the HTTP session."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def request(self, method, url, idempotent=True, operation=None, **kwargs):
+        """
+        Make an API call, paced by the rate limiter and retried per the retry policy.
+
+        Args:
+            method (str): the HTTP method.
+            url (str): the url to call.
+            idempotent (bool): whether repeating the call is harmless. Calls that
+                aren't are only retried if the server rejected them with a 429.
+            operation (str): the name the call is recorded under in the metrics.
+                Defaults to the HTTP method.
+            kwargs: passed on to :meth:`aiohttp.ClientSession.request`. A file handle
+                in ``data`` is rewound before each retry, and left open.
+
+        Returns:
+            aiohttp.ClientResponse: the response to the last attempt, with its body
+            already read.
+
+        """
+        data = kwargs.get("data")
+        position = data.tell() if hasattr(data, "seek") else None
+        start = time.monotonic()
+        attempt = 0
+        response, body = None, b""
+
+        try:
+            while True:
+                attempt += 1
+                response, body = None, b""
+                await asyncio.sleep(self.rate_limiter.reserve())
+
+                sent = None
+
+                if position is not None:
+                    data.seek(position)
+                    sent = kwargs["data"] = _attempt_body(data)
+
+                try:
+                    async with self.session.request(method, url, **kwargs) as response:
+                        body = await response.read()
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+                    response = None
+
+                    if not self.retry.should_retry(attempt, None, idempotent):
+                        raise
+
+                    delay = self.retry.delay(attempt)
+                    reason = str(err)
+                else:
+                    self.rate_limiter.update(response.headers)
+
+                    if not self.retry.should_retry(
+                        attempt, response.status, idempotent
+                    ):
+                        return response
+
+                    retry_after = response.headers.get("Retry-After")
+                    delay = self.retry.delay(attempt, retry_after)
+                    reason = f"code {response.status}"
+                finally:
+                    if hasattr(sent, "close"):
+                        sent.close()
+
+                self.logger.warning(
+                    f"{method} {url} failed ({reason}), retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+        finally:
+            self._record(operation or method, response, len(body), attempt, start)
+
+    def _record(self, operation, response, received, attempts, start):
+        """Record a call in the metrics, given its last response."""
+        if response is None:
+            status, sent = None, 0
+        else:
+            status = response.status
+            sent = int(response.request_info.headers.get("Content-Length") or 0)
+
+        self.metrics.record(
+            operation,
+            status,
+            sent=sent,
+            received=received,
+            retries=attempts - 1,
+            latency=time.monotonic() - start,
+        )
+
+    async def get_deposition(self, query):
+        """
+        Get data for a single Zenodo Deposition based on the provided query.
+
+        See https://developers.zenodo.org for more information.
+
+        Args:
+            query (str): A Zenodo (elasticsearch) compatible query string.
+                         eg. 'title:"Eia860"' or 'doi:"10.5072/zenodo.415988"'
+
+        Returns:
+            - If no such deposition exists, returns None.
+            - If a single deposition matches, returns the deposition data as
+              dict, per https://developers.zenodo.org/?python#depositions
+            - If more than one deposition matches, throws an exception
+
+        """
+        url = self.api_root + "/deposit/depositions"
+        params = {"q": query, "access_token": self.key}
+
+        lookup = await self.request(
+            "GET", url, operation="get_deposition", params=params
+        )
+        jsr = await lookup.json(content_type=None)
+
+        if lookup.status != 200:
+            msg = f"Could not look up deposition: {jsr}"
+            self.logger.error(msg)
+            raise RuntimeError(msg)
+
+        self.logger.info(jsr)
+
+        if len(jsr) > 1:
+            msg = f"Expected single deposition, query: {query}, got: {len(jsr)}"
+            self.logger.error(msg)
+            raise ValueError(msg)
+
+        if jsr == []:
+            return
+
+        self._remember(jsr[0])
+        return jsr[0]
+
+    async def get_deposition_by_id(self, deposition_id):
+        """
+        Get data for a single Zenodo Deposition by its id.
+
+        Unlike a search, this always sees the current state of the deposition.
+
+        Args:
+            deposition_id (int): the id of the deposition.
+
+        Returns:
+            deposition data as dict, per
+            https://developers.zenodo.org/?python#depositions
+
+        """
+        url = self.api_root + f"/deposit/depositions/{deposition_id}"
+        params = {"access_token": self.key}
+
+        response = await self.request(
+            "GET", url, operation="get_deposition", params=params
+        )
+        jsr = await response.json(content_type=None)
+
+        if response.status != 200:
+            msg = f"Could not get deposition {deposition_id}: {jsr}"
+            self.logger.error(msg)
+            raise ZenodoError(msg, response.status)
+
+        self._remember(jsr)
+        return jsr
+
+    def _remember(self, deposition):
+        """Note the id of a deposition as the latest version of its concept."""
+        if deposition.get("conceptdoi"):
+            self.concept_ids[deposition["conceptdoi"]] = deposition["id"]
+
+    async def _latest_version(self, conceptdoi):
+        """Find the latest version of a deposition, by id if it was seen before."""
+        if conceptdoi in self.concept_ids:
+            return await self.get_deposition_by_id(self.concept_ids[conceptdoi])
+
+        query = f'conceptdoi:"{conceptdoi}"'
+        deposition = await self.get_deposition(query)
+
+        if deposition is None:
+            raise ValueError(f"Deposition '{query}' does not exist")
+
+        self.logger.debug(
+            f"Deposition '{query}' found at {deposition['links']['self']}"
+        )
+        return deposition
+
+    async def create_deposition(self, metadata):
+        """
+        Create a Zenodo deposition resource.
+
+        This should only be called once for a given data source.  The deposition will be
+        prepared in draft form, so that files can be added prior to publication.
+
+        Args:
+            metadata: deposition metadata as a dict, per
+            https://developers.zenodo.org/?python#representation
+
+        Returns:
+            deposition data as dict, per
+            https://developers.zenodo.org/?python#depositions
+        """
+        url = self.api_root + "/deposit/depositions"
+        params = {"access_token": self.key}
+        headers = {"Content-Type": "application/json"}
+
+        if metadata.get("version", None) is None:
+            self.logger.debug(
+                f"Deposition {metadata['title']} metadata assigned version 1.0.0"
+            )
+            metadata["version"] = "1.0.0"
+
+        data = json.dumps({"metadata": metadata})
+
+        response = await self.request(
+            "POST",
+            url,
+            idempotent=False,
+            operation="create_deposition",
+            params=params,
+            data=data,
+            headers=headers,
+        )
+        jsr = await response.json(content_type=None)
+
+        if response.status != 201:
+            msg = f"Could not create deposition: {jsr}"
+            self.logger.error(msg)
+            raise RuntimeError(msg)
+
+        return jsr
+
+    async def update_deposition(self, deposition_url, metadata):
+        """
+        Update the metadata of an existing Deposition.
+
+        Args:
+            deposition_url: str, url for the deposition, as found in
+                deposition["links"]["self"]
+
+            metadata: dict, carrying the replacement metadata
+
+        Returns:
+            updated deposition data
+        """
+        data = json.dumps({"metadata": metadata})
+        params = {"access_token": self.key}
+        headers = {"Content-Type": "application/json"}
+
+        response = await self.request(
+            "PUT",
+            deposition_url,
+            operation="update_deposition",
+            params=params,
+            data=data,
+            headers=headers,
+        )
+        jsr = await response.json(content_type=None)
+
+        if response.status != 200:
+            msg = f"Failed to update: {jsr} / {json.dumps(metadata)}"
+            self.logger.error(msg)
+            raise RuntimeError(msg)
+
+        return jsr
+
+    async def new_deposition_version(
+        self, conceptdoi, version_info=None, deposition=None
+    ):
+        """
+        Produce a new version for a given deposition archive.
+
+        The draft is found through the link returned when it is created, so with the
+        latest version at hand this takes just two calls: one to create the draft,
+        and one to set its version.
+
+        Args:
+            conceptdoi (str): deposition conceptdoi, per
+                https://help.zenodo.org/#versioning
+                The deposition provided must already exist on Zenodo.
+            version_info (semantic_version.Version): By default the version metadata
+                will be incremented by on major semantic version number.
+            deposition (dict): the latest version of the deposition, if already
+                retrieved. Otherwise, it is looked up by id if it was seen before,
+                or searched for by concept DOI.
+
+        Returns:
+            deposition data as dict, per
+            https://developers.zenodo.org/?python#depositions
+
+        """
+        if deposition is None:
+            deposition = await self._latest_version(conceptdoi)
+
+        if deposition["state"] == "unsubmitted":
+            self.logger.debug(
+                f"deposition '{deposition['id']}' is already a new version"
+            )
+            return deposition
+
+        url = (
+            self.api_root
+            + f"/deposit/depositions/{deposition['id']}/actions/newversion"
+        )
+
+        # Create the new version
+        params = {"access_token": self.key}
+
+        response = await self.request(
+            "POST", url, idempotent=False, operation="new_version", params=params
+        )
+        text = await response.text()
+
+        if response.status != 201:
+            msg = f"Could not create new version: {text}"
+            self.logger.error(msg)
+            raise RuntimeError(msg)
+
+        jsr = json.loads(text)
+
+        # When the API creates a new version, it does not return the new one.
+        # It returns the old one with a link to the new one.
+        metadata = new_version_metadata(jsr["metadata"], version_info)
+        draft_url = jsr["links"].get("latest_draft")
+
+        if draft_url is None:
+            new_version = await self.get_deposition(f'conceptdoi:"{conceptdoi}"')
+            draft_url = new_version["links"]["self"]
+
+        new_version = await self.update_deposition(draft_url, metadata)
+        self._remember(new_version)
+        return new_version
+
+    async def bucket_api_upload(self, deposition, file_name, file_handle):
+        """
+        Upload a file for the given deposition, using the newer bucket API.
+
+        Args:
+            deposition: the dict of the deposition resource
+            file_name: the desired file name
+            file_handle: an open file handle or bytes like object.
+
+        Returns:
+            dict: the deposition file resource, per
+            https://developers.zenodo.org/#deposition-files
+
+        """
+        url = deposition["links"]["bucket"] + "/" + file_name
+        params = {"access_token": self.key}
+
+        response = await self.request(
+            "PUT",
+            url,
+            operation="bucket_api_upload",
+            params=params,
+            data=file_handle,
+        )
+        jsr = await response.json(content_type=None)
+
+        if response.status not in [200, 201]:
+            msg = (
+                "Failed to upload file: "
+                f"code {response.status} / {jsr} on {deposition}"
+            )
+            self.logger.error(msg)
+            raise RuntimeError(msg)
+
+        return jsr
+
+    async def publish(self, deposition):
+        """
+        Publish a given deposition.
+
+        Args:
+            deposition: dict of the deposition
+
+        Returns:
+            dict of the published deposition, per
+            https://developers.zenodo.org/#depositions
+        """
+        if deposition["submitted"]:
+            return deposition
+
+        response = await self.request(
+            "POST",
+            deposition["links"]["publish"],
+            idempotent=False,
+            operation="publish",
+            params={"access_token": self.key},
+        )
+        jsr = await response.json(content_type=None)
+
+        if response.status != 202:
+            msg = f"Failed to publish {deposition['title']}: {json.dumps(jsr)}"
+            self.logger.error(msg)
+            raise RuntimeError(msg)
+
+        return jsr
@@ -1,15 +1,119 @@
 """Core routines for archiving raw data packages on Zenodo."""
+import io
 import json
 import logging
+import os
+import time
 
 import requests
 import semantic_version
+from requests.adapters import HTTPAdapter
+
+from pudl_zenodo_storage.zs.metrics import MetricsRecorder
+from pudl_zenodo_storage.zs.multipart import MultipartEncoder
+from pudl_zenodo_storage.zs.ratelimit import RateLimiter
+from pudl_zenodo_storage.zs.retry import RetryPolicy
+
+FILE_API_MAX_SIZE: int = 100 * 1024 * 1024
+FILES_PAGE_SIZE: int = 100
+
+
+class ZenodoError(RuntimeError):
+    """An API call was rejected by Zenodo."""
+
+    def __init__(self, msg, status_code):
+        """
+        Describe the failed API call.
+
+        Args:
+            msg (str): the error message.
+            status_code (int): the HTTP status code of the response.
+
+        """
+        super().__init__(msg)
+        self.status_code = status_code
+
+
+def remaining_size(file_handle):
+    """
+    Find the number of bytes left to read from a file handle.
+
+    Args:
+        file_handle: an open file handle or bytes like object.
+
+    Returns:
+        int: the size of the file, less the current position of the handle.
+
+    """
+    position = file_handle.tell()
+
+    try:
+        return os.fstat(file_handle.fileno()).st_size - position
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        size = file_handle.seek(0, io.SEEK_END) - position
+        file_handle.seek(position)
+        return size
+
+
+def response_json(response):
+    """
+    Decode the body of a response, which may not be JSON if the call failed.
+
+    Args:
+        response (requests.Response): the response to an API call.
+
+    Returns:
+        the decoded JSON, or the text of the body if it isn't valid JSON.
+
+    """
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+def new_version_metadata(source_metadata, version_info=None):
+    """
+    Produce the metadata for a new version of a deposition.
+
+    Args:
+        source_metadata (dict): metadata of the previous version of the deposition.
+        version_info (semantic_version.Version): By default the version metadata
+            will be incremented by on major semantic version number.
+
+    Returns:
+        dict: the metadata, without the identifiers specific to the previous version.
+
+    """
+    metadata = {}
+
+    for key, val in source_metadata.items():
+        if key not in ["doi", "prereserve_doi", "publication_date"]:
+            metadata[key] = val
+
+    if version_info is None:
+        previous = semantic_version.Version(source_metadata["version"])
+        version_info = previous.next_major()
+
+    metadata["version"] = str(version_info)
+    return metadata
 
 
 class ZenodoStorage:
     """Thin interface to store data with zenodo.org via their API."""
 
-    def __init__(self, key, testing=False, verbose=True, loglevel="WARNING"):
+    def __init__(
+        self,
+        key,
+        testing=False,
+        verbose=True,
+        loglevel="WARNING",
+        pool_size=10,
+        retry=None,
+        rate_limiter=None,
+        api_root=None,
+        metrics=None,
+    ):
         """
         Prepare the ZenodoStorage interface.
 
@@ -17,6 +121,18 @@ class ZenodoStorage:
             key (str): The API key required to authenticate with Zenodo
             testing (bool): If true, use the Zenodo sandbox api rather than the
                 production service
+            pool_size (int): The number of connections kept alive for reuse. Should
+                be at least the number of requests made concurrently.
+            retry (RetryPolicy): When to retry calls that fail transiently. By
+                default, a call is attempted up to 5 times.
+            rate_limiter (RateLimiter): Paces calls to stay under the server's rate
+                limit. By default, the pace is set by the rate limit headers in the
+                server's responses.
+            api_root (str): The root url of the API, overriding the choice between
+                the sandbox and production services, e.g. to use a local
+                :class:`pudl_zenodo_storage.zs.fake.FakeZenodo`.
+            metrics (MetricsRecorder): Records the time and bytes spent on each
+                call. A new recorder is used by default.
 
         Returns:
             ZenodoStorage
@@ -31,11 +147,105 @@ class ZenodoStorage:
         self.logger = logger
         self.key = key
 
-        if testing:
+        adapter = HTTPAdapter(pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.retry = RetryPolicy() if retry is None else retry
+        self.rate_limiter = RateLimiter() if rate_limiter is None else rate_limiter
+        self.metrics = MetricsRecorder() if metrics is None else metrics
+        # The id of the latest version seen of each deposition, by concept DOI.
+        self.concept_ids = {}
+
+        if api_root is not None:
+            self.api_root = api_root
+        elif testing:
             self.api_root = "https://sandbox.zenodo.org/api"
         else:
             self.api_root = "https://zenodo.org/api"
 
+    def request(self, method, url, idempotent=True, operation=None, **kwargs):
+        """
+        Make an API call, paced by the rate limiter and retried per the retry policy.
+
+        Args:
+            method (str): the HTTP method.
+            url (str): the url to call.
+            idempotent (bool): whether repeating the call is harmless. Calls that
+                aren't are only retried if the server rejected them with a 429.
+            operation (str): the name the call is recorded under in the metrics.
+                Defaults to the HTTP method.
+            kwargs: passed on to :meth:`requests.Session.request`. File handles in
+                ``data`` or ``files`` are rewound before each retry.
+
+        Returns:
+            requests.Response: the response to the last attempt, with the number of
+            attempts made in its ``attempts`` attribute.
+
+        """
+        bodies = [kwargs.get("data"), *kwargs.get("files", {}).values()]
+        positions = [(b, b.tell()) for b in bodies if hasattr(b, "seek")]
+        start = time.monotonic()
+        attempt = 0
+        response = None
+
+        try:
+            while True:
+                attempt += 1
+                response = None
+                time.sleep(self.rate_limiter.reserve())
+
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as err:
+                    if not self.retry.should_retry(attempt, None, idempotent):
+                        raise
+
+                    delay = self.retry.delay(attempt)
+                    reason = str(err)
+                else:
+                    self.rate_limiter.update(response.headers)
+
+                    if not self.retry.should_retry(
+                        attempt, response.status_code, idempotent
+                    ):
+                        response.attempts = attempt
+                        return response
+
+                    retry_after = response.headers.get("Retry-After")
+                    delay = self.retry.delay(attempt, retry_after)
+                    reason = f"code {response.status_code}"
+
+                self.logger.warning(
+                    f"{method} {url} failed ({reason}), retrying in {delay:.1f}s"
+                )
+                time.sleep(delay)
+
+                for body, position in positions:
+                    body.seek(position)
+        finally:
+            self._record(operation or method, response, attempt, start)
+
+    def _record(self, operation, response, attempts, start):
+        """Record a call in the metrics, given its last response."""
+        status, sent, received = None, 0, 0
+
+        if response is not None:
+            status = response.status_code
+            received = int(response.headers.get("Content-Length") or 0)
+
+        if response is not None and response.request is not None:
+            sent = int(response.request.headers.get("Content-Length") or 0)
+
+        self.metrics.record(
+            operation,
+            status,
+            sent=sent,
+            received=received,
+            retries=attempts - 1,
+            latency=time.monotonic() - start,
+        )
+
     def get_deposition(self, query):
         """
         Get data for a single Zenodo Deposition based on the provided query.
@@ -56,7 +266,7 @@ class ZenodoStorage:
         url = self.api_root + "/deposit/depositions"
         params = {"q": query, "access_token": self.key}
 
-        lookup = requests.get(url, params)
+        lookup = self.request("GET", url, operation="get_deposition", params=params)
 
         jsr = lookup.json()
 
@@ -75,8 +285,58 @@ class ZenodoStorage:
         if jsr == []:
             return
 
+        self._remember(jsr[0])
         return jsr[0]
 
+    def get_deposition_by_id(self, deposition_id):
+        """
+        Get data for a single Zenodo Deposition by its id.
+
+        Unlike a search, this always sees the current state of the deposition.
+
+        Args:
+            deposition_id (int): the id of the deposition.
+
+        Returns:
+            deposition data as dict, per
+            https://developers.zenodo.org/?python#depositions
+
+        """
+        url = self.api_root + f"/deposit/depositions/{deposition_id}"
+        params = {"access_token": self.key}
+
+        response = self.request("GET", url, operation="get_deposition", params=params)
+
+        if response.status_code != 200:
+            msg = f"Could not get deposition {deposition_id}: {response_json(response)}"
+            self.logger.error(msg)
+            raise ZenodoError(msg, response.status_code)
+
+        jsr = response.json()
+        self._remember(jsr)
+        return jsr
+
+    def _remember(self, deposition):
+        """Note the id of a deposition as the latest version of its concept."""
+        if deposition.get("conceptdoi"):
+            self.concept_ids[deposition["conceptdoi"]] = deposition["id"]
+
+    def _latest_version(self, conceptdoi):
+        """Find the latest version of a deposition, by id if it was seen before."""
+        if conceptdoi in self.concept_ids:
+            return self.get_deposition_by_id(self.concept_ids[conceptdoi])
+
+        query = f'conceptdoi:"{conceptdoi}"'
+        deposition = self.get_deposition(query)
+
+        if deposition is None:
+            raise ValueError(f"Deposition '{query}' does not exist")
+
+        self.logger.debug(
+            f"Deposition '{query}' found at {deposition['links']['self']}"
+        )
+        return deposition
+
     def create_deposition(self, metadata):
         """
         Create a Zenodo deposition resource.
@@ -104,7 +364,15 @@ class ZenodoStorage:
 
         data = json.dumps({"metadata": metadata})
 
-        response = requests.post(url, params=params, data=data, headers=headers)
+        response = self.request(
+            "POST",
+            url,
+            idempotent=False,
+            operation="create_deposition",
+            params=params,
+            data=data,
+            headers=headers,
+        )
         jsr = response.json()
 
         if response.status_code != 201:
@@ -131,8 +399,13 @@ class ZenodoStorage:
         params = {"access_token": self.key}
         headers = {"Content-Type": "application/json"}
 
-        response = requests.put(
-            deposition_url, params=params, data=data, headers=headers
+        response = self.request(
+            "PUT",
+            deposition_url,
+            operation="update_deposition",
+            params=params,
+            data=data,
+            headers=headers,
         )
         jsr = response.json()
 
@@ -143,31 +416,31 @@ class ZenodoStorage:
 
         return jsr
 
-    def new_deposition_version(self, conceptdoi, version_info=None):
+    def new_deposition_version(self, conceptdoi, version_info=None, deposition=None):
         """
         Produce a new version for a given deposition archive.
 
+        The draft is found through the link returned when it is created, so with the
+        latest version at hand this takes just two calls: one to create the draft,
+        and one to set its version.
+
         Args:
             conceptdoi (str): deposition conceptdoi, per
                 https://help.zenodo.org/#versioning
                 The deposition provided must already exist on Zenodo.
             version_info (semantic_version.Version): By default the version metadata
                 will be incremented by on major semantic version number.
+            deposition (dict): the latest version of the deposition, if already
+                retrieved. Otherwise, it is looked up by id if it was seen before,
+                or searched for by concept DOI.
 
         Returns:
             deposition data as dict, per
             https://developers.zenodo.org/?python#depositions
 
         """
-        query = f'conceptdoi:"{conceptdoi}"'
-        deposition = self.get_deposition(query)
-
         if deposition is None:
-            raise ValueError(f"Deposition '{query}' does not exist")
-
-        self.logger.debug(
-            f"Deposition '{query}' found at {deposition['links']['self']}"
-        )
+            deposition = self._latest_version(conceptdoi)
 
         if deposition["state"] == "unsubmitted":
             self.logger.debug(
@@ -182,7 +455,9 @@ class ZenodoStorage:
 
         # Create the new version
         params = {"access_token": self.key}
-        response = requests.post(url, params=params)
+        response = self.request(
+            "POST", url, idempotent=False, operation="new_version", params=params
+        )
 
         if response.status_code != 201:
             msg = f"Could not create new version: {response.text}"
@@ -193,26 +468,24 @@ class ZenodoStorage:
 
         # When the API creates a new version, it does not return the new one.
         # It returns the old one with a link to the new one.
-        source_metadata = jsr["metadata"]
-        metadata = {}
-
-        for key, val in source_metadata.items():
-            if key not in ["doi", "prereserve_doi", "publication_date"]:
-                metadata[key] = val
+        metadata = new_version_metadata(jsr["metadata"], version_info)
+        draft_url = jsr["links"].get("latest_draft")
 
-        if version_info is None:
-            previous = semantic_version.Version(jsr["metadata"]["version"])
-            version_info = previous.next_major()
+        if draft_url is None:
+            new_version = self.get_deposition(f'conceptdoi:"{conceptdoi}"')
+            draft_url = new_version["links"]["self"]
 
-        metadata["version"] = str(version_info)
-
-        new_version = self.get_deposition(f'conceptdoi:"{conceptdoi}"')
-        return self.update_deposition(new_version["links"]["self"], metadata)
+        new_version = self.update_deposition(draft_url, metadata)
+        self._remember(new_version)
+        return new_version
 
     def file_api_upload(self, deposition, file_name, file_handle):
         """
         Upload a file for the given deposition, using the older file API.
 
+        The multipart request body is streamed from the file handle, rather than
+        being built in memory.
+
         Args:
             deposition: the dict of the deposition resource
             file_name: the desired file name
@@ -225,15 +498,28 @@ class ZenodoStorage:
 
         """
         url = deposition["links"]["files"]
-        data = {"name": file_name, "access_token": self.key}
-        files = {"file": file_handle}
-        response = requests.post(url, data=data, files=files)
-        jsr = response.json()
+        body = MultipartEncoder(
+            {"name": file_name, "access_token": self.key},
+            "file",
+            file_name,
+            file_handle,
+            remaining_size(file_handle),
+        )
+        headers = {"Content-Type": body.content_type}
+        response = self.request(
+            "POST",
+            url,
+            idempotent=False,
+            operation="file_api_upload",
+            data=body,
+            headers=headers,
+        )
+        jsr = response_json(response)
 
         if response.status_code != 201:
             msg = f"Failed to upload file: {jsr}"
             self.logger.error(msg)
-            raise RuntimeError(msg)
+            raise ZenodoError(msg, response.status_code)
 
         return jsr
 
@@ -245,7 +531,6 @@ class ZenodoStorage:
             deposition: the dict of the deposition resource
             file_name: the desired file name
             file_handle: an open file handle or bytes like object.
-                Must be < 100MB
 
         Returns:
             dict: the deposition file resource, per
@@ -254,8 +539,14 @@ class ZenodoStorage:
         """
         url = deposition["links"]["bucket"] + "/" + file_name
         params = {"access_token": self.key}
-        response = requests.put(url, params=params, data=file_handle)
-        jsr = response.json()
+        response = self.request(
+            "PUT",
+            url,
+            operation="bucket_api_upload",
+            params=params,
+            data=file_handle,
+        )
+        jsr = response_json(response)
 
         if response.status_code not in [200, 201]:
             msg = (
@@ -263,7 +554,7 @@ class ZenodoStorage:
                 f"code {response.status_code} / {jsr} on {deposition}"
             )
             self.logger.error(msg)
-            raise RuntimeError(msg)
+            raise ZenodoError(msg, response.status_code)
 
         return jsr
 
@@ -271,25 +562,220 @@ class ZenodoStorage:
         """
         Upload a file for the given deposition.
 
-        Attempt using the bucket api and fall back on the file api.
+        Use the bucket api whenever the deposition has a bucket. The file api is
+        only used for files small enough for it to accept, either when there is no
+        bucket, or when the bucket itself can't be found (404 or 405). Any other
+        failure of the bucket api is raised rather than sending the file again.
 
         Args:
             deposition: dict of the deposition resource
             file_name: the desired file name
             file_handle: an open file handle or bytes like object.
-                Must be < 100MB
 
         Returns:
             dict of the deposition file resource, per
                 https://developers.zenodo.org/#deposition-files
         """
-        try:
-            jsr = self.bucket_api_upload(deposition, file_name, file_handle)
-        except Exception:
-            file_handle.seek(0, 0)
-            jsr = self.file_api_upload(deposition, file_name, file_handle)
+        size = remaining_size(file_handle)
+        small = size <= FILE_API_MAX_SIZE
+
+        if "bucket" in deposition["links"]:
+            position = file_handle.tell()
+
+            try:
+                return self.bucket_api_upload(deposition, file_name, file_handle)
+            except ZenodoError as err:
+                if err.status_code not in [404, 405] or not small:
+                    raise
+
+            self.logger.warning(f"Bucket unavailable, uploading {file_name} as a file")
+            file_handle.seek(position)
+        elif not small:
+            raise ValueError(
+                f"Cannot upload {file_name} ({size} bytes): deposition has no bucket "
+                f"and the file api only accepts files up to {FILE_API_MAX_SIZE} bytes"
+            )
 
-        return jsr
+        return self.file_api_upload(deposition, file_name, file_handle)
+
+    def rename_file(self, file_resource, file_name):
+        """
+        Rename a file in an unpublished deposition, without uploading it again.
+
+        Args:
+            file_resource: dict of the deposition file resource, per
+                https://developers.zenodo.org/#deposition-files
+            file_name (str): the new name of the file.
+
+        Returns:
+            dict: the renamed file resource.
+        """
+        response = self.request(
+            "PUT",
+            file_resource["links"]["self"],
+            operation="rename_file",
+            params={"access_token": self.key},
+            json={"filename": file_name},
+        )
+
+        if response.status_code != 200:
+            msg = (
+                f"Failed to rename {file_resource['filename']} to {file_name}: "
+                f"{response_json(response)}"
+            )
+            self.logger.error(msg)
+            raise ZenodoError(msg, response.status_code)
+
+        return response.json()
+
+    def iter_files(self, deposition, page_size=FILES_PAGE_SIZE):
+        """
+        Iterate over the files of a deposition, fetching them a page at a time.
+
+        Each page links to the next, either in a Link header or under
+        ``links.next`` in the body. A server that ignores the page size returns
+        everything on the first page, with no link to a next one.
+
+        Args:
+            deposition: the deposition details, as retrieved from Zenodo.
+            page_size (int): the number of files to fetch in each request.
+
+        Yields:
+            dict: file resources, per https://developers.zenodo.org/#deposition-files
+        """
+        url = deposition["links"]["files"]
+        params = {"access_token": self.key, "page": 1, "size": page_size}
+
+        while url is not None:
+            response = self.request("GET", url, operation="list_files", params=params)
+
+            if response.status_code > 299:
+                msg = f"Unable to get files for {url}: {response_json(response)}"
+                self.logger.error(msg)
+                raise ZenodoError(msg, response.status_code)
+
+            jsr = response.json()
+
+            if isinstance(jsr, dict):
+                yield from jsr.get("entries", [])
+                url = jsr.get("links", {}).get("next")
+            else:
+                yield from jsr
+                url = response.links.get("next", {}).get("url")
+
+            # The next link carries the page and size.
+            params = {"access_token": self.key}
+
+    def deposition_files(self, deposition, page_size=FILES_PAGE_SIZE):
+        """
+        Get the files of a deposition, from its own description where possible.
+
+        A deposition's description lists its files, but a long list may be cut
+        short, so the files are only taken from there if there are fewer than a
+        page of them. Otherwise they are listed with iter_files. The description
+        must be current: it can't be trusted once files have been changed since.
+
+        Args:
+            deposition: the deposition details, as retrieved from Zenodo.
+            page_size (int): the number of files to fetch in each request.
+
+        Returns:
+            iterable: file resources, per
+            https://developers.zenodo.org/#deposition-files
+        """
+        files = deposition.get("files")
+
+        if files is not None and len(files) < page_size:
+            return files
+
+        return self.iter_files(deposition, page_size)
+
+    def delete_file(self, file_resource):
+        """
+        Delete a file from an unpublished deposition.
+
+        Args:
+            file_resource: dict of the deposition file resource, per
+                https://developers.zenodo.org/#deposition-files
+
+        Returns:
+            None: Raises errors on failure.
+        """
+        response = self.request(
+            "DELETE",
+            file_resource["links"]["self"],
+            operation="delete_file",
+            params={"access_token": self.key},
+        )
+
+        # An earlier attempt may have deleted the file, but failed to say so
+        if response.status_code == 404 and response.attempts > 1:
+            self.logger.info(f"{file_resource['filename']} was already deleted")
+            return
+
+        if response.status_code != 204:
+            msg = f"Failed to delete {file_resource['filename']}: {response.text}"
+            self.logger.error(msg)
+            raise ZenodoError(msg, response.status_code)
+
+    def download(self, file_resource):
+        """
+        Download the content of a deposition file.
+
+        Args:
+            file_resource: dict of the deposition file resource, per
+                https://developers.zenodo.org/#deposition-files
+
+        Returns:
+            bytes: the content of the file.
+        """
+        response = self.request(
+            "GET",
+            file_resource["links"]["download"],
+            operation="download",
+            params={"access_token": self.key},
+        )
+
+        if response.status_code != 200:
+            msg = f"Failed to download {file_resource['filename']}: {response.text}"
+            self.logger.error(msg)
+            raise ZenodoError(msg, response.status_code)
+
+        return response.content
+
+    def download_stream(self, file_resource, start=0):
+        """
+        Start downloading the content of a deposition file, optionally part way in.
+
+        The body is streamed rather than read up front, so it can be written out in
+        chunks with ``response.iter_content()``.
+
+        Args:
+            file_resource: dict of the deposition file resource, per
+                https://developers.zenodo.org/#deposition-files
+            start (int): the offset of the first byte to download. A server that
+                doesn't support range requests sends the whole file with a 200
+                status, rather than a 206.
+
+        Returns:
+            requests.Response: the response, with its body unread.
+        """
+        headers = {"Range": f"bytes={start}-"} if start else {}
+        response = self.request(
+            "GET",
+            file_resource["links"]["download"],
+            operation="download",
+            params={"access_token": self.key},
+            headers=headers,
+            stream=True,
+        )
+
+        if response.status_code not in [200, 206]:
+            msg = f"Failed to download {file_resource['filename']}: {response.text}"
+            self.logger.error(msg)
+            raise ZenodoError(msg, response.status_code)
+
+        return response
 
     def publish(self, deposition):
         """
@@ -305,8 +791,12 @@ class ZenodoStorage:
         if deposition["submitted"]:
             return deposition
 
-        response = requests.post(
-            deposition["links"]["publish"], params={"access_token": self.key}
+        response = self.request(
+            "POST",
+            deposition["links"]["publish"],
+            idempotent=False,
+            operation="publish",
+            params={"access_token": self.key},
         )
         jsr = response.json()
 
@@ -0,0 +1,588 @@
+"""A local stand-in for the Zenodo deposition API, for tests and benchmarks."""
+import argparse
+import email.parser
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from hashlib import md5
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from uuid import uuid4
+
+FILE_API_MAX_SIZE: int = 100 * 1024 * 1024
+
+
+class FakeZenodoState:
+    """The depositions, files and buckets held by a fake Zenodo server."""
+
+    def __init__(self, base_url):
+        """
+        Prepare an empty set of depositions.
+
+        Args:
+            base_url (str): the url the server is reachable at, without a trailing
+                slash. Used to build the links in API responses.
+
+        Returns:
+            FakeZenodoState
+
+        """
+        self.base_url = base_url
+        self.lock = threading.RLock()
+        self.ids = itertools.count(1000)
+        self.depositions = {}
+        self.buckets = {}
+
+    @property
+    def api_root(self):
+        """The root of the API, as expected by ZenodoStorage."""
+        return self.base_url + "/api"
+
+    def new_deposition(self, metadata, conceptrecid=None):
+        """Create a draft deposition, optionally as a new version of a concept."""
+        depid = next(self.ids)
+        conceptrecid = depid if conceptrecid is None else conceptrecid
+        bucket = str(uuid4())
+        deposition = {
+            "id": depid,
+            "conceptrecid": conceptrecid,
+            "conceptdoi": f"10.5072/zenodo.{conceptrecid}",
+            "metadata": metadata,
+            "state": "unsubmitted",
+            "submitted": False,
+            "bucket": bucket,
+            "files": [],
+            "latest_draft": None,
+        }
+        self.depositions[depid] = deposition
+        self.buckets[bucket] = depid
+        return deposition
+
+    def concept_versions(self, conceptrecid):
+        """All the depositions of a concept, oldest first."""
+        return [
+            d for d in self.depositions.values() if d["conceptrecid"] == conceptrecid
+        ]
+
+    def latest(self):
+        """The most recent version (draft or published) of every concept."""
+        latest = {}
+
+        for deposition in self.depositions.values():
+            latest[deposition["conceptrecid"]] = deposition
+
+        return list(latest.values())
+
+    def file_repr(self, deposition, file):
+        """Describe a file per https://developers.zenodo.org/#deposition-files."""
+        return {
+            "id": file["id"],
+            "filename": file["filename"],
+            "filesize": len(file["content"]),
+            "checksum": file["checksum"],
+            "links": {
+                "self": f"{self.api_root}/deposit/depositions/{deposition['id']}"
+                f"/files/{file['id']}",
+                "download": f"{self.api_root}/files/{deposition['bucket']}"
+                f"/{file['filename']}",
+            },
+        }
+
+    def deposition_repr(self, deposition):
+        """Describe a deposition per https://developers.zenodo.org/#depositions."""
+        self_url = f"{self.api_root}/deposit/depositions/{deposition['id']}"
+        links = {
+            "self": self_url,
+            "html": f"{self.base_url}/deposit/{deposition['id']}",
+            "files": f"{self_url}/files",
+            "publish": f"{self_url}/actions/publish",
+            "newversion": f"{self_url}/actions/newversion",
+        }
+
+        if not deposition["submitted"]:
+            links["bucket"] = f"{self.api_root}/files/{deposition['bucket']}"
+
+        if deposition["latest_draft"] is not None:
+            draft_id = deposition["latest_draft"]
+            links["latest_draft"] = f"{self.api_root}/deposit/depositions/{draft_id}"
+
+        jsr = {
+            "id": deposition["id"],
+            "conceptrecid": str(deposition["conceptrecid"]),
+            "conceptdoi": deposition["conceptdoi"],
+            "title": deposition["metadata"].get("title", ""),
+            "metadata": deposition["metadata"],
+            "state": deposition["state"],
+            "submitted": deposition["submitted"],
+            "links": links,
+            "files": [self.file_repr(deposition, f) for f in deposition["files"]],
+        }
+
+        if deposition["submitted"]:
+            jsr["doi"] = f"10.5072/zenodo.{deposition['id']}"
+
+        return jsr
+
+    def add_file(self, deposition, filename, content):
+        """Add or replace a file in a deposition."""
+        deposition["files"] = [
+            f for f in deposition["files"] if f["filename"] != filename
+        ]
+        file = {
+            "id": str(uuid4()),
+            "filename": filename,
+            "content": content,
+            "checksum": md5(content).hexdigest(),  # nosec: B324
+        }
+        deposition["files"].append(file)
+        return file
+
+
+def _matches(deposition, query):
+    """Check whether a deposition matches a simple Zenodo search query."""
+    for field, value in re.findall(r'(\w+)\s*[:=]\s*"([^"]*)"', query or ""):
+        metadata = deposition["metadata"]
+
+        if field in ["keyword", "keywords"]:
+            if value not in metadata.get("keywords", []):
+                return False
+        elif field == "conceptdoi":
+            if value != deposition["conceptdoi"]:
+                return False
+        elif field == "doi":
+            if value != f"10.5072/zenodo.{deposition['id']}":
+                return False
+        elif value != str(metadata.get(field)):
+            return False
+
+    return True
+
+
+class FakeZenodoHandler(BaseHTTPRequestHandler):
+    """Serve the subset of the Zenodo API used by ZenodoStorage."""
+
+    protocol_version = "HTTP/1.1"
+    routes = [
+        ("GET", r"/api/deposit/depositions", "list_depositions"),
+        ("POST", r"/api/deposit/depositions", "create_deposition"),
+        ("GET", r"/api/deposit/depositions/(\d+)", "get_deposition"),
+        ("PUT", r"/api/deposit/depositions/(\d+)", "update_deposition"),
+        ("POST", r"/api/deposit/depositions/(\d+)/actions/newversion", "newversion"),
+        ("POST", r"/api/deposit/depositions/(\d+)/actions/publish", "publish"),
+        ("GET", r"/api/deposit/depositions/(\d+)/files", "list_files"),
+        ("POST", r"/api/deposit/depositions/(\d+)/files", "create_file"),
+        ("PUT", r"/api/deposit/depositions/(\d+)/files/([\w-]+)", "rename_file"),
+        ("DELETE", r"/api/deposit/depositions/(\d+)/files/([\w-]+)", "delete_file"),
+        ("PUT", r"/api/files/([\w-]+)/(.+)", "bucket_upload"),
+        ("GET", r"/api/files/([\w-]+)/(.+)", "download"),
+    ]
+
+    def log_message(self, fmt, *args):
+        """Keep quiet, unless the server is verbose."""
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    @property
+    def state(self):
+        """The depositions held by the server."""
+        return self.server.state
+
+    def do_GET(self):  # noqa: N802
+        """Dispatch a GET request."""
+        self.dispatch("GET")
+
+    def do_POST(self):  # noqa: N802
+        """Dispatch a POST request."""
+        self.dispatch("POST")
+
+    def do_PUT(self):  # noqa: N802
+        """Dispatch a PUT request."""
+        self.dispatch("PUT")
+
+    def do_DELETE(self):  # noqa: N802
+        """Dispatch a DELETE request."""
+        self.dispatch("DELETE")
+
+    def dispatch(self, method):
+        """Route a request, after applying the configured latency and errors."""
+        url = urlsplit(self.path)
+        self.query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        body = self.read_body()
+        server = self.server
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if (
+            server.error_rate
+            and (server.error_methods is None or method in server.error_methods)
+            and server.random.random() < server.error_rate
+        ):
+            status = server.random.choice(server.error_statuses)
+            return self.send_json(status, {"status": status}, {"Retry-After": "0"})
+
+        for route_method, pattern, name in self.routes:
+            match = re.fullmatch(pattern, url.path)
+
+            if route_method == method and match:
+                args = [unquote(arg) for arg in match.groups()]
+                with self.state.lock:
+                    return getattr(self, name)(body, *args)
+
+        self.send_json(404, {"message": f"No route for {method} {url.path}"})
+
+    def throttle(self, size):
+        """Sleep long enough to simulate the configured bandwidth."""
+        if self.server.bandwidth:
+            time.sleep(size / self.server.bandwidth)
+
+    def read_body(self):
+        """Read the request body, if any."""
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        self.throttle(length)
+        return body
+
+    def send_bytes(self, status, content, content_type, headers=None):
+        """Send a response with the given body."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+
+        self.end_headers()
+        self.throttle(len(content))
+        self.wfile.write(content)
+
+    def send_json(self, status, jsr, headers=None):
+        """Send a JSON response."""
+        content = b"" if jsr is None else json.dumps(jsr).encode()
+        self.send_bytes(status, content, "application/json", headers)
+
+    def deposition(self, depid):
+        """Look up a deposition by id, sending a 404 if it doesn't exist."""
+        deposition = self.state.depositions.get(int(depid))
+
+        if deposition is None:
+            self.send_json(404, {"message": f"Deposition {depid} not found"})
+
+        return deposition
+
+    def editable(self, depid):
+        """Look up an unpublished deposition, sending an error if it isn't one."""
+        deposition = self.deposition(depid)
+
+        if deposition is not None and deposition["submitted"]:
+            self.send_json(400, {"message": f"Deposition {depid} is published"})
+            return
+
+        return deposition
+
+    def list_depositions(self, body):
+        """Search the latest version of each deposition."""
+        matches = [
+            self.state.deposition_repr(d)
+            for d in self.state.latest()
+            if _matches(d, self.query.get("q"))
+        ]
+        self.send_json(200, matches)
+
+    def create_deposition(self, body):
+        """Create a new, unversioned deposition."""
+        metadata = json.loads(body or b"{}").get("metadata", {})
+        deposition = self.state.new_deposition(metadata)
+        self.send_json(201, self.state.deposition_repr(deposition))
+
+    def get_deposition(self, body, depid):
+        """Describe a single deposition."""
+        if deposition := self.deposition(depid):
+            self.send_json(200, self.state.deposition_repr(deposition))
+
+    def update_deposition(self, body, depid):
+        """Replace the metadata of a draft deposition."""
+        if deposition := self.editable(depid):
+            deposition["metadata"] = json.loads(body).get("metadata", {})
+            self.send_json(200, self.state.deposition_repr(deposition))
+
+    def newversion(self, body, depid):
+        """Create a draft of a new version, with copies of the latest files."""
+        if (deposition := self.deposition(depid)) is None:
+            return
+
+        versions = self.state.concept_versions(deposition["conceptrecid"])
+        draft = versions[-1]
+
+        if draft["submitted"]:
+            draft = self.state.new_deposition(
+                dict(deposition["metadata"]), deposition["conceptrecid"]
+            )
+
+            for file in versions[-1]["files"]:
+                self.state.add_file(draft, file["filename"], file["content"])
+
+        deposition["latest_draft"] = draft["id"]
+        self.send_json(201, self.state.deposition_repr(deposition))
+
+    def publish(self, body, depid):
+        """Publish a draft deposition."""
+        if (deposition := self.editable(depid)) is None:
+            return
+
+        if not deposition["files"]:
+            self.send_json(400, {"message": "Minimum one file must be provided"})
+            return
+
+        deposition["state"] = "done"
+        deposition["submitted"] = True
+
+        for version in self.state.concept_versions(deposition["conceptrecid"]):
+            version["latest_draft"] = None
+
+        self.send_json(202, self.state.deposition_repr(deposition))
+
+    def list_files(self, body, depid):
+        """List the files in a deposition, a page at a time if a size is given."""
+        if (deposition := self.deposition(depid)) is None:
+            return
+
+        files = deposition["files"]
+        headers = {}
+
+        if "size" in self.query:
+            size = int(self.query["size"])
+            page = int(self.query.get("page", 1))
+            files = files[(page - 1) * size : page * size]
+
+            if page * size < len(deposition["files"]):
+                url = f"{self.state.api_root}/deposit/depositions/{depid}/files"
+                headers["Link"] = f'<{url}?page={page + 1}&size={size}>; rel="next"'
+
+        files = [self.state.file_repr(deposition, f) for f in files]
+        self.send_json(200, files, headers)
+
+    def create_file(self, body, depid):
+        """Add a file to a draft deposition, using the multipart file api."""
+        if (deposition := self.editable(depid)) is None:
+            return
+
+        message = email.parser.BytesParser().parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+        fields = {
+            part.get_param("name", header="content-disposition"): part
+            for part in message.get_payload()
+        }
+        name = fields["name"].get_payload(decode=True).decode()
+        content = fields["file"].get_payload(decode=True)
+
+        if len(content) > FILE_API_MAX_SIZE:
+            self.send_json(400, {"message": "File too large for the file api"})
+        elif any(f["filename"] == name for f in deposition["files"]):
+            self.send_json(400, {"message": f"Filename {name} already exists"})
+        else:
+            file = self.state.add_file(deposition, name, content)
+            self.send_json(201, self.state.file_repr(deposition, file))
+
+    def rename_file(self, body, depid, file_id):
+        """Rename a file in a draft deposition."""
+        if (deposition := self.editable(depid)) is None:
+            return
+
+        filename = json.loads(body or b"{}").get("filename")
+        files = {f["id"]: f for f in deposition["files"]}
+
+        if file_id not in files:
+            self.send_json(404, {"message": f"File {file_id} not found"})
+        elif not filename:
+            self.send_json(400, {"message": "Missing filename"})
+        elif any(f["filename"] == filename for f in deposition["files"]):
+            self.send_json(400, {"message": f"File {filename} already exists"})
+        else:
+            files[file_id]["filename"] = filename
+            self.send_json(200, self.state.file_repr(deposition, files[file_id]))
+
+    def delete_file(self, body, depid, file_id):
+        """Remove a file from a draft deposition."""
+        if (deposition := self.editable(depid)) is None:
+            return
+
+        remaining = [f for f in deposition["files"] if f["id"] != file_id]
+
+        if len(remaining) == len(deposition["files"]):
+            self.send_json(404, {"message": f"File {file_id} not found"})
+        else:
+            deposition["files"] = remaining
+            self.send_json(204, None)
+
+    def bucket_upload(self, body, bucket, filename):
+        """Add or replace a file in a draft deposition, using the bucket api."""
+        if bucket not in self.state.buckets:
+            self.send_json(404, {"message": f"Bucket {bucket} not found"})
+            return
+
+        if (deposition := self.editable(self.state.buckets[bucket])) is None:
+            return
+
+        file = self.state.add_file(deposition, filename, body)
+        jsr = self.state.file_repr(deposition, file)
+        self.send_json(
+            201,
+            {
+                "key": filename,
+                "size": jsr["filesize"],
+                "checksum": f"md5:{jsr['checksum']}",
+                "links": jsr["links"],
+            },
+        )
+
+    def download(self, body, bucket, filename):
+        """Send the contents of a file, honoring single byte range requests."""
+        deposition = self.state.depositions.get(self.state.buckets.get(bucket))
+        files = [] if deposition is None else deposition["files"]
+        file = next((f for f in files if f["filename"] == filename), None)
+
+        if file is None:
+            self.send_json(404, {"message": f"File {filename} not found"})
+            return
+
+        content = file["content"]
+        match = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+
+        if match is None:
+            self.send_bytes(200, content, "application/octet-stream")
+            return
+
+        start = int(match.group(1))
+        headers = {"Content-Range": f"bytes {start}-{len(content) - 1}/{len(content)}"}
+        self.send_bytes(206, content[start:], "application/octet-stream", headers)
+
+
+class FakeZenodo:
+    """
+    A local HTTP server mimicking the parts of the Zenodo API used by this package.
+
+    Depositions, versions, the bucket and file apis, publishing and downloads are
+    all held in memory. Point a ZenodoStorage at it with
+    ``ZenodoStorage(key=..., api_root=fake.api_root)``. Latency, bandwidth limits
+    and transient errors can be injected to exercise and benchmark the archiver.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        bandwidth=None,
+        error_rate=0.0,
+        error_statuses=(502, 503),
+        error_methods=None,
+        seed=None,
+        verbose=False,
+    ):
+        """
+        Prepare the server. Call :meth:`start` (or use it as a context manager).
+
+        Args:
+            host (str): the address to listen on.
+            port (int): the port to listen on. By default a free port is chosen.
+            latency (float): seconds added to the handling of every request.
+            bandwidth (float): bytes per second at which request and response
+                bodies are transferred. Unlimited by default.
+            error_rate (float): the probability that a request fails with one of
+                ``error_statuses`` before being handled.
+            error_statuses (tuple): the HTTP statuses of injected errors.
+            error_methods (tuple): the HTTP methods of the requests errors may be
+                injected into. By default, any request may fail.
+            seed (int): seed for the random choice of injected errors.
+            verbose (bool): whether to log every request.
+
+        Returns:
+            FakeZenodo
+
+        """
+        self.server = ThreadingHTTPServer((host, port), FakeZenodoHandler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.server.bandwidth = bandwidth
+        self.server.error_rate = error_rate
+        self.server.error_statuses = error_statuses
+        self.server.error_methods = error_methods
+        self.server.random = random.Random(seed)  # nosec: B311
+        self.server.verbose = verbose
+        self.server.state = FakeZenodoState(
+            f"http://{host}:{self.server.server_address[1]}"
+        )
+        self.thread = None
+
+    @property
+    def state(self):
+        """The depositions held by the server."""
+        return self.server.state
+
+    @property
+    def api_root(self):
+        """The root of the API, as expected by ZenodoStorage."""
+        return self.state.api_root
+
+    def start(self):
+        """Serve requests from a background thread."""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving requests."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        """Start the server."""
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        """Stop the server."""
+        self.stop()
+
+
+def main():
+    """Run a fake Zenodo server until interrupted."""
+    parser = argparse.ArgumentParser(description="Run a local fake Zenodo API")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds added to each request"
+    )
+    parser.add_argument(
+        "--bandwidth", type=float, default=None, help="Bytes per second transferred"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Probability that a request fails with a 502 or 503",
+    )
+    args = parser.parse_args()
+
+    fake = FakeZenodo(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        bandwidth=args.bandwidth,
+        error_rate=args.error_rate,
+        verbose=True,
+    )
+    print(f"Serving a fake Zenodo API at {fake.api_root}")
+
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        fake.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
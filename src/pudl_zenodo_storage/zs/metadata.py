@@ -1,5 +1,8 @@
 """Metadata for Zenodo depositions archiving PUDL raw input data."""
-from pudl.metadata.classes import Contributor, DataSource
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pudl.metadata.classes import Contributor
 
 UUIDS: dict[str, str] = {
     "censusdp1tract": "beb36017-3fca-49be-a93a-7298f30ca3a3",
@@ -31,7 +34,7 @@ following resources:
 
 
 def _parse_contributor_metadata(
-    pudl_contributors: list[Contributor],
+    pudl_contributors: list["Contributor"],
 ) -> list[dict[str, str]]:
     """Reformat PUDL contributor metadata to fit Zenodo requirements."""
     zenodo_cont_list = []
@@ -49,6 +52,9 @@ def _parse_contributor_metadata(
 
 def generate_metadata(data_source_id: str) -> dict[str, str]:
     """Construct the metadata required for a Zenodo deposition."""
+    # Imported here, as the PUDL metadata is slow to import.
+    from pudl.metadata.classes import DataSource
+
     data_source = DataSource.from_id(data_source_id)
 
     return {
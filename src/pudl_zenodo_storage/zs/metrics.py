@@ -0,0 +1,251 @@
+"""Record the time and bytes spent on Zenodo API calls, and export the totals."""
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+
+PROMETHEUS_PREFIX = "pudl_zenodo"
+
+
+def _quantile(values, q):
+    """The q-th quantile of a non-empty list of values."""
+    if len(values) == 1:
+        return values[0]
+
+    return statistics.quantiles(values, n=100, method="inclusive")[round(q * 100) - 1]
+
+
+def _write_atomic(path, content):
+    """Replace a file in one step, so readers never see it half written."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    with tempfile.NamedTemporaryFile("w", dir=directory, delete=False) as f:
+        f.write(content)
+
+    os.chmod(f.name, 0o644)  # nosec: B103
+    os.replace(f.name, path)
+
+
+def _escape(value):
+    """Escape a Prometheus label value."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    """Format Prometheus labels."""
+    pairs = ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items()))
+    return f"{{{pairs}}}"
+
+
+class OperationMetrics:
+    """Running totals for one kind of API call."""
+
+    def __init__(self):
+        """
+        Start with no calls.
+
+        Returns:
+            OperationMetrics
+
+        """
+        self.statuses = Counter()
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latencies = []
+
+    def add(self, status, sent, received, retries, latency):
+        """Add a call to the totals."""
+        self.statuses["error" if status is None else str(status)] += 1
+        self.retries += retries
+        self.bytes_sent += sent
+        self.bytes_received += received
+        self.latencies.append(latency)
+
+    def summary(self):
+        """Summarize the calls as a dict."""
+        latencies = sorted(self.latencies)
+
+        return {
+            "calls": len(latencies),
+            "statuses": dict(self.statuses),
+            "retries": self.retries,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency_seconds": {
+                "total": sum(latencies),
+                "mean": statistics.fmean(latencies),
+                "p50": _quantile(latencies, 0.5),
+                "p95": _quantile(latencies, 0.95),
+                "max": latencies[-1],
+            },
+        }
+
+
+class MetricsRecorder:
+    """
+    Collect timing spans for API calls over a run, aggregated by operation.
+
+    Each call made through ZenodoStorage.request (and its async counterpart) is
+    recorded once, however many attempts it took, with its final status, the bytes
+    sent and received, the number of retries and its latency, including any time
+    spent waiting on the rate limiter or backing off between attempts. The totals
+    can be written as a JSON report, and as a Prometheus textfile for the
+    node_exporter textfile collector. Recording is thread safe.
+    """
+
+    def __init__(self):
+        """
+        Start a run with no calls recorded.
+
+        Returns:
+            MetricsRecorder
+
+        """
+        self.started = time.time()
+        self.operations = {}
+        self.lock = threading.Lock()
+
+    def record(self, operation, status, sent=0, received=0, retries=0, latency=0.0):
+        """
+        Record a completed API call.
+
+        Args:
+            operation (str): the kind of call, e.g. upload or get_deposition.
+            status (int): the HTTP status of the last attempt, or None if no
+                response was received.
+            sent (int): the number of bytes sent in the last attempt's body.
+            received (int): the number of bytes in the last response's body.
+            retries (int): the number of attempts made after the first.
+            latency (float): seconds from the start of the first attempt until the
+                end of the last.
+
+        Returns:
+            None
+
+        """
+        with self.lock:
+            if operation not in self.operations:
+                self.operations[operation] = OperationMetrics()
+
+            self.operations[operation].add(status, sent, received, retries, latency)
+
+    def report(self, labels=None):
+        """
+        Summarize the run.
+
+        Args:
+            labels (dict): extra fields identifying the run, e.g. the dataset.
+
+        Returns:
+            dict: the run's labels, timing and totals, with a summary of each
+            operation.
+
+        """
+        with self.lock:
+            operations = {k: v.summary() for k, v in sorted(self.operations.items())}
+
+        duration = time.time() - self.started
+        sent = sum(op["bytes_sent"] for op in operations.values())
+        received = sum(op["bytes_received"] for op in operations.values())
+
+        return {
+            "labels": labels or {},
+            "started": self.started,
+            "duration_seconds": duration,
+            "calls": sum(op["calls"] for op in operations.values()),
+            "retries": sum(op["retries"] for op in operations.values()),
+            "bytes_sent": sent,
+            "bytes_received": received,
+            "sent_bytes_per_second": sent / duration if duration else 0.0,
+            "received_bytes_per_second": received / duration if duration else 0.0,
+            "operations": operations,
+        }
+
+    def write_json(self, path, labels=None):
+        """
+        Write the run's report as JSON.
+
+        Args:
+            path (str): where to write the report.
+            labels (dict): extra fields identifying the run, e.g. the dataset.
+
+        Returns:
+            None
+
+        """
+        _write_atomic(path, json.dumps(self.report(labels), indent=4) + "\n")
+
+    def prometheus(self, labels=None):
+        """
+        Format the run's report in the Prometheus text exposition format.
+
+        Args:
+            labels (dict): labels added to every sample, e.g. the dataset.
+
+        Returns:
+            str: gauges describing the most recent run.
+
+        """
+        labels = labels or {}
+        report = self.report(labels)
+        samples = {
+            "run_start_timestamp_seconds": [(labels, report["started"])],
+            "run_duration_seconds": [(labels, report["duration_seconds"])],
+            "run_sent_bytes_per_second": [(labels, report["sent_bytes_per_second"])],
+            "run_received_bytes_per_second": [
+                (labels, report["received_bytes_per_second"])
+            ],
+            "run_calls": [],
+            "run_retries": [],
+            "run_sent_bytes": [],
+            "run_received_bytes": [],
+            "run_latency_seconds": [],
+        }
+
+        for name, op in report["operations"].items():
+            op_labels = {**labels, "operation": name}
+
+            for status, count in op["statuses"].items():
+                samples["run_calls"].append(({**op_labels, "status": status}, count))
+
+            samples["run_retries"].append((op_labels, op["retries"]))
+            samples["run_sent_bytes"].append((op_labels, op["bytes_sent"]))
+            samples["run_received_bytes"].append((op_labels, op["bytes_received"]))
+
+            for stat, value in op["latency_seconds"].items():
+                samples["run_latency_seconds"].append(
+                    ({**op_labels, "stat": stat}, value)
+                )
+
+        lines = []
+
+        for name, values in samples.items():
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} gauge")
+            lines += [
+                f"{PROMETHEUS_PREFIX}_{name}{_labels(sample_labels)} {value}"
+                for sample_labels, value in values
+            ]
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, labels=None):
+        """
+        Write the run's report as a Prometheus textfile.
+
+        The file is replaced in one step, as the textfile collector requires.
+
+        Args:
+            path (str): where to write the metrics, usually a .prom file in the
+                collector's directory.
+            labels (dict): labels added to every sample, e.g. the dataset.
+
+        Returns:
+            None
+
+        """
+        _write_atomic(path, self.prometheus(labels))
@@ -0,0 +1,137 @@
+"""Stream multipart/form-data request bodies without holding them in memory."""
+import io
+from uuid import uuid4
+
+
+def _quote(value):
+    """Escape a value for use in a Content-Disposition header."""
+    for char, escaped in [('"', "%22"), ("\r", "%0D"), ("\n", "%0A")]:
+        value = value.replace(char, escaped)
+
+    return value
+
+
+class MultipartEncoder:
+    """
+    Read-only file-like multipart/form-data body, with a single file field.
+
+    The form fields and part headers are generated up front, but the file itself is
+    read from its handle in chunks as the body is sent, so memory use does not
+    depend on the size of the file. The body has a known length, so it is sent with
+    a Content-Length header rather than chunked, and it can be rewound to the start
+    with ``seek(0)`` if the request needs to be sent again.
+    """
+
+    def __init__(self, fields, file_field, file_name, file_handle, file_size):
+        """
+        Prepare a multipart body.
+
+        Args:
+            fields (dict): form field names and their string values.
+            file_field (str): the form field name of the file.
+            file_name (str): the file name sent with the file.
+            file_handle: an open file handle or bytes like object, positioned at
+                the start of the content to send.
+            file_size (int): the number of bytes to send from the file handle.
+
+        Returns:
+            MultipartEncoder
+
+        """
+        self.boundary = uuid4().hex
+        head = b"".join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(k)}"'
+            f"\r\n\r\n{v}\r\n".encode()
+            for k, v in fields.items()
+        )
+        head += (
+            f"--{self.boundary}\r\nContent-Disposition: form-data; "
+            f'name="{_quote(file_field)}"; filename="{_quote(file_name)}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+        self.head = io.BytesIO(head)
+        self.head_size = len(head)
+        self.tail = io.BytesIO(tail)
+        self.file_handle = file_handle
+        self.file_start = file_handle.tell()
+        self.file_end = len(head) + file_size
+        self.length = self.file_end + len(tail)
+        self.position = 0
+
+    @property
+    def content_type(self):
+        """The Content-Type header value for this body."""
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        """The total size of the body, in bytes."""
+        return self.length
+
+    def tell(self):
+        """The number of bytes read so far."""
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        """
+        Rewind the body to the start.
+
+        Args:
+            offset (int): must be 0.
+            whence (int): must be io.SEEK_SET.
+
+        Returns:
+            int: the new position, always 0.
+
+        """
+        if offset != 0 or whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("Can only seek to the start of the body")
+
+        self.head.seek(0)
+        self.file_handle.seek(self.file_start)
+        self.tail.seek(0)
+        self.position = 0
+        return 0
+
+    def _current_part(self):
+        """Find the part being read, and how many bytes are left in it."""
+        if self.position < self.head_size:
+            return self.head, self.head_size - self.position
+
+        if self.position < self.file_end:
+            return self.file_handle, self.file_end - self.position
+
+        return self.tail, self.length - self.position
+
+    def read(self, size=-1):
+        """
+        Read the next chunk of the body.
+
+        Args:
+            size (int): the maximum number of bytes to read. Reads everything that
+                is left if negative.
+
+        Returns:
+            bytes: an empty bytes object once the whole body has been read.
+
+        """
+        remaining = self.length - self.position
+
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+
+        chunks = []
+
+        while size > 0:
+            part, left = self._current_part()
+            chunk = part.read(min(size, left))
+
+            if not chunk:
+                raise OSError("File ended before the expected number of bytes")
+
+            chunks.append(chunk)
+            size -= len(chunk)
+            self.position += len(chunk)
+
+        return b"".join(chunks)
@@ -0,0 +1,96 @@
+"""Pace Zenodo API calls to stay under the server's rate limit."""
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Token bucket scheduler, tuned by the rate limit headers Zenodo returns.
+
+    Each response reports how many calls remain (``X-RateLimit-Remaining``) out of
+    the limit (``X-RateLimit-Limit``) before the window resets
+    (``X-RateLimit-Reset``, in seconds since the epoch). The bucket is refilled at
+    the rate that spreads the remaining calls evenly over what is left of the window,
+    keeping a fraction of the limit in reserve, so that sustained throughput stays
+    just under the limit rather than bursting into 429s.
+
+    Until a response carrying these headers is seen, calls are not paced at all.
+    The scheduler is shared by all threads (and coroutines) using one client.
+    """
+
+    def __init__(self, rate=None, burst=5, headroom=0.9):
+        """
+        Prepare a rate limiter.
+
+        Args:
+            rate (float): the initial number of calls allowed per second. None
+                means no limit until the server reports one.
+            burst (int): the number of calls that can be made back to back.
+            headroom (float): the fraction of the server's limit to use.
+
+        Returns:
+            RateLimiter
+
+        """
+        self.rate = rate
+        self.burst = burst
+        self.headroom = headroom
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+
+        if self.rate is not None:
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+
+        self.updated = now
+
+    def reserve(self):
+        """
+        Take a token for one API call.
+
+        Returns:
+            float: the number of seconds to wait before making the call.
+
+        """
+        with self.lock:
+            self._refill()
+
+            if self.rate is None:
+                return 0.0
+
+            self.tokens -= 1
+            return max(-self.tokens / self.rate, 0.0)
+
+    def update(self, headers):
+        """
+        Adjust the pace of calls to the limits reported by the server.
+
+        Args:
+            headers (Mapping): the headers of an API response. Responses without
+                rate limit headers are ignored.
+
+        Returns:
+            None
+
+        """
+        try:
+            limit = int(headers["X-RateLimit-Limit"])
+            remaining = int(headers["X-RateLimit-Remaining"])
+            window = float(headers["X-RateLimit-Reset"]) - time.time()
+        except (KeyError, TypeError, ValueError):
+            return
+
+        if window <= 0:
+            return
+
+        budget = remaining - (1 - self.headroom) * limit
+
+        with self.lock:
+            self._refill()
+            self.rate = max(budget, 1) / window
+            self.tokens = min(self.tokens, max(budget, 0))
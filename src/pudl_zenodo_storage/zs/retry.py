@@ -0,0 +1,129 @@
+"""Policies for retrying Zenodo API calls that fail transiently."""
+import math
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+RETRY_STATUSES: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value):
+    """
+    Interpret the value of a Retry-After header.
+
+    Args:
+        value (str): either a number of seconds or an HTTP date.
+
+    Returns:
+        float: seconds to wait before retrying, or None if the value is missing or
+        can't be interpreted.
+
+    """
+    if value is None:
+        return
+
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        return max(seconds, 0.0) if math.isfinite(seconds) else None
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return
+
+    # Dates in the -0000 zone are parsed as naive, but are still in UTC
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class RetryPolicy:
+    """
+    Decide whether and when to retry a failed API call.
+
+    Calls that are safe to repeat (idempotent) are retried on connection errors and
+    on any of the retryable status codes. Other calls are only retried when the
+    server has explicitly turned them away with a 429, since they may otherwise have
+    taken effect. Delays grow exponentially with "full jitter", unless the server
+    sends a Retry-After header, which is honored up to a limit.
+    """
+
+    def __init__(
+        self,
+        max_attempts=5,
+        backoff=1.0,
+        max_backoff=60.0,
+        max_retry_after=300.0,
+        statuses=RETRY_STATUSES,
+    ):
+        """
+        Prepare a retry policy.
+
+        Args:
+            max_attempts (int): the total number of attempts made for one call,
+                including the first. A value of 1 disables retries.
+            backoff (float): the upper bound, in seconds, on the delay before the
+                first retry. It doubles on every subsequent retry.
+            max_backoff (float): the largest upper bound on a delay, in seconds.
+            max_retry_after (float): the longest delay asked for by a Retry-After
+                header that is honored, in seconds. Longer ones are cut short.
+            statuses (frozenset): HTTP status codes treated as transient.
+
+        Returns:
+            RetryPolicy
+
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.statuses = statuses
+
+    def should_retry(self, attempt, status=None, idempotent=True):
+        """
+        Decide whether to make another attempt.
+
+        Args:
+            attempt (int): the number of attempts made so far.
+            status (int): the HTTP status code of the last attempt, or None if it
+                failed to get a response at all.
+            idempotent (bool): whether repeating the call is harmless.
+
+        Returns:
+            bool
+
+        """
+        if attempt >= self.max_attempts:
+            return False
+
+        if status == 429:
+            return True
+
+        if status is None:
+            return idempotent
+
+        return idempotent and status in self.statuses
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Compute how long to wait before the next attempt.
+
+        Args:
+            attempt (int): the number of attempts made so far.
+            retry_after (str): the Retry-After header of the last response, if any.
+
+        Returns:
+            float: the delay in seconds.
+
+        """
+        seconds = parse_retry_after(retry_after)
+
+        if seconds is not None:
+            return min(seconds, self.max_retry_after)
+
+        ceiling = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)  # nosec: B311
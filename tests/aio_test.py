@@ -0,0 +1,165 @@
+"""Tests of the asynchronous Zenodo client against a local fake Zenodo server."""
+import asyncio
+import io
+import os
+from hashlib import md5
+
+from pudl_zenodo_storage.zs.aio import AsyncZenodoStorage
+from pudl_zenodo_storage.zs.core import ZenodoStorage
+from pudl_zenodo_storage.zs.fake import FakeZenodo
+from pudl_zenodo_storage.zs.metrics import MetricsRecorder
+from pudl_zenodo_storage.zs.retry import RetryPolicy
+from tests.conftest import METADATA
+
+
+def run(api_root, scenario, **kwargs):
+    """Run a coroutine function with a connected AsyncZenodoStorage."""
+
+    async def main():
+        async with AsyncZenodoStorage(key="key", api_root=api_root, **kwargs) as zs:
+            return await scenario(zs)
+
+    return asyncio.run(main())
+
+
+def test_deposition_lifecycle(fake_zenodo, tmp_path):
+    """Ensure a deposition can be created, filled, published and versioned."""
+    path = tmp_path / "b.zip"
+    path.write_bytes(b"b")
+
+    async def scenario(zenodo):
+        deposition = await zenodo.create_deposition(dict(METADATA))
+        await zenodo.bucket_api_upload(deposition, "a.zip", io.BytesIO(b"a"))
+
+        with open(path, "rb") as f:
+            resource = await zenodo.bucket_api_upload(deposition, "b.zip", f)
+
+        published = await zenodo.publish(deposition)
+        found = await zenodo.get_deposition(f'conceptdoi:"{published["conceptdoi"]}"')
+        new_version = await zenodo.new_deposition_version(published["conceptdoi"])
+        return resource, published, found, new_version
+
+    resource, published, found, new_version = run(fake_zenodo.api_root, scenario)
+    zenodo = ZenodoStorage(key="key", api_root=fake_zenodo.api_root)
+    files = {f["filename"]: f for f in zenodo.iter_files(new_version)}
+
+    assert resource["checksum"] == "md5:" + md5(b"b").hexdigest()  # nosec: B324
+    assert published["submitted"]
+    assert found["id"] == published["id"]
+    assert new_version["id"] != published["id"]
+    assert new_version["metadata"]["version"] == "2.0.0"
+    assert not new_version["submitted"]
+    assert sorted(files) == ["a.zip", "b.zip"]
+    assert files["a.zip"]["checksum"] == md5(b"a").hexdigest()  # nosec: B324
+
+
+def test_new_version_calls(fake_zenodo):
+    """Ensure both clients make a new version with the same calls."""
+    zenodo = ZenodoStorage(key="key", api_root=fake_zenodo.api_root)
+    deposition = zenodo.create_deposition(dict(METADATA))
+    zenodo.bucket_api_upload(deposition, "a.zip", io.BytesIO(b"a"))
+    conceptdoi = zenodo.publish(deposition)["conceptdoi"]
+    zenodo.metrics = MetricsRecorder()
+    zenodo.new_deposition_version(conceptdoi)
+    expected = zenodo.metrics.report()["operations"]
+
+    async def scenario(zenodo):
+        deposition = await zenodo.create_deposition(dict(METADATA))
+        await zenodo.bucket_api_upload(deposition, "a.zip", io.BytesIO(b"a"))
+        conceptdoi = (await zenodo.publish(deposition))["conceptdoi"]
+        zenodo.metrics = MetricsRecorder()
+        await zenodo.new_deposition_version(conceptdoi)
+        return zenodo.metrics.report()["operations"]
+
+    calls = run(fake_zenodo.api_root, scenario)
+
+    assert {k: v["calls"] for k, v in calls.items()} == {
+        k: v["calls"] for k, v in expected.items()
+    }
+    assert {k: v["calls"] for k, v in calls.items()} == {
+        "get_deposition": 1,
+        "new_version": 1,
+        "update_deposition": 1,
+    }
+
+
+def test_injected_errors_are_retried(tmp_path):
+    """Ensure transient errors are retried, with request bodies rewound."""
+    contents = {f"{i}.zip": os.urandom(100) for i in range(20)}
+
+    for name, content in contents.items():
+        (tmp_path / name).write_bytes(content)
+
+    async def scenario(zenodo):
+        deposition = await zenodo.create_deposition(dict(METADATA))
+
+        for i, (name, content) in enumerate(contents.items()):
+            if i % 2:
+                await zenodo.bucket_api_upload(deposition, name, io.BytesIO(content))
+                continue
+
+            # aiohttp closes files once they are sent, but the caller's handle stays
+            with open(tmp_path / name, "rb") as f:
+                await zenodo.bucket_api_upload(deposition, name, f)
+                assert not f.closed
+
+        return deposition
+
+    # POSTs aren't idempotent, so aren't retried on server errors
+    with FakeZenodo(error_rate=0.5, error_methods=("GET", "PUT")) as fake:
+        retry = RetryPolicy(max_attempts=50, backoff=0.0)
+        metrics = MetricsRecorder()
+        deposition = run(fake.api_root, scenario, retry=retry, metrics=metrics)
+        zenodo = ZenodoStorage(key="key", api_root=fake.api_root, retry=retry)
+        files = {f["filename"]: f for f in zenodo.iter_files(deposition)}
+
+    uploads = metrics.report()["operations"]["bucket_api_upload"]
+
+    assert uploads["calls"] == len(contents)
+    assert uploads["retries"] > 0
+    assert sorted(files) == sorted(contents)
+
+    for name, content in contents.items():
+        assert files[name]["checksum"] == md5(content).hexdigest()  # nosec: B324
+
+
+class FailFirst:
+    """Stands in for the fake server's random numbers, to fail its first request."""
+
+    def __init__(self):
+        """Count the requests seen."""
+        self.requests = 0
+
+    def random(self):
+        """Inject an error into the first request only."""
+        self.requests += 1
+        return 0.0 if self.requests == 1 else 1.0
+
+    def choice(self, statuses):
+        """Pick the first of the injected error statuses."""
+        return statuses[0]
+
+
+def test_in_memory_upload_is_retried():
+    """Ensure an in-memory body is sent again in full, and left open."""
+    content = os.urandom(100)
+    body = io.BytesIO(content)
+
+    async def scenario(zenodo):
+        deposition = await zenodo.create_deposition(dict(METADATA))
+        resource = await zenodo.bucket_api_upload(deposition, "a.zip", body)
+        return resource
+
+    with FakeZenodo(error_rate=1.0, error_methods=("PUT",)) as fake:
+        fake.server.random = FailFirst()
+        metrics = MetricsRecorder()
+        resource = run(
+            fake.api_root,
+            scenario,
+            retry=RetryPolicy(backoff=0.0),
+            metrics=metrics,
+        )
+
+    assert metrics.report()["operations"]["bucket_api_upload"]["retries"] == 1
+    assert resource["checksum"] == "md5:" + md5(content).hexdigest()  # nosec: B324
+    assert not body.closed
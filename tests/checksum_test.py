@@ -0,0 +1,109 @@
+"""Tests for computing checksums of local files."""
+import io
+import os
+from hashlib import md5
+
+import pytest
+
+from pudl_zenodo_storage.checksum import (
+    ChecksumCache,
+    HashingReader,
+    file_md5,
+    file_md5s,
+)
+from pudl_zenodo_storage.cli import local_fileinfo
+
+
+@pytest.fixture()
+def local_files(tmp_path):
+    """Write a handful of files of varying sizes."""
+    paths = []
+
+    for i in range(5):
+        path = tmp_path / f"file-{i}.zip"
+        path.write_bytes(os.urandom(1000 * i + 1))
+        paths.append(str(path))
+
+    return paths
+
+
+def test_file_md5(local_files):
+    """Ensure checksums match hashlib, regardless of the read size."""
+    for fp in local_files:
+        with open(fp, "rb") as f:
+            expected = md5(f.read()).hexdigest()  # nosec: B324
+
+        assert file_md5(fp) == expected
+        assert file_md5(fp, chunk_size=7) == expected
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_file_md5s(local_files, workers):
+    """Ensure serial and parallel hashing agree."""
+    checksums = file_md5s(local_files, workers=workers)
+
+    assert set(checksums) == set(local_files)
+
+    for fp, checksum in checksums.items():
+        assert checksum == file_md5(fp)
+
+
+def test_hashing_reader():
+    """Ensure bytes are hashed once as they are read, whatever the seeking."""
+    content = os.urandom(10_000)
+    handle = io.BytesIO(b"header" + content)
+    handle.seek(6)
+    reader = HashingReader(handle)
+
+    assert reader.read(4000) == content[:4000]
+
+    # A retry rewinds to the start, and the body length is found by seeking.
+    reader.seek(6)
+    reader.seek(0, io.SEEK_END)
+    reader.seek(3000)
+
+    assert reader.read(5000) == content[2994:7994]
+    assert reader.hexdigest() is None
+    assert reader.read() == content[7994:]
+    assert reader.hexdigest() == md5(content).hexdigest()  # nosec: B324
+
+
+def test_local_fileinfo(local_files):
+    """Ensure file info is keyed by file name."""
+    info = local_fileinfo(local_files, workers=2)
+
+    for fp in local_files:
+        path, name = os.path.split(fp)
+        assert info[name] == {"path": path, "checksum": file_md5(fp)}
+
+
+def test_local_fileinfo_unique_names(local_files, tmp_path):
+    """Ensure duplicate file names are rejected."""
+    duplicate = tmp_path / "other" / os.path.basename(local_files[0])
+    duplicate.parent.mkdir()
+    duplicate.write_bytes(b"duplicate")
+
+    with pytest.raises(ValueError):
+        local_fileinfo([*local_files, str(duplicate)])
+
+
+def test_checksum_cache(local_files, tmp_path):
+    """Ensure cached checksums are reused until the file changes."""
+    cache_path = str(tmp_path / "cache" / "checksums.sqlite")
+
+    with ChecksumCache(cache_path) as cache:
+        info = local_fileinfo(local_files, cache=cache)
+
+    with ChecksumCache(cache_path) as cache:
+        for fp in local_files:
+            assert cache.get(fp) == info[os.path.basename(fp)]["checksum"]
+
+        with open(local_files[0], "ab") as f:
+            f.write(b"changed")
+        os.remove(local_files[1])
+
+        assert cache.get(local_files[0]) is None
+        assert cache.evict() == 2
+        assert local_fileinfo(local_files[2:], cache=cache) == {
+            os.path.basename(fp): info[os.path.basename(fp)] for fp in local_files[2:]
+        }
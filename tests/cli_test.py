@@ -0,0 +1,121 @@
+"""Tests for the archiver script's planning and execution helpers."""
+import threading
+import time
+
+import pytest
+
+from pudl_zenodo_storage.cli import action_steps, run_concurrently
+
+
+def test_action_steps():
+    """Ensure local and remote files are sorted into the right actions."""
+    new_files = {
+        "same.zip": {"path": "/a", "checksum": "1"},
+        "changed.zip": {"path": "/a", "checksum": "2"},
+        "new.zip": {"path": "/a", "checksum": "3"},
+        "datapackage.json": {"path": "/a", "checksum": "4"},
+    }
+    old_files = {
+        "same.zip": {"checksum": "1"},
+        "changed.zip": {"checksum": "x"},
+        "gone.zip": {"checksum": "5"},
+        "datapackage.json": {"checksum": "6"},
+    }
+
+    steps = action_steps(new_files, old_files)
+
+    assert steps["create"] == {"new.zip": new_files["new.zip"]}
+    assert steps["update"] == {
+        "changed.zip": {"checksum": "x", "path": "/a", "local_checksum": "2"}
+    }
+    assert steps["delete"] == {"gone.zip": {"checksum": "5"}}
+
+
+def test_action_steps_from_iterator():
+    """Ensure remote files can be streamed, e.g. from ZenodoStorage.iter_files."""
+    new_files = {
+        "same.zip": {"path": "/a", "checksum": "1"},
+        "changed.zip": {"path": "/a", "checksum": "2"},
+        "new.zip": {"path": "/a", "checksum": "3"},
+    }
+    old_files = [
+        {"filename": "same.zip", "checksum": "1"},
+        {"filename": "changed.zip", "checksum": "x"},
+        {"filename": "gone.zip", "checksum": "5"},
+    ]
+
+    steps = action_steps(new_files, iter(old_files))
+
+    assert list(steps["create"]) == ["new.zip"]
+    assert list(steps["update"]) == ["changed.zip"]
+    assert list(steps["delete"]) == ["gone.zip"]
+
+
+def test_action_steps_renames():
+    """Ensure files that only changed name are renamed, not uploaded again."""
+    new_files = {
+        "ferc1-2020.zip": {"path": "/a", "checksum": "1"},
+        "ferc1-2021.zip": {"path": "/a", "checksum": "2"},
+        "ferc1-2022.zip": {"path": "/a", "checksum": "3"},
+    }
+    old_files = {
+        "ferc1_2020.zip": {"checksum": "1"},
+        "ferc1_2021.zip": {"checksum": "x"},
+        "ferc1_2019.zip": {"checksum": "3"},
+    }
+
+    steps = action_steps(new_files, old_files)
+
+    assert steps["create"] == {"ferc1-2021.zip": new_files["ferc1-2021.zip"]}
+    assert steps["delete"] == {"ferc1_2021.zip": {"checksum": "x"}}
+    assert steps["rename"] == {
+        "ferc1-2020.zip": {
+            "checksum": "1",
+            "path": "/a",
+            "previous_filename": "ferc1_2020.zip",
+        },
+        "ferc1-2022.zip": {
+            "checksum": "3",
+            "path": "/a",
+            "previous_filename": "ferc1_2019.zip",
+        },
+    }
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_run_concurrently(jobs):
+    """Ensure results keep their order and no more than `jobs` tasks run at once."""
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def task(i):
+        with lock:
+            running.append(i)
+            peak.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(i)
+        return i
+
+    results = run_concurrently([lambda i=i: task(i) for i in range(12)], jobs)
+
+    assert results == list(range(12))
+    assert max(peak) <= jobs
+
+
+def test_run_concurrently_raises():
+    """Ensure errors surface only after every task has finished."""
+    finished = []
+
+    def fail():
+        raise RuntimeError("failed")
+
+    def succeed():
+        time.sleep(0.01)
+        finished.append(True)
+
+    with pytest.raises(RuntimeError):
+        run_concurrently([fail, succeed, succeed], jobs=2)
+
+    assert len(finished) == 2
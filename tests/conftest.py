@@ -4,6 +4,18 @@ from uuid import uuid4
 
 import pytest
 
+from pudl_zenodo_storage.zs.fake import FakeZenodo
+
+KEY_ID = "00000000-0000-0000-0000-000000000000"
+METADATA = {
+    "title": "PUDL Test",
+    "upload_type": "dataset",
+    "description": "Test dataset for the fake server.",
+    "creators": [{"name": "Catalyst Cooperative"}],
+    "access_right": "open",
+    "keywords": ["test", KEY_ID],
+}
+
 
 @pytest.fixture()
 def zenodo_url() -> str:
@@ -11,3 +23,10 @@ def zenodo_url() -> str:
     depid = randint(10000, 99999)
     uuid = uuid4()
     return f"https://zenodo.org/api/deposit/depositions/{depid}/files/{uuid}"
+
+
+@pytest.fixture()
+def fake_zenodo():
+    """Run a fake Zenodo server for the duration of a test."""
+    with FakeZenodo() as fake:
+        yield fake
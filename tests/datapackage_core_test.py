@@ -0,0 +1,68 @@
+"""Tests for the core datapackage construction routines."""
+import pytest
+from faker import Faker
+
+from pudl.metadata.classes import DataSource
+from pudl_zenodo_storage.frictionless.core import (
+    DataPackage,
+    annual_archive_resource,
+    validate_resources,
+)
+
+
+def zenodo_files(count, url):
+    """Fake Zenodo file descriptors for an annual archive."""
+    fake = Faker()
+    return [
+        {
+            "filename": f"eia860-{2001 + i}.zip",
+            "links": {"download": f"{url}/{i}"},
+            "filesize": fake.pyint(min_value=1),
+            "checksum": fake.md5(raw_output=False),
+        }
+        for i in range(count)
+    ]
+
+
+def test_fast_path_matches_models(zenodo_url):
+    """Ensure the fast path produces the same descriptor as the pydantic models."""
+    data_source = DataSource.from_id("eia860")
+    dfiles = zenodo_files(20, zenodo_url)
+
+    slow = DataPackage.from_resource_archiver(
+        data_source, dfiles, annual_archive_resource
+    ).to_raw_datapackage_dict()
+    fast = DataPackage.raw_datapackage_dict(
+        data_source, dfiles, annual_archive_resource
+    )
+
+    slow.pop("created")
+    fast.pop("created")
+    assert fast == slow
+
+
+def test_validate_resources_fills_defaults(zenodo_url):
+    """Ensure defaults are filled in and unknown fields dropped."""
+    resource = annual_archive_resource("eia860-2001.zip", zenodo_url, 10, "abc")
+    del resource["encoding"]
+    resource["extra"] = "ignored"
+
+    (checked,) = validate_resources([resource])
+
+    assert checked["encoding"] == "utf-8"
+    assert "extra" not in checked
+
+
+def test_validate_resources_reports_all_errors(zenodo_url):
+    """Ensure every invalid field in the batch is reported at once."""
+    good = annual_archive_resource("eia860-2001.zip", zenodo_url, 10, "abc")
+    bad_url = {**good, "name": "bad_url", "path": "ftp://example.com/file"}
+    bad_size = {**good, "name": "bad_size", "bytes": "10"}
+
+    with pytest.raises(ValueError) as excinfo:
+        validate_resources([good, bad_url, bad_size])
+
+    message = str(excinfo.value)
+    assert "bad_url: path" in message
+    assert "bad_size: bytes" in message
+    assert "eia860-2001.zip" not in message
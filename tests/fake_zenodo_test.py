@@ -0,0 +1,504 @@
+"""End-to-end tests of the archiver against a local fake Zenodo server."""
+import io
+import json
+import os
+from hashlib import md5
+
+import pytest
+import requests
+
+import pudl_zenodo_storage.cli
+from pudl_zenodo_storage.audit import audit_deposition
+from pudl_zenodo_storage.checksum import ChecksumCache
+from pudl_zenodo_storage.cli import (
+    action_steps,
+    execute_actions,
+    initial_run,
+    local_fileinfo,
+    parse_audit,
+    remote_fileinfo,
+    run_audit,
+    upload_file,
+)
+from pudl_zenodo_storage.journal import OperationJournal
+from pudl_zenodo_storage.mirror import mirror_deposition
+from pudl_zenodo_storage.store import ContentStore
+from pudl_zenodo_storage.zs.core import ZenodoStorage
+from pudl_zenodo_storage.zs.fake import FakeZenodo
+from pudl_zenodo_storage.zs.metadata import UUIDS
+from pudl_zenodo_storage.zs.metrics import MetricsRecorder
+from pudl_zenodo_storage.zs.retry import RetryPolicy
+from tests.conftest import KEY_ID, METADATA
+
+
+def datapackager(dfiles):
+    """Produce a minimal datapackage descriptor."""
+    return {
+        "name": "pudl-test",
+        "resources": [
+            {
+                "name": f["filename"],
+                "path": f["links"]["download"],
+                "hash": f["checksum"],
+                "bytes": f["filesize"],
+            }
+            for f in dfiles
+        ],
+    }
+
+
+@pytest.fixture()
+def zenodo(fake_zenodo):
+    """A ZenodoStorage pointed at the fake server."""
+    return ZenodoStorage(
+        key="key", api_root=fake_zenodo.api_root, retry=RetryPolicy(backoff=0.0)
+    )
+
+
+def write_files(directory, contents):
+    """Write files with the given contents, returning their paths."""
+    directory.mkdir(exist_ok=True)
+    paths = []
+
+    for name, content in contents.items():
+        path = directory / name
+        path.write_bytes(content)
+        paths.append(str(path))
+
+    return sorted(paths)
+
+
+def test_deposition_lifecycle(zenodo):
+    """Ensure the fake server supports the ZenodoStorage workflow."""
+    deposition = zenodo.create_deposition(dict(METADATA))
+
+    assert zenodo.get_deposition(f'keywords: "{KEY_ID}"')["id"] == deposition["id"]
+
+    zenodo.bucket_api_upload(deposition, "a.txt", io.BytesIO(b"bucket"))
+    zenodo.file_api_upload(deposition, "b.txt", io.BytesIO(b"file"))
+    files = remote_fileinfo(zenodo, deposition)
+
+    assert sorted(files) == ["a.txt", "b.txt"]
+    assert requests.get(files["b.txt"]["links"]["download"]).content == b"file"
+
+    published = zenodo.publish(deposition)
+    new_version = zenodo.new_deposition_version(published["conceptdoi"])
+
+    assert new_version["id"] != published["id"]
+    assert new_version["metadata"]["version"] == "2.0.0"
+    assert not new_version["submitted"]
+    assert sorted(remote_fileinfo(zenodo, new_version)) == ["a.txt", "b.txt"]
+
+
+def test_new_version_calls(zenodo):
+    """Ensure a new version is made with as few calls as possible."""
+    deposition = zenodo.create_deposition(dict(METADATA))
+    zenodo.bucket_api_upload(deposition, "a.txt", io.BytesIO(b"a"))
+    published = zenodo.publish(deposition)
+    conceptdoi = published["conceptdoi"]
+
+    zenodo.metrics = MetricsRecorder()
+    new_version = zenodo.new_deposition_version(conceptdoi, deposition=published)
+    files = remote_fileinfo(zenodo, new_version, current=True)
+    calls = zenodo.metrics.report()["operations"]
+
+    assert {k: v["calls"] for k, v in calls.items()} == {
+        "new_version": 1,
+        "update_deposition": 1,
+    }
+    assert list(files) == ["a.txt"]
+    assert zenodo.concept_ids[conceptdoi] == new_version["id"]
+
+    # The concept's latest version is now looked up by id, rather than searched.
+    zenodo.bucket_api_upload(new_version, "b.txt", io.BytesIO(b"b"))
+    zenodo.publish(new_version)
+    zenodo.metrics = MetricsRecorder()
+    third = zenodo.new_deposition_version(conceptdoi)
+    calls = zenodo.metrics.report()["operations"]
+
+    assert {k: v["calls"] for k, v in calls.items()} == {
+        "get_deposition": 1,
+        "new_version": 1,
+        "update_deposition": 1,
+    }
+    assert third["metadata"]["version"] == "3.0.0"
+    assert sorted(remote_fileinfo(zenodo, third)) == ["a.txt", "b.txt"]
+
+
+@pytest.mark.parametrize("page_size", [1, 3, 100])
+def test_iter_files_pages(zenodo, page_size):
+    """Ensure every file is listed once, however the listing is paged."""
+    deposition = zenodo.create_deposition(dict(METADATA))
+
+    for i in range(7):
+        zenodo.bucket_api_upload(deposition, f"{i}.zip", io.BytesIO(b"x"))
+
+    names = [f["filename"] for f in zenodo.iter_files(deposition, page_size)]
+
+    assert names == [f"{i}.zip" for i in range(7)]
+
+
+def test_archive_and_update(zenodo, tmp_path):
+    """Ensure a first archive and a later update produce the right files."""
+    paths = write_files(tmp_path / "v1", {"a.zip": b"a", "b.zip": b"b", "c.zip": b"c"})
+    deposition = initial_run(zenodo, KEY_ID, dict(METADATA), datapackager, paths)
+    zenodo.publish(deposition)
+
+    paths = write_files(tmp_path / "v2", {"a.zip": b"a", "b.zip": b"B", "d.zip": b"d"})
+    local = local_fileinfo(paths, workers=1)
+    deposition = zenodo.get_deposition(f'keywords: "{KEY_ID}"')
+    steps = action_steps(local, remote_fileinfo(zenodo, deposition))
+    new_deposition = execute_actions(zenodo, deposition, datapackager, steps, jobs=4)
+    files = remote_fileinfo(zenodo, new_deposition)
+
+    assert sorted(files) == ["a.zip", "b.zip", "d.zip", "datapackage.json"]
+
+    for name, info in local.items():
+        assert files[name]["checksum"] == info["checksum"]
+
+    datapackage = requests.get(files["datapackage.json"]["links"]["download"]).json()
+    assert sorted(r["name"] for r in datapackage["resources"]) == [
+        "a.zip",
+        "b.zip",
+        "d.zip",
+    ]
+
+
+def test_interrupted_update(zenodo, tmp_path, monkeypatch):
+    """Ensure a run that failed part way resumes without repeating completed uploads."""
+    paths = write_files(tmp_path / "v1", {"a.zip": b"a", "b.zip": b"b", "c.zip": b"c"})
+    deposition = initial_run(zenodo, KEY_ID, dict(METADATA), datapackager, paths)
+    zenodo.publish(deposition)
+
+    contents = {"a.zip": b"a", "b.zip": b"B", "d.zip": b"d", "e.zip": b"e"}
+    local = local_fileinfo(write_files(tmp_path / "v2", contents), workers=1)
+    deposition = zenodo.get_deposition(f'keywords: "{KEY_ID}"')
+    steps = action_steps(local, remote_fileinfo(zenodo, deposition))
+    upload = zenodo.upload
+    uploaded = []
+
+    def failing_upload(deposition, file_name, file_handle):
+        if len(uploaded) == 2:
+            raise RuntimeError("Connection lost")
+
+        uploaded.append(file_name)
+        return upload(deposition, file_name, file_handle)
+
+    monkeypatch.setattr(zenodo, "upload", failing_upload)
+
+    with OperationJournal(str(tmp_path / "journal.sqlite")) as journal:
+        with pytest.raises(RuntimeError, match="Connection lost"):
+            execute_actions(zenodo, deposition, datapackager, steps, journal=journal)
+
+        assert uploaded == ["d.zip", "e.zip"]
+
+        # The next run finds the draft, and picks up where the last one stopped
+        monkeypatch.setattr(zenodo, "upload", upload)
+        draft = zenodo.get_deposition(f'keywords: "{KEY_ID}"')
+        zenodo.metrics = MetricsRecorder()
+        new_deposition = execute_actions(
+            zenodo, draft, datapackager, steps, journal=journal
+        )
+
+    calls = zenodo.metrics.report()["operations"]
+    files = remote_fileinfo(zenodo, new_deposition)
+
+    assert not draft["submitted"]
+    assert new_deposition["id"] == draft["id"]
+    assert "new_version" not in calls
+    # Only b.zip and the datapackage are uploaded again
+    assert calls["bucket_api_upload"]["calls"] == 2
+    assert sorted(files) == ["a.zip", "b.zip", "d.zip", "datapackage.json", "e.zip"]
+
+    for name, info in local.items():
+        assert files[name]["checksum"] == info["checksum"]
+
+
+def test_upload_checksums(zenodo, tmp_path):
+    """Ensure checksums computed while uploading are verified and cached."""
+    paths = write_files(tmp_path / "v1", {"a.zip": b"a" * 1000, "b.zip": b""})
+
+    with ChecksumCache(str(tmp_path / "checksums.sqlite")) as cache:
+        initial_run(zenodo, KEY_ID, dict(METADATA), datapackager, paths, cache=cache)
+
+        for fp in paths:
+            with open(fp, "rb") as f:
+                assert cache.get(fp) == md5(f.read()).hexdigest()  # nosec: B324
+
+
+def test_corrupt_upload(zenodo, tmp_path, monkeypatch):
+    """Ensure an upload is rejected if Zenodo received something else."""
+    (path,) = write_files(tmp_path, {"a.zip": b"a"})
+    deposition = zenodo.create_deposition(dict(METADATA))
+    upload = zenodo.upload
+
+    def corrupt_upload(deposition, file_name, file_handle):
+        file_handle.read(1)
+        return upload(deposition, file_name, file_handle)
+
+    monkeypatch.setattr(zenodo, "upload", corrupt_upload)
+
+    with pytest.raises(RuntimeError, match="corrupt"):
+        upload_file(zenodo, deposition, path, "a.zip")
+
+
+def test_incomplete_upload(zenodo, tmp_path, monkeypatch):
+    """Ensure nothing is recorded for an upload that didn't read the whole file."""
+    (path,) = write_files(tmp_path, {"a.zip": b"abc"})
+    deposition = zenodo.create_deposition(dict(METADATA))
+
+    def incomplete_upload(deposition, file_name, file_handle):
+        file_handle.read(1)
+        return {"filename": file_name}
+
+    monkeypatch.setattr(zenodo, "upload", incomplete_upload)
+
+    with ChecksumCache(str(tmp_path / "checksums.sqlite")) as cache:
+        with ContentStore(str(tmp_path / "store")) as store:
+            with pytest.raises(RuntimeError, match="end of the file"):
+                upload_file(zenodo, deposition, path, "a.zip", cache, store)
+
+        assert cache.get(path) is None
+
+
+def test_incremental_datapackage(zenodo, tmp_path):
+    """Ensure only the resources of changed files are generated again."""
+    paths = write_files(tmp_path / "v1", {"a.zip": b"a", "b.zip": b"b", "c.zip": b"c"})
+    deposition = initial_run(zenodo, KEY_ID, dict(METADATA), datapackager, paths)
+    zenodo.publish(deposition)
+
+    packaged = []
+
+    def counting_datapackager(dfiles):
+        dfiles = list(dfiles)
+        packaged.extend(f["filename"] for f in dfiles)
+        return datapackager(dfiles)
+
+    paths = write_files(tmp_path / "v2", {"a.zip": b"a", "b.zip": b"B", "d.zip": b"d"})
+    local = local_fileinfo(paths, workers=1)
+    deposition = zenodo.get_deposition(f'keywords: "{KEY_ID}"')
+    steps = action_steps(local, remote_fileinfo(zenodo, deposition))
+    new_deposition = execute_actions(zenodo, deposition, counting_datapackager, steps)
+    files = remote_fileinfo(zenodo, new_deposition)
+    descriptor = zenodo.download(files["datapackage.json"])
+
+    assert sorted(packaged) == ["b.zip", "d.zip"]
+    assert json.loads(descriptor) == datapackager(
+        [v for k, v in files.items() if k != "datapackage.json"]
+    )
+
+
+def test_rename(zenodo, tmp_path):
+    """Ensure renamed files keep their content and aren't uploaded again."""
+    paths = write_files(tmp_path / "v1", {"a_2020.zip": b"a", "b_2020.zip": b"b"})
+    deposition = initial_run(zenodo, KEY_ID, dict(METADATA), datapackager, paths)
+    zenodo.publish(deposition)
+
+    paths = write_files(tmp_path / "v2", {"a-2020.zip": b"a", "b_2020.zip": b"b"})
+    local = local_fileinfo(paths, workers=1)
+    deposition = zenodo.get_deposition(f'keywords: "{KEY_ID}"')
+    steps = action_steps(local, remote_fileinfo(zenodo, deposition))
+
+    assert list(steps["rename"]) == ["a-2020.zip"]
+    assert not steps["create"] and not steps["delete"]
+
+    uploaded = []
+    upload = zenodo.upload
+
+    def recording_upload(deposition, file_name, file_handle):
+        uploaded.append(file_name)
+        return upload(deposition, file_name, file_handle)
+
+    zenodo.upload = recording_upload
+    new_deposition = execute_actions(zenodo, deposition, datapackager, steps)
+    files = remote_fileinfo(zenodo, new_deposition)
+
+    assert uploaded == ["datapackage.json"]
+    assert sorted(files) == ["a-2020.zip", "b_2020.zip", "datapackage.json"]
+    assert zenodo.download(files["a-2020.zip"]) == b"a"
+
+
+def test_audit(fake_zenodo, zenodo, tmp_path):
+    """Ensure files are checked against the datapackage and the local archive."""
+    paths = write_files(tmp_path / "v1", {"a.zip": b"a", "b.zip": b"b"})
+    deposition = zenodo.publish(
+        initial_run(zenodo, KEY_ID, dict(METADATA), datapackager, paths)
+    )
+    report = audit_deposition(zenodo, KEY_ID, local_fileinfo(paths, workers=1))
+
+    assert report["problems"] == []
+    assert report["files"] == 3
+    assert report["submitted"]
+
+    fake_zenodo.state.add_file(
+        fake_zenodo.state.depositions[deposition["id"]], "b.zip", b"B"
+    )
+    paths = write_files(tmp_path / "v1", {"a.zip": b"A", "c.zip": b"c"})
+    report = audit_deposition(zenodo, KEY_ID, local_fileinfo(paths, workers=1))
+
+    assert [problem.split(" has ")[0] for problem in report["problems"]] == [
+        "b.zip",
+        "a.zip",
+        "c.zip is missing from Zenodo",
+        "b.zip is on Zenodo, but not in the local archive",
+    ]
+    assert report["problems"][0].endswith("in datapackage.json")
+    assert report["problems"][1].endswith("locally")
+
+
+def test_audit_command(zenodo, tmp_path, monkeypatch, capsys):
+    """Ensure every requested deposition is reported on."""
+    key_id = UUIDS["eia860"]
+    scraped = tmp_path / "scraped" / "eia860"
+    scraped.mkdir(parents=True)
+    paths = write_files(scraped / "2022-01-01", {"a.zip": b"a"})
+    metadata = {**METADATA, "keywords": [key_id]}
+    zenodo.publish(initial_run(zenodo, key_id, metadata, datapackager, paths))
+
+    # Two depositions tagged with the same UUID can't be told apart
+    for _ in range(2):
+        zenodo.create_deposition({**METADATA, "keywords": [UUIDS["eia923"]]})
+
+    monkeypatch.setattr(pudl_zenodo_storage.cli, "ROOT_DIR", str(tmp_path / "scraped"))
+    args = parse_audit(
+        ["--no-checksum-cache", "--jobs", "2", "eia860", "eia923", "ferc1"]
+    )
+
+    assert run_audit(zenodo, args) == 1
+
+    reports = json.loads(capsys.readouterr().out)
+
+    assert reports["eia860"]["problems"] == []
+    assert reports["eia923"]["problems"][0].startswith(
+        "ValueError: Expected single deposition"
+    )
+    assert reports["ferc1"]["problems"] == ["Deposition not found"]
+
+
+def test_mirror(fake_zenodo, zenodo, tmp_path):
+    """Ensure files are downloaded once, resumed, and verified."""
+    contents = {"a.zip": os.urandom(1000), "b.zip": b"b", "c.zip": b""}
+    paths = write_files(tmp_path / "v1", contents)
+    deposition = zenodo.publish(
+        initial_run(zenodo, KEY_ID, dict(METADATA), datapackager, paths)
+    )
+    mirror = tmp_path / "mirror"
+
+    assert set(mirror_deposition(zenodo, deposition, mirror).values()) == {"downloaded"}
+    assert mirror_deposition(zenodo, deposition, mirror, jobs=1) == {
+        "a.zip": "skipped",
+        "b.zip": "skipped",
+        "c.zip": "skipped",
+        "datapackage.json": "skipped",
+    }
+
+    for name, content in contents.items():
+        assert (mirror / name).read_bytes() == content
+
+    # An interrupted download is picked up where it stopped.
+    (mirror / "a.zip").unlink()
+    (mirror / "a.zip.part").write_bytes(contents["a.zip"][:300])
+
+    assert mirror_deposition(zenodo, deposition, mirror)["a.zip"] == "resumed"
+    assert (mirror / "a.zip").read_bytes() == contents["a.zip"]
+    assert not (mirror / "a.zip.part").exists()
+
+    # A download left by another version of the file is discarded.
+    (mirror / "a.zip").unlink()
+    (mirror / "a.zip.part").write_bytes(os.urandom(300))
+
+    assert mirror_deposition(zenodo, deposition, mirror)["a.zip"] == "downloaded"
+    assert (mirror / "a.zip").read_bytes() == contents["a.zip"]
+
+    # Files that don't match datapackage.json are rejected.
+    fake_zenodo.state.add_file(
+        fake_zenodo.state.depositions[deposition["id"]], "b.zip", b"B"
+    )
+    (mirror / "b.zip").unlink()
+
+    with pytest.raises(RuntimeError, match="corrupt"):
+        mirror_deposition(zenodo, deposition, mirror)
+
+    assert not (mirror / "b.zip").exists()
+    assert not (mirror / "b.zip.part").exists()
+
+
+def test_mirror_cut_short(zenodo, tmp_path, monkeypatch):
+    """Ensure a download that breaks off is resumed within the same run."""
+    content = os.urandom(1000)
+    paths = write_files(tmp_path / "v1", {"a.zip": content})
+    deposition = zenodo.publish(
+        initial_run(zenodo, KEY_ID, dict(METADATA), datapackager, paths)
+    )
+    iter_content = requests.Response.iter_content
+    ranges = []
+
+    def cut_short(response, *args, **kwargs):
+        if "/a.zip?" not in response.url:
+            yield from iter_content(response, *args, **kwargs)
+            return
+
+        ranges.append(response.request.headers.get("Range"))
+
+        if len(ranges) > 1:
+            yield from iter_content(response, *args, **kwargs)
+            return
+
+        yield next(iter_content(response, *args, **kwargs))[:300]
+        raise requests.exceptions.ChunkedEncodingError("Connection broken")
+
+    monkeypatch.setattr(requests.Response, "iter_content", cut_short)
+    report = mirror_deposition(zenodo, deposition, tmp_path / "mirror")
+
+    assert report["a.zip"] == "resumed"
+    assert ranges == [None, "bytes=300-"]
+    assert (tmp_path / "mirror" / "a.zip").read_bytes() == content
+
+
+def test_mirror_from_store(zenodo, tmp_path):
+    """Ensure files uploaded from this host aren't downloaded again."""
+    contents = {"a.zip": os.urandom(1000), "b.zip": b"b"}
+    paths = write_files(tmp_path / "v1", contents)
+
+    with ContentStore(str(tmp_path / "store")) as store:
+        deposition = initial_run(
+            zenodo, KEY_ID, dict(METADATA), datapackager, paths, store=store
+        )
+        zenodo.metrics = MetricsRecorder()
+        report = mirror_deposition(
+            zenodo, zenodo.publish(deposition), tmp_path / "mirror", store=store
+        )
+
+    downloads = zenodo.metrics.report()["operations"]["download"]["calls"]
+
+    assert report == {
+        "a.zip": "linked",
+        "b.zip": "linked",
+        "datapackage.json": "downloaded",
+    }
+    assert downloads == 1
+
+    for name, content in contents.items():
+        assert (tmp_path / "mirror" / name).read_bytes() == content
+
+
+def test_injected_errors_are_retried(tmp_path):
+    """Ensure transient errors don't abort a run."""
+    # POSTs aren't idempotent, so aren't retried on server errors
+    with FakeZenodo(error_rate=0.3, error_methods=("GET", "PUT", "DELETE")) as fake:
+        zenodo = ZenodoStorage(
+            key="key",
+            api_root=fake.api_root,
+            retry=RetryPolicy(max_attempts=20, backoff=0.0),
+        )
+        contents = {f"{i}.zip": os.urandom(100) for i in range(10)}
+        paths = write_files(tmp_path, contents)
+        deposition = zenodo.create_deposition(dict(METADATA))
+
+        for path in paths:
+            with open(path, "rb") as f:
+                zenodo.upload(deposition, os.path.basename(path), f)
+
+        files = remote_fileinfo(zenodo, deposition)
+
+    assert sorted(files) == sorted(contents)
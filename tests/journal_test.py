@@ -0,0 +1,24 @@
+"""Tests for the journal of completed file operations."""
+from pudl_zenodo_storage.journal import OperationJournal
+
+
+def test_operation_journal(tmp_path):
+    """Ensure operations are remembered per deposition, file and checksum."""
+    path = str(tmp_path / "journal.sqlite")
+
+    with OperationJournal(path) as journal:
+        journal.record(1, "create", "a.zip", "abc")
+        journal.record(1, "delete", "b.zip", "def")
+        journal.record(2, "update", "a.zip", "ghi")
+
+    with OperationJournal(path) as journal:
+        assert journal.completed(1, "create", "a.zip", "abc")
+        assert journal.completed(1, "delete", "b.zip", "def")
+        assert not journal.completed(1, "create", "a.zip", "changed")
+        assert not journal.completed(1, "update", "a.zip", "abc")
+        assert not journal.completed(3, "create", "a.zip", "abc")
+
+        journal.clear(1)
+
+        assert not journal.completed(1, "create", "a.zip", "abc")
+        assert journal.completed(2, "update", "a.zip", "ghi")
@@ -0,0 +1,73 @@
+"""Tests for recording and exporting API call metrics."""
+import io
+import json
+
+from pudl_zenodo_storage.zs.core import ZenodoStorage
+from pudl_zenodo_storage.zs.fake import FakeZenodo
+from pudl_zenodo_storage.zs.metrics import MetricsRecorder
+from pudl_zenodo_storage.zs.retry import RetryPolicy
+
+
+def test_report():
+    """Ensure calls are aggregated per operation."""
+    metrics = MetricsRecorder()
+    metrics.record("upload", 201, sent=100, latency=1.0)
+    metrics.record("upload", 201, sent=300, retries=2, latency=3.0)
+    metrics.record("upload", None, latency=5.0)
+    metrics.record("download", 200, received=50, latency=0.5)
+
+    report = metrics.report({"dataset": "eia860"})
+    upload = report["operations"]["upload"]
+
+    assert report["labels"] == {"dataset": "eia860"}
+    assert report["calls"] == 4
+    assert report["bytes_sent"] == 400
+    assert report["bytes_received"] == 50
+    assert upload["statuses"] == {"201": 2, "error": 1}
+    assert upload["retries"] == 2
+    assert upload["latency_seconds"]["total"] == 9.0
+    assert upload["latency_seconds"]["p50"] == 3.0
+    assert upload["latency_seconds"]["max"] == 5.0
+
+
+def test_prometheus():
+    """Ensure the textfile has typed gauges with escaped labels."""
+    metrics = MetricsRecorder()
+    metrics.record("upload", 201, sent=100, latency=1.0)
+
+    lines = metrics.prometheus({"dataset": 'odd "name"'}).splitlines()
+
+    assert "# TYPE pudl_zenodo_run_calls gauge" in lines
+    assert (
+        'pudl_zenodo_run_calls{dataset="odd \\"name\\"",operation="upload",'
+        'status="201"} 1' in lines
+    )
+    assert (
+        'pudl_zenodo_run_sent_bytes{dataset="odd \\"name\\"",operation="upload"} 100'
+        in lines
+    )
+
+
+def test_storage_records_calls(tmp_path):
+    """Ensure every call through ZenodoStorage is recorded, with its retries."""
+    with FakeZenodo(error_rate=0.3, seed=0) as fake:
+        zenodo = ZenodoStorage(
+            key="key",
+            api_root=fake.api_root,
+            retry=RetryPolicy(max_attempts=20, backoff=0.0),
+        )
+        deposition = zenodo.create_deposition({"title": "Test", "keywords": []})
+
+        for i in range(5):
+            zenodo.bucket_api_upload(deposition, f"{i}.zip", io.BytesIO(b"x" * 10))
+
+    path = tmp_path / "metrics.json"
+    zenodo.metrics.write_json(path, {"dataset": "test"})
+    report = json.loads(path.read_text())
+    uploads = report["operations"]["bucket_api_upload"]
+
+    assert uploads["calls"] == 5
+    assert uploads["statuses"] == {"201": 5}
+    assert uploads["bytes_sent"] == 50
+    assert report["retries"] > 0
+    assert report["operations"]["create_deposition"]["calls"] == 1
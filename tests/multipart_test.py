@@ -0,0 +1,44 @@
+"""Tests for streaming multipart request bodies."""
+import io
+import os
+
+import pytest
+from urllib3 import encode_multipart_formdata
+
+from pudl_zenodo_storage.zs.multipart import MultipartEncoder
+
+
+@pytest.mark.parametrize("chunk_size", [-1, 1, 7, 4096])
+def test_matches_urllib3(chunk_size):
+    """Ensure the streamed body is identical to one built in memory."""
+    content = os.urandom(10000)
+    fields = {"name": "a.zip", "access_token": "secret"}
+    body = MultipartEncoder(fields, "file", "a.zip", io.BytesIO(content), len(content))
+
+    expected, content_type = encode_multipart_formdata(
+        [*fields.items(), ("file", ("a.zip", content, "application/octet-stream"))],
+        boundary=body.boundary,
+    )
+
+    chunks = []
+    while chunk := body.read(chunk_size):
+        chunks.append(chunk)
+
+    assert b"".join(chunks) == expected
+    assert len(body) == len(expected)
+    assert body.content_type == content_type
+
+
+def test_rewind():
+    """Ensure the body can be sent again from the start of the file."""
+    handle = io.BytesIO(b"skip this:content")
+    handle.seek(10)
+    body = MultipartEncoder({}, "file", "a.txt", handle, 7)
+    first = body.read()
+
+    assert first.count(b"content") == 1
+    assert b"skip" not in first
+    assert body.tell() == len(body)
+
+    body.seek(0)
+    assert body.read() == first
@@ -0,0 +1,53 @@
+"""Tests for measuring the phases of an archiver run."""
+import json
+import pstats
+import tracemalloc
+
+from pudl_zenodo_storage.profiling import PhaseProfiler
+
+
+def test_nested_phases():
+    """Ensure an outer phase accounts for the memory used by its inner phases."""
+    profiler = PhaseProfiler()
+
+    with profiler.phase("outer"):
+        with profiler.phase("inner"):
+            data = bytearray(4 * 2**20)
+
+        del data
+
+    inner, outer = profiler.phases
+
+    assert [inner["phase"], outer["phase"]] == ["inner", "outer"]
+    assert [inner["depth"], outer["depth"]] == [1, 0]
+    assert inner["peak_memory_bytes"] >= 4 * 2**20
+    assert outer["peak_memory_bytes"] >= inner["peak_memory_bytes"]
+    assert outer["wall_seconds"] >= inner["wall_seconds"]
+    assert not tracemalloc.is_tracing()
+    assert "  inner" in profiler.report()
+
+
+def test_disabled():
+    """Ensure a disabled profiler records nothing."""
+    profiler = PhaseProfiler(enabled=False)
+
+    with profiler.phase("local_fileinfo"):
+        assert not tracemalloc.is_tracing()
+
+    assert profiler.phases == []
+
+
+def test_dumps(tmp_path):
+    """Ensure profiles and snapshots are written for each phase."""
+    profiler = PhaseProfiler(output_dir=tmp_path)
+
+    for _ in range(2):
+        with profiler.phase("action_steps"):
+            sorted(range(1000), reverse=True)
+
+    profiler.write_json(tmp_path / "phases.json")
+
+    assert pstats.Stats(str(tmp_path / "action_steps.prof")).total_calls > 0
+    assert (tmp_path / "action_steps.1.prof").exists()
+    assert tracemalloc.Snapshot.load(str(tmp_path / "action_steps.tracemalloc"))
+    assert len(json.loads((tmp_path / "phases.json").read_text())) == 2
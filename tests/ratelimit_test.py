@@ -0,0 +1,55 @@
+"""Tests for pacing Zenodo API calls."""
+import time
+
+from pudl_zenodo_storage.zs.ratelimit import RateLimiter
+
+
+def test_unlimited_until_headers():
+    """Ensure calls aren't paced before the server reports a limit."""
+    limiter = RateLimiter()
+
+    assert all(limiter.reserve() == 0.0 for _ in range(100))
+
+
+def test_burst_then_pace():
+    """Ensure calls beyond the burst are spread out at the configured rate."""
+    limiter = RateLimiter(rate=10.0, burst=2)
+    delays = [limiter.reserve() for _ in range(4)]
+
+    assert delays[:2] == [0.0, 0.0]
+    assert 0.05 < delays[2] <= 0.1
+    assert 0.15 < delays[3] <= 0.2
+
+
+def test_update_from_headers():
+    """Ensure the pace follows the remaining calls and window reported."""
+    limiter = RateLimiter(burst=1, headroom=0.9)
+    limiter.update(
+        {
+            "X-RateLimit-Limit": "100",
+            "X-RateLimit-Remaining": "70",
+            "X-RateLimit-Reset": str(time.time() + 60),
+        }
+    )
+
+    # 70 remaining, less 10 held in reserve, spread over a minute
+    assert abs(limiter.rate - 1.0) < 0.01
+
+    limiter.update(
+        {
+            "X-RateLimit-Limit": "100",
+            "X-RateLimit-Remaining": "5",
+            "X-RateLimit-Reset": str(time.time() + 30),
+        }
+    )
+
+    # Past the reserve: wait for the window to reset
+    assert 29 < limiter.reserve() <= 30
+
+
+def test_update_ignores_missing_headers():
+    """Ensure responses without rate limit headers leave the pace alone."""
+    limiter = RateLimiter(rate=2.0)
+    limiter.update({"Content-Type": "application/json"})
+
+    assert limiter.rate == 2.0
@@ -0,0 +1,52 @@
+"""Tests for the lazily imported datapackager registry."""
+import os
+import subprocess  # nosec: B404
+import sys
+
+import pytest
+
+from pudl_zenodo_storage.frictionless import DATAPACKAGERS, get_datapackager
+from pudl_zenodo_storage.zs.metadata import UUIDS
+
+# Generous, as it only needs to catch slow imports creeping back in.
+IMPORT_BUDGET = 2.0
+
+IMPORT_SCRIPT = """
+import sys
+import time
+
+start = time.perf_counter()
+import pudl_zenodo_storage.cli
+elapsed = time.perf_counter() - start
+
+heavy = ["pudl", "pudl_zenodo_storage.frictionless.core", *sys.argv[1:]]
+loaded = [name for name in sys.modules if name.split(".")[0] == "pudl" or name in heavy]
+print(elapsed, *loaded)
+"""
+
+
+def test_registry_covers_every_deposition():
+    """Ensure every deposition with a UUID has a registered datapackager."""
+    assert set(DATAPACKAGERS) == set(UUIDS)
+
+
+def test_unknown_datapackager():
+    """Ensure an unknown dataset is rejected."""
+    with pytest.raises(ValueError):
+        get_datapackager("eia999")
+
+
+def test_cli_import_is_lazy():
+    """Ensure the CLI starts without importing PUDL or any datapackager."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    result = subprocess.run(  # nosec: B603
+        [sys.executable, "-c", IMPORT_SCRIPT, *DATAPACKAGERS.values()],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed, *loaded = result.stdout.split()
+
+    assert loaded == []
+    assert float(elapsed) < IMPORT_BUDGET
@@ -0,0 +1,111 @@
+"""Tests for retrying transient Zenodo API failures."""
+import io
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+import requests
+
+from pudl_zenodo_storage.zs.core import ZenodoError, ZenodoStorage
+from pudl_zenodo_storage.zs.retry import RetryPolicy, parse_retry_after
+
+
+def test_parse_retry_after():
+    """Ensure both forms of the Retry-After header are understood."""
+    later = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("12") == 12.0
+    assert parse_retry_after("-1") == 0.0
+    assert 25 < parse_retry_after(format_datetime(later, usegmt=True)) <= 30
+    assert parse_retry_after("soon") is None
+
+
+def test_parse_retry_after_edge_cases():
+    """Ensure dates without a zone are taken as UTC, and non-finite values ignored."""
+    later = datetime.now(timezone.utc) + timedelta(seconds=30)
+
+    assert 25 < parse_retry_after(later.strftime("%a, %d %b %Y %H:%M:%S -0000")) <= 30
+    assert parse_retry_after("inf") is None
+    assert parse_retry_after("nan") is None
+
+
+@pytest.mark.parametrize(
+    "status,idempotent,expected",
+    [
+        (None, True, True),
+        (None, False, False),
+        (429, False, True),
+        (503, True, True),
+        (503, False, False),
+        (400, True, False),
+    ],
+)
+def test_should_retry(status, idempotent, expected):
+    """Ensure only calls that are safe to repeat are retried."""
+    policy = RetryPolicy(max_attempts=3)
+
+    assert policy.should_retry(1, status, idempotent) is expected
+    assert not policy.should_retry(3, status, idempotent)
+
+
+def test_delay():
+    """Ensure delays are jittered, bounded, and defer to Retry-After."""
+    policy = RetryPolicy(backoff=1.0, max_backoff=5.0)
+
+    for attempt in range(1, 10):
+        assert 0 <= policy.delay(attempt) <= min(5.0, 2 ** (attempt - 1))
+
+    assert policy.delay(1, retry_after="7") == 7.0
+
+
+def test_delay_retry_after_limit():
+    """Ensure a Retry-After header can't hold up a call indefinitely."""
+    policy = RetryPolicy(max_retry_after=120.0)
+
+    assert policy.delay(1, retry_after="86400") == 120.0
+    assert 0 <= policy.delay(1, retry_after="inf") <= 1.0
+
+
+def test_request_retries(monkeypatch):
+    """Ensure transient failures are retried and request bodies rewound."""
+    zenodo = ZenodoStorage(key="key", retry=RetryPolicy(backoff=0.0))
+    statuses = [503, 429, 201]
+    bodies = []
+
+    def fake_request(method, url, data=None, **kwargs):
+        bodies.append(data.read())
+        response = requests.Response()
+        response.status_code = statuses.pop(0)
+        response.headers["Retry-After"] = "0"
+        return response
+
+    monkeypatch.setattr(zenodo.session, "request", fake_request)
+    response = zenodo.request("PUT", "https://zenodo.test", data=io.BytesIO(b"abc"))
+
+    assert response.status_code == 201
+    assert bodies == [b"abc"] * 3
+
+
+@pytest.mark.parametrize(
+    "statuses,deleted", [([204], True), ([503, 404], True), ([404], False)]
+)
+def test_delete_retries(monkeypatch, statuses, deleted):
+    """Ensure a file deleted by an attempt that seemed to fail counts as deleted."""
+    zenodo = ZenodoStorage(key="key", retry=RetryPolicy(backoff=0.0))
+
+    def fake_request(method, url, **kwargs):
+        response = requests.Response()
+        response.status_code = statuses.pop(0)
+        return response
+
+    monkeypatch.setattr(zenodo.session, "request", fake_request)
+    file_resource = {"filename": "a.zip", "links": {"self": "https://zenodo.test"}}
+
+    if deleted:
+        zenodo.delete_file(file_resource)
+    else:
+        with pytest.raises(ZenodoError) as err:
+            zenodo.delete_file(file_resource)
+
+        assert err.value.status_code == 404
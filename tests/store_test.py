@@ -0,0 +1,69 @@
+"""Tests for the content addressed store of archive files."""
+import os
+from hashlib import md5
+
+from pudl_zenodo_storage.store import ContentStore, clone
+
+
+def write(path, content):
+    """Write a file, returning its path and checksum."""
+    path.write_bytes(content)
+    return str(path), md5(content).hexdigest()  # nosec: B324
+
+
+def test_clone(tmp_path):
+    """Ensure a clone has the same content, whichever way it was made."""
+    source, _ = write(tmp_path / "a.zip", b"a")
+
+    assert clone(source, str(tmp_path / "b.zip")) in {"reflink", "link", "copy"}
+    assert (tmp_path / "b.zip").read_bytes() == b"a"
+
+
+def test_add_and_place(tmp_path):
+    """Ensure stored files can be placed elsewhere, until they change."""
+    path, checksum = write(tmp_path / "a.zip", b"a")
+
+    with ContentStore(str(tmp_path / "store")) as store:
+        assert not store.place(checksum, str(tmp_path / "copy.zip"))
+
+        store.add(path, checksum)
+
+        assert checksum in store
+        assert store.place(checksum, str(tmp_path / "copy.zip"))
+        assert (tmp_path / "copy.zip").read_bytes() == b"a"
+
+    with ContentStore(str(tmp_path / "store")) as store:
+        assert checksum in store
+
+        # An object shared with a file that changed in place can't be trusted.
+        os.utime(store._object_path(checksum), ns=(0, 0))
+
+        assert checksum not in store
+        assert not store.place(checksum, str(tmp_path / "other.zip"))
+
+
+def test_eviction(tmp_path):
+    """Ensure the least recently used files are removed to fit the bound."""
+    files = [write(tmp_path / f"{i}.zip", bytes([i]) * 100) for i in range(3)]
+
+    with ContentStore(str(tmp_path / "store"), max_size=250) as store:
+        store.add(*files[0])
+        store.add(*files[1])
+        store.place(files[0][1], str(tmp_path / "copy.zip"))
+        store.add(*files[2])
+
+        assert [checksum in store for _, checksum in files] == [True, False, True]
+        assert not os.path.exists(store._object_path(files[1][1]))
+
+
+def test_eviction_after_adding_again(tmp_path):
+    """Ensure adding a file that is already stored marks it as just used."""
+    files = [write(tmp_path / f"{i}.zip", bytes([i]) * 100) for i in range(3)]
+
+    with ContentStore(str(tmp_path / "store"), max_size=250) as store:
+        store.add(*files[0])
+        store.add(*files[1])
+        store.add(*files[0])
+        store.add(*files[2])
+
+        assert [checksum in store for _, checksum in files] == [True, False, True]
@@ -0,0 +1,87 @@
+"""Tests for choosing how files are uploaded to Zenodo."""
+import io
+
+import pytest
+
+from pudl_zenodo_storage.zs.core import FILE_API_MAX_SIZE, ZenodoError, ZenodoStorage
+
+
+class FakeLargeFile(io.RawIOBase):
+    """A seekable file handle that claims to be larger than the file api allows."""
+
+    size = FILE_API_MAX_SIZE + 1
+
+    def seekable(self):
+        """Allow seeking."""
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        """Seek without reading anything."""
+        self.position = self.size if whence == io.SEEK_END else offset
+        return self.position
+
+    def tell(self):
+        """Report the current position."""
+        return getattr(self, "position", 0)
+
+
+@pytest.fixture()
+def zenodo(monkeypatch):
+    """A ZenodoStorage that records which api was used instead of uploading."""
+    zenodo = ZenodoStorage(key="key")
+    zenodo.calls = []
+    zenodo.bucket_error = None
+
+    def bucket_api_upload(deposition, file_name, file_handle):
+        zenodo.calls.append("bucket")
+        file_handle.seek(0, io.SEEK_END)
+
+        if zenodo.bucket_error is not None:
+            raise ZenodoError("failed", zenodo.bucket_error)
+
+        return {"filename": file_name}
+
+    def file_api_upload(deposition, file_name, file_handle):
+        zenodo.calls.append(("file", file_handle.tell()))
+        return {"filename": file_name}
+
+    monkeypatch.setattr(zenodo, "bucket_api_upload", bucket_api_upload)
+    monkeypatch.setattr(zenodo, "file_api_upload", file_api_upload)
+    return zenodo
+
+
+def test_bucket_preferred(zenodo):
+    """Ensure the bucket api is used whenever there is a bucket."""
+    deposition = {"links": {"bucket": "https://b", "files": "https://f"}}
+    zenodo.upload(deposition, "a.zip", io.BytesIO(b"abc"))
+
+    assert zenodo.calls == ["bucket"]
+
+
+def test_file_api_without_bucket(zenodo):
+    """Ensure small files go through the file api if there is no bucket."""
+    zenodo.upload({"links": {"files": "https://f"}}, "a.zip", io.BytesIO(b"abc"))
+
+    assert zenodo.calls == [("file", 0)]
+
+    with pytest.raises(ValueError):
+        zenodo.upload({"links": {"files": "https://f"}}, "a.zip", FakeLargeFile())
+
+
+@pytest.mark.parametrize(
+    "status,size,fallback",
+    [(404, 3, True), (503, 3, False), (400, 3, False), (404, None, False)],
+)
+def test_bucket_failures(zenodo, status, size, fallback):
+    """Ensure files are only sent again when the bucket is missing."""
+    deposition = {"links": {"bucket": "https://b", "files": "https://f"}}
+    zenodo.bucket_error = status
+    handle = io.BytesIO(b"abc") if size else FakeLargeFile()
+
+    if fallback:
+        zenodo.upload(deposition, "a.zip", handle)
+        assert zenodo.calls == ["bucket", ("file", 0)]
+    else:
+        with pytest.raises(ZenodoError):
+            zenodo.upload(deposition, "a.zip", handle)
+        assert zenodo.calls == ["bucket"]
@@ -0,0 +1,85 @@
+"""Tests for offline validation of data package descriptors."""
+from datapackage import Package
+
+from pudl_zenodo_storage.frictionless import validation
+from pudl_zenodo_storage.frictionless.validation import DescriptorValidator
+
+
+def descriptor(count=3):
+    """A small, valid data package descriptor."""
+    return {
+        "name": "pudl-raw-test",
+        "title": "Test",
+        "profile": "data-package",
+        "keywords": ["test"],
+        "licenses": [{"name": "CC-BY-4.0", "path": "https://example.com/license"}],
+        "resources": [
+            {
+                "profile": "data-resource",
+                "name": f"test-{i}.zip",
+                "path": f"https://zenodo.org/api/files/abc/test-{i}.zip",
+                "title": f"test-{i}",
+                "bytes": 100,
+                "hash": "d41d8cd98f00b204e9800998ecf8427e",
+                "format": "zip",
+                "mediatype": "application/zip",
+                "encoding": "utf-8",
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def test_valid_descriptor():
+    """Ensure a valid descriptor passes, as it does with the datapackage library."""
+    valid = descriptor()
+
+    assert Package(descriptor=valid).valid
+    assert DescriptorValidator().errors(valid) == []
+
+
+def test_invalid_descriptor():
+    """Ensure package and resource errors are found, as with datapackage."""
+    invalid = descriptor()
+    invalid["keywords"] = []
+    invalid["resources"][1]["hash"] = "not a hash"
+
+    errors = DescriptorValidator().errors(invalid)
+
+    assert not Package(descriptor=invalid).valid
+    assert len(errors) == 2
+    assert '"keywords"' in errors[0]
+    assert '"resources/1/hash"' in errors[1]
+
+
+def test_invalid_resource_not_cached():
+    """Ensure an invalid resource is reported again on the next validation."""
+    invalid = descriptor()
+    invalid["resources"][0]["bytes"] = "100"
+    validator = DescriptorValidator()
+
+    assert len(validator.errors(invalid)) == 1
+    assert len(validator.errors(invalid)) == 1
+
+
+def test_cached_results(tmp_path, monkeypatch):
+    """Ensure only new or changed resources are validated on the next run."""
+    path = tmp_path / "validation.sqlite"
+
+    with DescriptorValidator(path) as validator:
+        assert validator.errors(descriptor()) == []
+
+    changed = descriptor()
+    changed["resources"][2]["bytes"] = 200
+    validated = []
+
+    def error_messages(validator, descriptor, prefix=()):
+        validated.append(descriptor.get("name"))
+        return []
+
+    monkeypatch.setattr(validation, "_error_messages", error_messages)
+
+    with DescriptorValidator(path) as validator:
+        assert validator.errors(changed) == []
+
+    assert validated == ["pudl-raw-test", "test-2.zip"]